@@ -0,0 +1,81 @@
+# scripts/bench_ingest.py
+"""Throughput benchmark: HDFSLoader per-line parsing vs columnar parse_batch.
+
+Usage:
+    python scripts/bench_ingest.py --lines 200000 --batch-size 5000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+# Ensure repo root is on sys.path so "src.*" imports work even when run by file path
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+# Benchmark-only key; real runs must set DOVAH_HMAC_KEY explicitly
+os.environ.setdefault("DOVAH_HMAC_KEY", "00" * 32)
+
+from src.ingest.hdfs_loader import HDFSLoader  # noqa: E402
+
+MESSAGES = [
+    "Receiving block blk_{n} src: /10.0.{a}.{b}:50010 dest: /10.0.{b}.{a}:50010",
+    "PacketResponder {a} for block blk_{n} terminating",
+    "BLOCK* NameSystem.addStoredBlock: blockMap updated: 10.0.{a}.{b}:50010 is added to blk_{n}",
+    "Served block blk_{n} to /10.0.{a}.{b}",
+    "Verification succeeded for blk_{n}",
+    "Patched hadoop-3.3.{a} against CVE-2021-{n4} reported by ops{a}@example.com",
+]
+
+
+def synth_lines(n: int, hosts: int, seed: int = 0) -> list:
+    r = random.Random(seed)
+    base = datetime.now(timezone.utc)
+    out = []
+    for i in range(n):
+        ts = base + timedelta(microseconds=i * 10)
+        msg = r.choice(MESSAGES).format(
+            n=r.randint(10**8, 10**9), n4=r.randint(1000, 9999), a=r.randint(0, 255), b=r.randint(0, 255)
+        )
+        out.append(
+            f"{ts.strftime('%Y-%m-%dT%H:%M:%S.%fZ')}\tdn{r.randrange(hosts)}.cluster\tDataNode\t{msg}\tINFO\n"
+        )
+    return out
+
+
+def bench(lines: list, batch_size: int) -> None:
+    loader = HDFSLoader()
+    t0 = time.perf_counter()
+    n_line = sum(1 for line in lines if loader.parse_log_line(line))
+    per_line = time.perf_counter() - t0
+
+    loader = HDFSLoader()
+    t0 = time.perf_counter()
+    n_batch = 0
+    for i in range(0, len(lines), batch_size):
+        n_batch += len(loader.parse_batch(lines[i:i + batch_size]))
+    batched = time.perf_counter() - t0
+
+    print(f"per-line : {n_line:>8} events  {per_line:8.2f}s  {len(lines) / per_line:>10.0f} lines/s")
+    print(f"batch={batch_size:<5}: {n_batch:>8} events  {batched:8.2f}s  {len(lines) / batched:>10.0f} lines/s")
+    print(f"speedup  : {per_line / batched:.2f}x")
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Benchmark HDFSLoader per-line vs batch parsing")
+    ap.add_argument("--lines", type=int, default=50000)
+    ap.add_argument("--batch-size", type=int, default=5000)
+    ap.add_argument("--hosts", type=int, default=200, help="Distinct hostnames in the synthetic log")
+    args = ap.parse_args()
+
+    lines = synth_lines(args.lines, args.hosts)
+    bench(lines, args.batch_size)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
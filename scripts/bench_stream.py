@@ -0,0 +1,159 @@
+# scripts/bench_stream.py
+"""Benchmark: replay | features as two processes vs the in-process pipeline.
+
+Runs ``src.stream.job`` in ``python`` mode (subprocess + pipe) with JSON
+lines and with binary frames on the pipe, and in ``inproc`` mode, on the
+same synthetic input. Reports wall time, throughput, total CPU seconds (both
+processes for the pipe) and the window latency quantiles recorded by the
+feature stage. A high ``--eps`` makes the run throughput bound; CPU seconds
+show the serialization cost of the pipe.
+
+It first measures the wire codecs alone (encode and decode events/s and
+bytes per event for ``jsonl`` and ``binary``).
+
+Usage:
+    python scripts/bench_stream.py --events 50000 --eps 100000
+"""
+import argparse
+import io
+import json
+import random
+import resource
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+# Ensure repo root is on sys.path so "src.*" imports work even when run by file path
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from src.common.latency import LatencyHistogram  # noqa: E402
+from src.stream.framing import FrameEncoder, read_events  # noqa: E402
+from src.stream.job import _run_inproc_pipeline, _run_python_pipeline  # noqa: E402
+
+COMPONENTS = ["DataNode", "NameNode", "FSNamesystem", "PacketResponder"]
+
+
+def synth_events(path: Path, n: int, seed: int = 0) -> None:
+    r = random.Random(seed)
+    base = datetime(2025, 8, 1, tzinfo=timezone.utc)
+    with path.open("w") as fh:
+        for i in range(n):
+            fh.write(json.dumps({
+                "timestamp": (base + timedelta(milliseconds=10 * i)).isoformat(),
+                "host": f"h{r.randrange(50)}",
+                "level": r.choice(["INFO", "INFO", "WARN", "ERROR"]),
+                "component": r.choice(COMPONENTS),
+                "message": "msg",
+                "template_id": f"T{r.randrange(40)}",
+                "session_id": f"S{r.randrange(500)}",
+            }) + "\n")
+
+
+def _encode_jsonl(batches) -> list:
+    encode = json.JSONEncoder().encode
+    return ["\n".join([encode(e) for e in b]) + "\n" for b in batches]
+
+
+def _decode_jsonl(payloads) -> list:
+    return [json.loads(line) for p in payloads for line in p.splitlines()]
+
+
+def _encode_binary(batches) -> list:
+    encoder = FrameEncoder()
+    return [encoder.encode(b) for b in batches]
+
+
+def _decode_binary(payloads) -> list:
+    return list(read_events(io.BytesIO(b"".join(payloads))))
+
+
+CODECS = {"jsonl": (_encode_jsonl, _decode_jsonl), "binary": (_encode_binary, _decode_binary)}
+
+
+def bench_codecs(input_path: Path, batch: int = 200) -> dict:
+    """Encode/decode throughput of both wire formats on replay-stamped events."""
+    events = [json.loads(line) for line in input_path.open()]
+    now = datetime.now(timezone.utc).isoformat()
+    for e in events:
+        e["orig_ts"], e["timestamp"], e["replay_ts"] = e["timestamp"], now, now
+    batches = [events[i:i + batch] for i in range(0, len(events), batch)]
+    results = {}
+    for name, (encode, decode) in CODECS.items():
+        t0 = time.perf_counter()
+        payloads = encode(batches)
+        t1 = time.perf_counter()
+        decoded = decode(payloads)
+        t2 = time.perf_counter()
+        assert len(decoded) == len(events)
+        results[name] = {
+            "encode": len(events) / (t1 - t0),
+            "decode": len(events) / (t2 - t1),
+            "bytes": sum(map(len, payloads)) / len(events),
+        }
+    return results
+
+
+def run(mode: str, input_path: Path, out_dir: Path, args) -> dict:
+    out = out_dir / f"features_{mode}.jsonl"
+    lat = out_dir / f"latency_{mode}.csv"
+    piped = mode != "inproc"
+    runner = _run_python_pipeline if piped else _run_inproc_pipeline
+    who = resource.RUSAGE_CHILDREN if piped else resource.RUSAGE_SELF
+    ru0 = resource.getrusage(who)
+    t0 = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        rc = runner(
+            input_path=str(input_path),
+            window_size_sec=args.window_size_sec,
+            window_stride_sec=args.window_stride_sec,
+            latency_log_file=str(lat),
+            out_path=str(out),
+            eps=args.eps,
+            warmup_sec=0,
+            run_duration_sec=3600,
+            wire_format="binary" if mode == "binary" else "jsonl",
+        )
+    wall = time.perf_counter() - t0
+    ru1 = resource.getrusage(who)
+    cpu = (ru1.ru_utime - ru0.ru_utime) + (ru1.ru_stime - ru0.ru_stime)
+    hist = LatencyHistogram.load(lat.with_suffix(".hist.json"))
+    with out.open() as fh:
+        windows = sum(1 for _ in fh)
+    return {"rc": rc, "wall": wall, "cpu": cpu, "windows": windows,
+            "p50": hist.percentile(50), "p95": hist.percentile(95)}
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Benchmark subprocess vs in-process stream pipeline")
+    ap.add_argument("--events", type=int, default=20000)
+    ap.add_argument("--eps", type=int, default=100000, help="Replay rate (high = throughput bound)")
+    ap.add_argument("--window-size-sec", type=int, default=10)
+    ap.add_argument("--window-stride-sec", type=int, default=1)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        input_path = tmp / "events.jsonl"
+        synth_events(input_path, args.events)
+        codecs = bench_codecs(input_path)
+        results = {mode: run(mode, input_path, tmp, args) for mode in ("python", "binary", "inproc")}
+
+    for name, c in codecs.items():
+        print(f"codec {name:<6}: encode {c['encode']:>9.0f} events/s  decode {c['decode']:>9.0f} events/s  "
+              f"{c['bytes']:.0f} bytes/event")
+    for mode, r in results.items():
+        print(f"{mode:<7}: rc={r['rc']} {r['wall']:7.2f}s  {args.events / r['wall']:>9.0f} events/s  cpu={r['cpu']:6.2f}s  "
+              f"windows={r['windows']:<5} p50={r['p50']:.1f}ms p95={r['p95']:.1f}ms")
+    for mode in ("binary", "inproc"):
+        print(f"{mode} vs python: {results['python']['wall'] / results[mode]['wall']:.2f}x wall, "
+              f"{results['python']['cpu'] / results[mode]['cpu']:.2f}x cpu")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -6,6 +6,15 @@ from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from typing import Any, Dict, Iterable, List, Optional, Tuple
 
+# Ensure repo root is on sys.path so "src.*" imports work even when run by file path
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from src.common.timeparse import TimestampParser
+
+_TS_PARSER = TimestampParser()  # this script's input only
+
 # --- Heuristics & field preferences
 CVERE = re.compile(r"CVE-\d{4}-\d{4,7}", re.IGNORECASE)
 ID_PREF = ("session_id", "window_id", "dedup_key", "id")
@@ -100,18 +109,13 @@ def pick_id_key(sample: Dict[str, Any]) -> str:
     return "id"
 
 def parse_ts(v: Any) -> Optional[float]:
+    """Epoch seconds for an ISO-8601 or numeric timestamp; None if unparseable."""
     if v is None:
         return None
-    s = str(v)
-    if s.endswith("Z"):
-        s = s[:-1] + "+00:00"
     try:
-        return datetime.fromisoformat(s).timestamp()
-    except Exception:
-        try:
-            return float(s)
-        except Exception:
-            return None
+        return _TS_PARSER.parse(v if isinstance(v, (int, float)) else str(v)).timestamp()
+    except (ValueError, OverflowError):
+        return None
 
 def ts_key(ev: Dict[str, Any]) -> Tuple[int, float]:
     for k in TS_KEYS:
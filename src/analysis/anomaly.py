@@ -7,6 +7,8 @@ from sklearn.preprocessing import StandardScaler
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 
+from src.common.interning import get_template_interner
+
 @dataclass
 class EventFeatures:
     """Features extracted from event stream."""
@@ -88,13 +90,13 @@ class AnomalyDetector:
         avg_severity = severities.mean()
         max_severity = severities.max()
         
-        # Template diversity
-        templates = events_df["template_id"]
-        unique_templates = templates.nunique()
-        
-        # Template entropy
-        template_counts = templates.value_counts(normalize=True)
-        template_entropy = -(template_counts * np.log2(template_counts)).sum()
+        # Template diversity and entropy, counted over interned template ids
+        ids = np.array(get_template_interner().intern_many(events_df["template_id"].dropna()), dtype=np.int64)
+        template_counts = np.bincount(ids)
+        template_counts = template_counts[template_counts > 0]
+        unique_templates = len(template_counts)
+        template_probs = template_counts / max(template_counts.sum(), 1)
+        template_entropy = -(template_probs * np.log2(template_probs)).sum()
         
         return EventFeatures(
             event_count=event_count,
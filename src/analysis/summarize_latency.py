@@ -1,32 +1,56 @@
 import argparse
-import pandas as pd
+import csv
 import sys
 
+from src.common.latency import LatencyHistogram
+
+
+def _iter_latencies(reader: csv.DictReader, column_name: str):
+    for row in reader:
+        try:
+            if column_name == 'total':
+                yield float(row['p95_ingest_ms']) + float(row['p95_feature_ms'])
+            else:
+                yield float(row[column_name])
+        except (TypeError, ValueError):
+            continue
+
+
 def summarize_latency(file_path: str, column_name: str, sla_ms: int):
-    """Calculates and prints summary statistics for latency data."""
+    """Calculates and prints summary statistics for latency data.
+
+    Rows are streamed into a ``LatencyHistogram`` rather than loaded and
+    sorted, so memory stays constant regardless of the file size.
+    """
     try:
-        df = pd.read_csv(file_path)
-        
-        # Calculate total latency if column is 'total'
-        if column_name == 'total':
-            if 'p95_ingest_ms' not in df.columns or 'p95_feature_ms' not in df.columns:
-                print("Error: 'p95_ingest_ms' or 'p95_feature_ms' columns not found for total calculation.")
-                sys.exit(1)
-            df['total_latency_ms'] = df['p95_ingest_ms'] + df['p95_feature_ms']
-            target_column = 'total_latency_ms'
-        else:
-            if column_name not in df.columns:
-                print(f"Error: '{column_name}' column not found in the CSV file.")
-                sys.exit(1)
-            target_column = column_name
+        with open(file_path, newline='') as fh:
+            reader = csv.DictReader(fh)
+            columns = reader.fieldnames or []
+
+            # Calculate total latency if column is 'total'
+            if column_name == 'total':
+                if 'p95_ingest_ms' not in columns or 'p95_feature_ms' not in columns:
+                    print("Error: 'p95_ingest_ms' or 'p95_feature_ms' columns not found for total calculation.")
+                    sys.exit(1)
+                target_column = 'total_latency_ms'
+            else:
+                if column_name not in columns:
+                    print(f"Error: '{column_name}' column not found in the CSV file.")
+                    sys.exit(1)
+                target_column = column_name
+
+            hist = LatencyHistogram()
+            for value in _iter_latencies(reader, column_name):
+                hist.record(value)
 
         # Calculate summary statistics
-        summary = df[target_column].describe(percentiles=[.5, .9, .95, .99])
+        summary = hist.summary(percentiles=(50, 90, 95, 99))
         print(f"Latency Summary Statistics for '{target_column}':")
-        print(summary)
+        for name, value in summary.items():
+            print(f"{name:<6} {value:.1f}" if name != 'count' else f"{name:<6} {value}")
 
-        p95 = summary.get('95%')
-        if p95 is not None:
+        if hist.count:
+            p95 = summary['p95']
             print(f"\nP95: {p95:.1f} ms ({p95/1000:.3f} s)")
             if sla_ms and p95 > sla_ms:
                 print(f"FAIL: P95 latency exceeds {sla_ms}ms SLA.")
@@ -6,24 +6,35 @@ from typing import Dict, Any
 import jsonschema
 import pandas as pd
 
+from ..common.schema import SchemaValidator, get_validator
+
 def load_schema(schema_path: str) -> Dict[str, Any]:
     """Load JSON schema from file."""
     with open(schema_path) as f:
         return json.load(f)
 
 def validate_log_entry(entry: Dict[str, Any], schema: Dict[str, Any]) -> None:
-    """Validate a single log entry against schema."""
-    jsonschema.validate(instance=entry, schema=schema)
+    """Validate a single log entry against schema (compiled once per schema)."""
+    get_validator(schema).validate(entry)
 
-def validate_logs_df(df: pd.DataFrame, schema_path: str) -> None:
-    """Validate all log entries in DataFrame against schema."""
-    schema = load_schema(schema_path)
+def validate_logs_df(df: pd.DataFrame, schema_path: str, mode: str = "full",
+                     sample_every: int = 100, first_n: int = 1000) -> None:
+    """Validate log entries in DataFrame against schema.
+    
+    Args:
+        df: Log entries, one per row
+        schema_path: JSON schema file
+        mode: ``full``, ``sampled`` (1 in ``sample_every``) or ``first_n``
+            (first ``first_n`` rows per host)
+    """
+    validator = SchemaValidator(load_schema(schema_path), mode=mode,
+                                sample_every=sample_every, first_n=first_n)
     
     # Convert DataFrame to list of dicts for validation
     records = df.to_dict(orient='records')
     
     for record in records:
         try:
-            validate_log_entry(record, schema)
+            validator(record)
         except jsonschema.exceptions.ValidationError as e:
             raise ValueError(f"Log entry validation failed: {e}")
@@ -0,0 +1,231 @@
+"""Process-wide interning of template ids (and other keys) to dense integers.
+
+Template ids reach the pipeline in several forms: Drain3 ``cluster_id``
+ints, 8-character sha1 prefixes from ``template_extract``, ``"t1"`` style
+labels in samples. ``Interner`` maps each id to a dense int
+(0, 1, 2, ... in order of first sight), so windows, baselines and n-gram
+models hash and store small ints instead of strings. Ids are compared by
+their string form: ``17`` and ``"17"`` intern to the same int, and a
+missing id (None) interns like ``""``.
+
+``TemplateBitset`` is a set of interned ids with one bit per id. As ids
+are dense, a flat bitmap stays compact (125 KB for a million templates)
+and novelty checks and unions are byte operations instead of string set
+operations.
+
+The shared table (``get_template_interner()``) is persisted next to the
+template cache (``template_ids.json`` in its ``cache_dir``) by
+``TemplateCache``, so ids stay stable across runs. Load it before
+interning anything: ids already handed out in this process win over
+persisted ones.
+
+``get_interner(kind)`` gives the shared tables of other keys the stream
+keeps per event (``"host"``, ``"component"``); these are not persisted.
+"""
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Hashable, Iterable, Iterator, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+INTERN_FILE = "template_ids.json"
+INTERN_VERSION = 1
+
+
+class Interner:
+    """Append-only mapping of ids (templates, hosts, ...) to dense ints."""
+
+    def __init__(self, names: Iterable[str] = ()):
+        self._ids: Dict[Hashable, int] = {}  # raw id (any hashable form) -> int
+        self._by_name: Dict[str, int] = {}
+        self.names: List[str] = []  # int -> canonical name
+        self._lock = threading.Lock()
+        for name in names:
+            self.intern(name)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @staticmethod
+    def _name(tid: Hashable) -> str:
+        return "" if tid is None else str(tid)
+
+    def intern(self, tid: Hashable) -> int:
+        """Dense int of ``tid``, assigning the next one if it is new."""
+        i = self._ids.get(tid)
+        if i is None:
+            i = self._add(tid)
+        return i
+
+    def _add(self, tid: Hashable) -> int:
+        name = self._name(tid)
+        with self._lock:
+            i = self._by_name.get(name)
+            if i is None:
+                i = self._by_name[name] = len(self.names)
+                self.names.append(name)
+            self._ids[tid] = i
+        return i
+
+    def lookup(self, tid: Hashable) -> Optional[int]:
+        """Dense int of ``tid``, or None if it was never interned (nothing is assigned)."""
+        i = self._ids.get(tid)
+        return self._by_name.get(self._name(tid)) if i is None else i
+
+    def intern_many(self, tids: Iterable[Hashable]) -> List[int]:
+        intern = self.intern
+        return [intern(t) for t in tids]
+
+    def name(self, i: int) -> str:
+        return self.names[i]
+
+    def load(self, path: Union[str, Path]) -> int:
+        """Intern the names persisted at ``path`` in their order; returns how many.
+
+        A missing file loads nothing. Raises ValueError for a file of
+        another format.
+        """
+        path = Path(path)
+        if not path.exists():
+            return 0
+        with open(path) as fh:
+            data = json.load(fh)
+        if data.get("version") != INTERN_VERSION:
+            raise ValueError(f"{path}: unsupported template id table version {data.get('version')}")
+        names = data["names"]
+        for i, name in enumerate(names):
+            if self.intern(name) != i:
+                logger.warning(f"Template ids in {path} differ from ids already assigned in this process")
+                self.intern_many(names[i + 1:])
+                break
+        return len(names)
+
+    def save(self, path: Union[str, Path]) -> None:
+        """Atomically write the table to ``path``."""
+        path = Path(path)
+        with self._lock:
+            names = list(self.names)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "w") as fh:
+            json.dump({"version": INTERN_VERSION, "names": names}, fh)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, path)
+
+
+class TemplateBitset:
+    """Set of interned template ids backed by a bitmap (bit i of byte i // 8)."""
+
+    __slots__ = ("_bits",)
+
+    def __init__(self, ids: Iterable[int] = ()):
+        self._bits = bytearray()
+        self.update(ids)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "TemplateBitset":
+        bs = cls()
+        bs._bits = bytearray(data)
+        return bs
+
+    def to_bytes(self) -> bytes:
+        return bytes(self._bits).rstrip(b"\0")
+
+    def _int(self) -> int:
+        return int.from_bytes(self._bits, "little")
+
+    def _set_int(self, value: int) -> None:
+        self._bits = bytearray(value.to_bytes((value.bit_length() + 7) // 8, "little"))
+
+    def add(self, i: int) -> None:
+        byte = i >> 3
+        bits = self._bits
+        if byte >= len(bits):
+            bits.extend(bytes(max(byte + 1, 2 * len(bits)) - len(bits)))
+        bits[byte] |= 1 << (i & 7)
+
+    def discard(self, i: int) -> None:
+        byte = i >> 3
+        if byte < len(self._bits):
+            self._bits[byte] &= ~(1 << (i & 7)) & 0xFF
+
+    def update(self, ids: Iterable[int]) -> None:
+        if isinstance(ids, TemplateBitset):
+            self |= ids
+            return
+        for i in ids:
+            self.add(i)
+
+    def __contains__(self, i: int) -> bool:
+        byte = i >> 3
+        return byte < len(self._bits) and bool(self._bits[byte] >> (i & 7) & 1)
+
+    def __len__(self) -> int:
+        return self._int().bit_count()
+
+    def __bool__(self) -> bool:
+        return any(self._bits)
+
+    def __iter__(self) -> Iterator[int]:
+        for byte, b in enumerate(self._bits):
+            while b:
+                low = b & -b
+                yield (byte << 3) + low.bit_length() - 1
+                b ^= low
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, TemplateBitset) and self.to_bytes() == other.to_bytes()
+
+    def __repr__(self) -> str:
+        return f"TemplateBitset({list(self)})"
+
+    def __ior__(self, other: "TemplateBitset") -> "TemplateBitset":
+        self._set_int(self._int() | other._int())
+        return self
+
+    def __or__(self, other: "TemplateBitset") -> "TemplateBitset":
+        out = TemplateBitset()
+        out._set_int(self._int() | other._int())
+        return out
+
+    def __and__(self, other: "TemplateBitset") -> "TemplateBitset":
+        out = TemplateBitset()
+        out._set_int(self._int() & other._int())
+        return out
+
+    def __sub__(self, other: "TemplateBitset") -> "TemplateBitset":
+        out = TemplateBitset()
+        out._set_int(self._int() & ~other._int())
+        return out
+
+    def __xor__(self, other: "TemplateBitset") -> "TemplateBitset":
+        out = TemplateBitset()
+        out._set_int(self._int() ^ other._int())
+        return out
+
+    def issubset(self, other: "TemplateBitset") -> bool:
+        return not self._int() & ~other._int()
+
+    def isdisjoint(self, other: "TemplateBitset") -> bool:
+        return not self._int() & other._int()
+
+
+_INTERNERS: Dict[str, Interner] = {}
+_INTERNER_LOCK = threading.Lock()
+
+
+def get_interner(kind: str) -> Interner:
+    """The interning table of ``kind`` shared by the whole process."""
+    interner = _INTERNERS.get(kind)
+    if interner is None:
+        with _INTERNER_LOCK:
+            interner = _INTERNERS.setdefault(kind, Interner())
+    return interner
+
+
+def get_template_interner() -> Interner:
+    """The template id table shared by the whole process."""
+    return get_interner("template")
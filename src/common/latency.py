@@ -0,0 +1,274 @@
+"""Streaming latency histograms for SLO tracking.
+
+``LatencyHistogram`` is an HDR-style histogram over log-spaced buckets:
+recording a value is O(1), quantile queries scan a fixed, small bucket
+array (a few thousand int64 counters), histograms from different processes
+merge by adding counts, and they serialize to compact JSON. Quantiles are
+accurate to ``relative_accuracy`` (1% by default) within the tracked range.
+"""
+import csv
+import json
+import math
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Sequence, Union
+
+import numpy as np
+
+
+class LatencyHistogram:
+    """Log-bucketed latency histogram (values in milliseconds)."""
+
+    def __init__(
+        self,
+        relative_accuracy: float = 0.01,
+        lowest_ms: float = 1e-3,
+        highest_ms: float = 1e12,
+    ):
+        """Create an empty histogram.
+
+        Args:
+            relative_accuracy: Maximum relative error of reported quantiles
+            lowest_ms: Smallest distinguishable value; anything at or below
+                (including negative latencies from skewed clocks) lands in
+                the underflow bucket
+            highest_ms: Largest distinguishable value; anything above lands
+                in the overflow bucket
+        """
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be in (0, 1)")
+        self.relative_accuracy = relative_accuracy
+        self.lowest_ms = lowest_ms
+        self.highest_ms = highest_ms
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._offset = math.log(lowest_ms) / self._log_gamma
+        # bucket 0 = underflow, last bucket = overflow
+        self._n_buckets = int(math.ceil(math.log(highest_ms) / self._log_gamma - self._offset)) + 2
+        self.counts = np.zeros(self._n_buckets, dtype=np.int64)
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def _index(self, value: float) -> int:
+        if value <= self.lowest_ms:
+            return 0
+        if value > self.highest_ms:
+            return self._n_buckets - 1
+        return int(math.ceil(math.log(value) / self._log_gamma - self._offset))
+
+    def _bucket_value(self, idx: int) -> float:
+        # Midpoint (in relative terms) of (gamma^(i-1), gamma^i]
+        upper = math.exp((idx + self._offset) * self._log_gamma)
+        return 2 * upper / (1 + self._gamma)
+
+    def record(self, value_ms: float, count: int = 1) -> None:
+        """Record ``count`` occurrences of a latency value."""
+        self.counts[self._index(value_ms)] += count
+        self.count += count
+        self.total += value_ms * count
+        if value_ms < self.min:
+            self.min = value_ms
+        if value_ms > self.max:
+            self.max = value_ms
+
+    def record_many(self, values_ms: Union[Sequence[float], np.ndarray]) -> None:
+        """Record an array of latency values."""
+        values = np.asarray(values_ms, dtype=np.float64)
+        if values.size == 0:
+            return
+        idx = np.zeros(values.shape, dtype=np.int64)
+        inside = (values > self.lowest_ms) & (values <= self.highest_ms)
+        idx[inside] = np.ceil(np.log(values[inside]) / self._log_gamma - self._offset)
+        idx[values > self.highest_ms] = self._n_buckets - 1
+        self.counts += np.bincount(idx, minlength=self._n_buckets)
+        self.count += int(values.size)
+        self.total += float(values.sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    def _quantile(self, counts: np.ndarray, n: int, lo: float, hi: float, q: float) -> float:
+        if n == 0:
+            return float("nan")
+        if q <= 0:
+            return lo
+        if q >= 1:
+            return hi
+        rank = q * (n - 1)
+        idx = int(np.searchsorted(np.cumsum(counts), rank, side="right"))
+        if idx == 0:
+            return lo
+        if idx == self._n_buckets - 1:
+            return hi
+        return min(max(self._bucket_value(idx), lo), hi)
+
+    def quantile(self, q: float) -> float:
+        """Return the ``q`` quantile (0..1); NaN if the histogram is empty."""
+        return self._quantile(self.counts, self.count, self.min, self.max, q)
+
+    def percentile(self, p: float) -> float:
+        """Return the ``p``-th percentile (0..100)."""
+        return self.quantile(p / 100.0)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else float("nan")
+
+    def summary(self, percentiles: Iterable[float] = (50, 90, 95, 99)) -> Dict[str, float]:
+        """Count, mean, min/max and selected percentiles as a flat dict."""
+        out = {"count": self.count, "mean": self.mean,
+               "min": self.min if self.count else float("nan")}
+        for p in percentiles:
+            out[f"p{p:g}"] = self.percentile(p)
+        out["max"] = self.max if self.count else float("nan")
+        return out
+
+    def _check_compatible(self, other: "LatencyHistogram") -> None:
+        if (other.relative_accuracy, other.lowest_ms, other.highest_ms) != (
+            self.relative_accuracy, self.lowest_ms, self.highest_ms
+        ):
+            raise ValueError("Cannot merge histograms with different bucket layouts")
+
+    def merge(self, other: "LatencyHistogram") -> "LatencyHistogram":
+        """Add another histogram's counts into this one (in place)."""
+        self._check_compatible(other)
+        self.counts += other.counts
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def reset(self) -> None:
+        """Drop all recorded values."""
+        self.counts[:] = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def to_dict(self) -> Dict:
+        nz = np.flatnonzero(self.counts)
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "lowest_ms": self.lowest_ms,
+            "highest_ms": self.highest_ms,
+            "count": self.count,
+            "total": self.total,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+            "buckets": {str(i): int(self.counts[i]) for i in nz},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "LatencyHistogram":
+        hist = cls(data["relative_accuracy"], data["lowest_ms"], data["highest_ms"])
+        for i, c in data.get("buckets", {}).items():
+            hist.counts[int(i)] = c
+        hist.count = int(data["count"])
+        hist.total = float(data["total"])
+        if hist.count:
+            hist.min = float(data["min"])
+            hist.max = float(data["max"])
+        return hist
+
+    def save(self, path: Union[str, Path]) -> None:
+        Path(path).write_text(json.dumps(self.to_dict()), encoding="utf-8")
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "LatencyHistogram":
+        return cls.from_dict(json.loads(Path(path).read_text(encoding="utf-8")))
+
+
+class RollingLatencyHistogram:
+    """Latency quantiles over roughly the last ``window`` recorded values.
+
+    Two histograms are rotated every ``window`` records; queries cover the
+    previous and the current one, i.e. between ``window`` and ``2*window``
+    of the most recent values.
+    """
+
+    def __init__(self, window: int = 1000, **kwargs):
+        self.window = window
+        self._current = LatencyHistogram(**kwargs)
+        self._previous = LatencyHistogram(**kwargs)
+        self.lifetime = LatencyHistogram(**kwargs)
+
+    @property
+    def count(self) -> int:
+        return self._current.count + self._previous.count
+
+    def record(self, value_ms: float) -> None:
+        if self._current.count >= self.window:
+            self._previous, self._current = self._current, self._previous
+            self._current.reset()
+        self._current.record(value_ms)
+        self.lifetime.record(value_ms)
+
+    def quantile(self, q: float) -> float:
+        cur, prev = self._current, self._previous
+        if not prev.count:
+            return cur.quantile(q)
+        return cur._quantile(
+            cur.counts + prev.counts, cur.count + prev.count,
+            min(cur.min, prev.min), max(cur.max, prev.max), q,
+        )
+
+    def percentile(self, p: float) -> float:
+        return self.quantile(p / 100.0)
+
+
+def iter_csv_column(path: Union[str, Path], columns: Sequence[str]) -> Iterator[float]:
+    """Stream float values from the first of ``columns`` present in each CSV row."""
+    with Path(path).open(newline="") as fh:
+        for row in csv.DictReader(fh):
+            for key in columns:
+                if row.get(key):
+                    try:
+                        yield float(row[key])
+                        break
+                    except ValueError:
+                        pass
+
+
+def histogram_from_values(values: Iterable[float], **kwargs) -> LatencyHistogram:
+    """Build a histogram from a stream of values without materializing it."""
+    hist = LatencyHistogram(**kwargs)
+    for v in values:
+        hist.record(v)
+    return hist
+
+
+def sibling_histogram(path: Union[str, Path]) -> Optional[Path]:
+    """The ``<name>.hist.json`` saved with latency CSV ``path`` by the same run, if any.
+
+    The stream job writes the histogram after closing the CSV, so one older
+    than the CSV is left over from an earlier run and is ignored.
+    """
+    path = Path(path)
+    hist_path = path.with_suffix(".hist.json")
+    try:
+        hist_mtime = hist_path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+    if path.exists() and hist_mtime < path.stat().st_mtime_ns:
+        return None
+    return hist_path
+
+
+def load_latency_histogram(
+    path: Union[str, Path], columns: Sequence[str] = ("lat_ms",)
+) -> Optional[LatencyHistogram]:
+    """Load a histogram for a latency CSV.
+
+    Prefers the serialized sibling histogram of the same run
+    (``sibling_histogram``); otherwise streams ``columns`` from the CSV.
+    Returns None if neither exists.
+    """
+    path = Path(path)
+    hist_path = sibling_histogram(path)
+    if hist_path is not None:
+        return LatencyHistogram.load(hist_path)
+    if path.exists():
+        return histogram_from_values(iter_csv_column(path, columns))
+    return None
@@ -2,7 +2,8 @@
 import hmac
 import hashlib
 import os
-from typing import Optional, Dict, Pattern
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Pattern
 
 def get_salt() -> bytes:
     """Get salt from environment or use dev default.
@@ -24,6 +25,75 @@ def hmac_sha256_hex(value: str, tenant_salt: bytes) -> str:
     """
     return hmac.new(tenant_salt, value.encode(), hashlib.sha256).hexdigest()
 
+class Pseudonymizer:
+    """Tenant-scoped HMAC-SHA256 pseudonymizer.
+
+    The HMAC is keyed once and the keyed state is cloned per value, and full
+    digests of hot values (hosts, users, session keys) are memoized in a
+    bounded LRU, so repeated identifiers cost a dict lookup.
+    """
+
+    def __init__(self, key: bytes, max_cache: int = 65536):
+        """Create a pseudonymizer.
+
+        Args:
+            key: Tenant HMAC key (or salt)
+            max_cache: Maximum number of memoized values
+        """
+        self._keyed = hmac.new(key, digestmod=hashlib.sha256)
+        self.hexdigest = lru_cache(maxsize=max_cache)(self._hexdigest)
+
+    def _hexdigest(self, value: str) -> str:
+        h = self._keyed.copy()
+        h.update(value.encode())
+        return h.hexdigest()
+
+    def pseudonymize(self, value: Optional[str], prefix: str = "",
+                     length: Optional[int] = None) -> Optional[str]:
+        """Return ``prefix`` + the (optionally truncated) hex digest of ``value``.
+
+        Falsy values are returned unchanged.
+        """
+        if not value:
+            return value
+        return prefix + self.hexdigest(value)[:length]
+
+    def pseudonymize_many(self, values: Iterable[Optional[str]], prefix: str = "",
+                          length: Optional[int] = None) -> List[Optional[str]]:
+        """Pseudonymize a column, hashing each distinct value once."""
+        values = list(values)
+        distinct = {v: self.pseudonymize(v, prefix, length) for v in dict.fromkeys(values)}
+        return [distinct[v] for v in values]
+
+    def cache_info(self):
+        """LRU statistics (hits, misses, maxsize, currsize)."""
+        return self.hexdigest.cache_info()
+
+_PSEUDONYMIZERS: Dict[bytes, Pseudonymizer] = {}
+_DEFAULT_SALT: Optional[bytes] = None
+
+def get_pseudonymizer(tenant_salt: Optional[bytes] = None) -> Pseudonymizer:
+    """Shared pseudonymizer for a salt (default: ``get_salt()``, read once).
+
+    Args:
+        tenant_salt: Tenant-specific salt; None for the environment salt
+    """
+    global _DEFAULT_SALT
+    if tenant_salt is None:
+        if _DEFAULT_SALT is None:
+            _DEFAULT_SALT = get_salt()
+        tenant_salt = _DEFAULT_SALT
+    p = _PSEUDONYMIZERS.get(tenant_salt)
+    if p is None:
+        p = _PSEUDONYMIZERS[tenant_salt] = Pseudonymizer(tenant_salt)
+    return p
+
+def reset_pseudonymizers() -> None:
+    """Drop shared pseudonymizers (e.g. after rotating DOVAH_TENANT_SALT)."""
+    global _DEFAULT_SALT
+    _PSEUDONYMIZERS.clear()
+    _DEFAULT_SALT = None
+
 def pseudo_host(host: Optional[str]) -> Optional[str]:
     """Pseudonymize hostname using environment salt.
     
@@ -35,7 +105,7 @@ def pseudo_host(host: Optional[str]) -> Optional[str]:
     """
     if not host:
         return None
-    return "h_" + hmac_sha256_hex(host, get_salt())[:16]
+    return get_pseudonymizer().pseudonymize(host, "h_", 16)
 
 def pseudo_user(user: Optional[str]) -> Optional[str]:
     """Pseudonymize username using environment salt.
@@ -48,7 +118,7 @@ def pseudo_user(user: Optional[str]) -> Optional[str]:
     """
     if not user:
         return None
-    return "u_" + hmac_sha256_hex(user, get_salt())[:16]
+    return get_pseudonymizer().pseudonymize(user, "u_", 16)
 
 def pseudonymize(value: Optional[str], prefix: str = "") -> Optional[str]:
     """Generic pseudonymization function using environment salt.
@@ -62,4 +132,8 @@ def pseudonymize(value: Optional[str], prefix: str = "") -> Optional[str]:
     """
     if not value:
         return None
-    return prefix + hmac_sha256_hex(value, get_salt())[:16]
+    return get_pseudonymizer().pseudonymize(value, prefix, 16)
+
+def pseudonymize_many(values: Iterable[Optional[str]], prefix: str = "") -> List[Optional[str]]:
+    """Vectorized ``pseudonymize`` over a column (None for falsy values)."""
+    return [v or None for v in get_pseudonymizer().pseudonymize_many(values, prefix, 16)]
@@ -0,0 +1,247 @@
+"""Precompiled JSON-schema validation for hot paths.
+
+``jsonschema.validate`` builds a validator, checks the metaschema and walks
+the schema on every call. ``compile_schema`` instead generates one Python
+function per schema that checks an instance with straight-line
+``isinstance`` / ``in`` tests. It covers the keyword subset our event schemas
+use (``type``, ``enum``, ``required``, ``properties``,
+``additionalProperties``, ``pattern``, ``items``). Schemas with other
+keywords fall back to a cached ``jsonschema`` validator. As with
+``jsonschema.validate``, ``format`` is not asserted.
+
+``SchemaValidator`` wraps the compiled check with a validation mode:
+
+- ``full``: every instance;
+- ``sampled``: one instance in ``sample_every``;
+- ``first_n``: the first ``first_n`` instances per source (e.g. host).
+
+Failures are re-checked by ``jsonschema`` so callers get the usual
+``jsonschema.ValidationError`` with its message and path.
+"""
+import json
+import logging
+import re
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Union
+
+import jsonschema
+
+logger = logging.getLogger(__name__)
+
+MODES = ("full", "sampled", "first_n")
+
+# Keywords that never affect validity
+_ANNOTATIONS = {"$schema", "$id", "$comment", "title", "description", "format", "default", "examples"}
+_SUPPORTED = _ANNOTATIONS | {"type", "enum", "required", "properties", "additionalProperties", "pattern", "items"}
+
+_TYPE_CHECKS = {
+    "string": "isinstance({v}, str)",
+    "number": "(isinstance({v}, (int, float)) and not isinstance({v}, bool))",
+    "integer": "((isinstance({v}, int) and not isinstance({v}, bool)) "
+               "or (isinstance({v}, float) and {v}.is_integer()))",
+    "boolean": "isinstance({v}, bool)",
+    "null": "{v} is None",
+    "object": "isinstance({v}, dict)",
+    "array": "isinstance({v}, list)",
+}
+
+
+class _Unsupported(Exception):
+    pass
+
+
+class _CodeGen:
+    def __init__(self):
+        self.lines: List[str] = []
+        self.env: Dict[str, Any] = {"_MISSING": object()}
+        self._n = 0
+
+    def name(self, prefix: str) -> str:
+        self._n += 1
+        return f"{prefix}{self._n}"
+
+    def emit(self, depth: int, line: str) -> None:
+        self.lines.append("    " * depth + line)
+
+    def schema(self, schema: Any, v: str, depth: int) -> None:
+        if schema is True or schema == {}:
+            return
+        if not isinstance(schema, dict) or not set(schema) <= _SUPPORTED:
+            raise _Unsupported
+        types = schema.get("type")
+        if types is not None:
+            types = [types] if isinstance(types, str) else list(types)
+            if not set(types) <= set(_TYPE_CHECKS):
+                raise _Unsupported
+            cond = " or ".join(_TYPE_CHECKS[t].format(v=v) for t in types)
+            self.emit(depth, f"if not ({cond}): return False")
+        if "enum" in schema:
+            values = schema["enum"]
+            # Plain membership is only exact for str/None (1 == True == 1.0 otherwise)
+            if not all(x is None or isinstance(x, str) for x in values):
+                raise _Unsupported
+            const = self.name("_enum")
+            self.env[const] = frozenset(values)
+            self.emit(depth, f"if not ((isinstance({v}, str) or {v} is None) and {v} in {const}): return False")
+        if "pattern" in schema:
+            rx = self.name("_rx")
+            self.env[rx] = re.compile(schema["pattern"]).search
+            self.emit(depth, f"if isinstance({v}, str) and {rx}({v}) is None: return False")
+        if "items" in schema:
+            item = self.name("i")
+            self.emit(depth, f"if isinstance({v}, list):")
+            self.emit(depth + 1, f"for {item} in {v}:")
+            start = len(self.lines)
+            self.schema(schema["items"], item, depth + 2)
+            if len(self.lines) == start:
+                self.emit(depth + 2, "pass")
+        if any(k in schema for k in ("required", "properties", "additionalProperties")):
+            self.object(schema, v, depth)
+
+    def object(self, schema: Dict, v: str, depth: int) -> None:
+        props = schema.get("properties", {})
+        extra = schema.get("additionalProperties", True)
+        if extra not in (True, False):
+            raise _Unsupported
+        self.emit(depth, f"if isinstance({v}, dict):")
+        depth += 1
+        start = len(self.lines)
+        for key in schema.get("required", []):
+            self.emit(depth, f"if {key!r} not in {v}: return False")
+        for key, sub in props.items():
+            if sub is True or sub == {}:
+                continue
+            pv = self.name("p")
+            self.emit(depth, f"{pv} = {v}.get({key!r}, _MISSING)")
+            self.emit(depth, f"if {pv} is not _MISSING:")
+            body = len(self.lines)
+            self.schema(sub, pv, depth + 1)
+            if len(self.lines) == body:
+                self.emit(depth + 1, "pass")
+        if extra is False:
+            allowed = self.name("_props")
+            self.env[allowed] = frozenset(props)
+            self.emit(depth, f"if len({v}) > len({allowed}) or not {allowed}.issuperset({v}): return False")
+        if len(self.lines) == start:
+            self.emit(depth, "pass")
+
+
+def compile_schema(schema: Dict[str, Any]) -> Callable[[Any], bool]:
+    """Compile ``schema`` to a fast ``check(instance) -> bool`` function."""
+    gen = _CodeGen()
+    try:
+        gen.schema(schema, "inst", 1)
+    except _Unsupported:
+        logger.debug("Schema uses unsupported keywords; using jsonschema for checks")
+        return _jsonschema_validator(schema).is_valid
+    source = "def check(inst):\n" + "\n".join(gen.lines + ["    return True"]) + "\n"
+    exec(compile(source, "<compiled schema>", "exec"), gen.env)
+    check = gen.env["check"]
+    check.source = source  # for debugging
+    return check
+
+
+def _jsonschema_validator(schema: Dict[str, Any]):
+    cls = jsonschema.validators.validator_for(schema)
+    cls.check_schema(schema)
+    return cls(schema)
+
+
+class SchemaValidator:
+    """Compiled schema check with full / sampled / first-N-per-source modes."""
+
+    def __init__(
+        self,
+        schema: Dict[str, Any],
+        mode: str = "full",
+        sample_every: int = 100,
+        first_n: int = 1000,
+        source_key: str = "host",
+    ):
+        """Compile ``schema`` once.
+
+        Args:
+            schema: JSON schema dict
+            mode: ``full``, ``sampled`` or ``first_n`` (``first-n`` accepted)
+            sample_every: In ``sampled`` mode, validate one instance in this many
+            first_n: In ``first_n`` mode, instances validated per source
+            source_key: Instance field identifying the source in ``first_n`` mode
+        """
+        mode = mode.replace("-", "_")
+        if mode not in MODES:
+            raise ValueError(f"Unknown validation mode: {mode} (expected one of {MODES})")
+        if sample_every < 1 or first_n < 0:
+            raise ValueError("sample_every must be >= 1 and first_n >= 0")
+        self.schema = schema
+        self.mode = mode
+        self.sample_every = sample_every
+        self.first_n = first_n
+        self.source_key = source_key
+        self.check = compile_schema(schema)
+        self._validator = _jsonschema_validator(schema)
+        self._per_source: Dict[Any, int] = {}
+        self.stats = {"seen": 0, "validated": 0, "skipped": 0, "failed": 0}
+
+    def should_validate(self, instance: Any) -> bool:
+        """Whether ``instance`` is selected for validation under the mode."""
+        if self.mode == "full":
+            return True
+        if self.mode == "sampled":
+            return self.stats["seen"] % self.sample_every == 0
+        source = instance.get(self.source_key) if isinstance(instance, dict) else None
+        n = self._per_source.get(source, 0)
+        if n >= self.first_n:
+            return False
+        self._per_source[source] = n + 1
+        return True
+
+    def validate(self, instance: Any) -> None:
+        """Validate unconditionally.
+
+        Raises:
+            jsonschema.ValidationError: If the instance does not conform
+        """
+        if not self.check(instance):
+            try:
+                self._validator.validate(instance)
+            except jsonschema.ValidationError:
+                self.stats["failed"] += 1
+                raise
+
+    def is_valid(self, instance: Any) -> bool:
+        return self.check(instance)
+
+    def __call__(self, instance: Any) -> bool:
+        """Validate ``instance`` if the mode selects it.
+
+        Returns:
+            True if it was validated, False if it was skipped
+
+        Raises:
+            jsonschema.ValidationError: If a selected instance does not conform
+        """
+        selected = self.should_validate(instance)
+        self.stats["seen"] += 1
+        if not selected:
+            self.stats["skipped"] += 1
+            return False
+        self.stats["validated"] += 1
+        self.validate(instance)
+        return True
+
+
+_COMPILED: Dict[str, SchemaValidator] = {}
+
+
+def get_validator(schema: Dict[str, Any]) -> SchemaValidator:
+    """Shared full-mode validator for ``schema`` (compiled once per distinct schema)."""
+    key = json.dumps(schema, sort_keys=True)
+    validator = _COMPILED.get(key)
+    if validator is None:
+        validator = _COMPILED[key] = SchemaValidator(schema)
+    return validator
+
+
+def load_validator(path: Union[str, Path], **kwargs) -> SchemaValidator:
+    """Load a schema file and compile it (``kwargs`` go to ``SchemaValidator``)."""
+    return SchemaValidator(json.loads(Path(path).read_text()), **kwargs)
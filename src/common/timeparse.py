@@ -0,0 +1,221 @@
+"""Unified timestamp parsing.
+
+One parser for every ingest, stream and eval path. ``TimestampParser``
+sniffs the format of the first value it sees (ISO 8601 / RFC 3339, numeric
+epoch, HDFS ``yymmdd HHMMSS``) and keeps using that specialized fast path,
+re-sniffing only when a value doesn't fit. Results are timezone-aware UTC
+datetimes or integer epoch nanoseconds; ``parse_many_ns`` is the vectorized
+(pandas) path for whole columns.
+"""
+import re
+from datetime import datetime, timedelta, timezone, tzinfo
+from functools import lru_cache
+from typing import Any, Callable, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+UTC = timezone.utc
+EPOCH = datetime(1970, 1, 1, tzinfo=UTC)
+NAT_NS = np.iinfo(np.int64).min  # pandas NaT as int64
+
+# Generic fallback: date, time, optional fraction and zone, trailing text ignored
+_GENERIC = re.compile(
+    r"(\d{4})-(\d{2})-(\d{2})[T ](\d{2}):(\d{2}):(\d{2})"
+    r"(?:[.,](\d{1,9}))?\s*(Z|[+-]\d{2}:?\d{2})?"
+)
+_HDFS = re.compile(r"(\d{2})(\d{2})(\d{2}) (\d{2})(\d{2})(\d{2})$")
+_OFFSET_SUFFIX = re.compile(r"(?:[Zz]|[+-]\d{2}(?::?\d{2})?)\s*$")
+
+
+@lru_cache(maxsize=256)
+def tz_from_offset(offset: str) -> tzinfo:
+    """``timezone`` for ``Z`` / ``+HH:MM`` / ``-HHMM`` (cached per string)."""
+    if offset in ("Z", "z"):
+        return UTC
+    digits = offset[1:].replace(":", "")
+    if len(digits) != 4 or not digits.isdigit():
+        raise ValueError(f"Invalid UTC offset: {offset}")
+    minutes = int(digits[:2]) * 60 + int(digits[2:])
+    if minutes == 0:
+        return UTC
+    return timezone(timedelta(minutes=-minutes if offset[0] == "-" else minutes))
+
+
+def to_epoch_ns(dt: datetime) -> int:
+    """Exact integer epoch nanoseconds of an aware datetime."""
+    td = dt - EPOCH
+    return (td.days * 86_400 + td.seconds) * 1_000_000_000 + td.microseconds * 1_000
+
+
+def from_epoch_ns(ns: int) -> datetime:
+    """UTC datetime for epoch nanoseconds (truncated to microseconds)."""
+    return EPOCH + timedelta(microseconds=ns // 1_000)
+
+
+def _finish(dt: datetime, default_tz: Optional[tzinfo]) -> datetime:
+    if dt.tzinfo is None:
+        if default_tz is None:
+            raise ValueError("Missing timezone")
+        dt = dt.replace(tzinfo=default_tz)
+    return dt if dt.tzinfo is UTC else dt.astimezone(UTC)
+
+
+def _parse_iso(s: str, default_tz: Optional[tzinfo]) -> datetime:
+    if len(s) < 16:  # date-only or truncated: not a timestamp
+        raise ValueError(f"Invalid timestamp format: {s}")
+    return _finish(datetime.fromisoformat(s), default_tz)
+
+
+def _parse_epoch(s: str, default_tz: Optional[tzinfo]) -> datetime:
+    return _from_number(float(s))
+
+
+def _parse_hdfs(s: str, default_tz: Optional[tzinfo]) -> datetime:
+    m = _HDFS.match(s)
+    if not m:
+        raise ValueError(f"Invalid timestamp format: {s}")
+    y, mo, d, h, mi, sec = map(int, m.groups())
+    return _finish(datetime(2000 + y, mo, d, h, mi, sec), default_tz)
+
+
+def _parse_generic(s: str, default_tz: Optional[tzinfo]) -> datetime:
+    m = _GENERIC.match(s)
+    if not m:
+        raise ValueError(f"Invalid timestamp format: {s}")
+    y, mo, d, h, mi, sec, frac, off = m.groups()
+    micros = int((frac or "0").ljust(6, "0")[:6])
+    dt = datetime(int(y), int(mo), int(d), int(h), int(mi), int(sec), micros,
+                  tzinfo=tz_from_offset(off) if off else None)
+    return _finish(dt, default_tz)
+
+
+def _from_number(v: float) -> datetime:
+    # Seconds, milliseconds, microseconds or nanoseconds by magnitude
+    a = abs(v)
+    if a < 1e11:
+        return EPOCH + timedelta(seconds=v)
+    if a < 1e14:
+        return EPOCH + timedelta(milliseconds=v)
+    if a < 1e17:
+        return EPOCH + timedelta(microseconds=v)
+    return EPOCH + timedelta(microseconds=v / 1_000)
+
+
+# Sniffing order: most common first; generic regex last
+FORMATS = {
+    "iso": _parse_iso,
+    "epoch": _parse_epoch,
+    "hdfs": _parse_hdfs,
+    "generic": _parse_generic,
+}
+
+
+class TimestampParser:
+    """Parser that locks onto the format of the stream it is fed."""
+
+    def __init__(self, default_tz: Optional[tzinfo] = UTC, formats: Iterable[str] = tuple(FORMATS)):
+        """Create a parser.
+
+        Args:
+            default_tz: Zone assumed for values without an offset; None to
+                reject them (strict RFC 3339)
+            formats: Names of the ``FORMATS`` to accept, in sniffing order;
+                without ``epoch``, numbers are rejected too
+        """
+        self.default_tz = default_tz
+        self.formats = {name: FORMATS[name] for name in formats}
+        self.format: Optional[str] = None
+        self._fast: Optional[Callable[[str, Optional[tzinfo]], datetime]] = None
+
+    def _sniff(self, s: str) -> datetime:
+        error: Optional[Exception] = None
+        for name, fn in self.formats.items():
+            try:
+                dt = fn(s, self.default_tz)
+            except (ValueError, OverflowError) as e:
+                error = error or e
+                continue
+            self.format, self._fast = name, fn
+            return dt
+        raise ValueError(f"Invalid timestamp format: {s}") from error
+
+    def parse(self, value: Any) -> datetime:
+        """Parse a string, number (epoch) or datetime to an aware UTC datetime.
+
+        Raises:
+            ValueError: If the value is not a recognizable timestamp
+        """
+        if isinstance(value, str):
+            s = value.strip()
+            if self._fast is not None:
+                try:
+                    return self._fast(s, self.default_tz)
+                except (ValueError, OverflowError):
+                    pass
+            return self._sniff(s)
+        if isinstance(value, datetime):
+            return _finish(value, self.default_tz)
+        if isinstance(value, (int, float)) and not isinstance(value, bool) and "epoch" in self.formats:
+            return _from_number(value)
+        raise ValueError(f"Unparseable timestamp: {value!r}")
+
+    def parse_ns(self, value: Any) -> int:
+        """Parse to integer epoch nanoseconds."""
+        if isinstance(value, int) and not isinstance(value, bool) and abs(value) >= 1e17:
+            return value
+        return to_epoch_ns(self.parse(value))
+
+
+def parse_ts(value: Any, default_tz: Optional[tzinfo] = UTC) -> datetime:
+    """Parse one timestamp to an aware UTC datetime (see ``TimestampParser``).
+
+    Sniffs the format afresh on every call. Hot paths keep a
+    ``TimestampParser`` per source instead, so the format one source locks
+    onto never applies to another.
+    """
+    return TimestampParser(default_tz).parse(value)
+
+
+def parse_ts_ns(value: Any) -> int:
+    """Parse one timestamp to epoch nanoseconds (a fresh parse, like ``parse_ts``)."""
+    return TimestampParser().parse_ns(value)
+
+
+def parse_many_ns(values: Iterable[Any]) -> np.ndarray:
+    """Vectorized parse of a column to int64 epoch nanoseconds.
+
+    ISO strings go through pandas (``format="ISO8601"``, pandas 2.0 or
+    later), one call for values with a UTC offset and one for naive values:
+    from pandas 2.2 on, a naive value in a mixed call takes the offset of
+    the values before it instead of UTC. Numbers are epoch values; anything
+    pandas rejects is retried with the scalar parser. Unparseable entries
+    become ``NAT_NS``.
+    """
+    values = list(values)
+    out = np.full(len(values), NAT_NS, dtype=np.int64)
+    if not values:
+        return out
+    is_str = np.fromiter((isinstance(v, str) for v in values), dtype=bool, count=len(values))
+    if is_str.any():
+        idx = np.flatnonzero(is_str)
+        has_offset = np.fromiter((_OFFSET_SUFFIX.search(values[i]) is not None for i in idx),
+                                 dtype=bool, count=len(idx))
+        for group in (idx[has_offset], idx[~has_offset]):
+            if len(group):
+                parsed = pd.to_datetime(
+                    pd.Series([values[i] for i in group], dtype=object),
+                    utc=True, format="ISO8601", errors="coerce",
+                )
+                out[group] = parsed.to_numpy(dtype="datetime64[ns]").view(np.int64)
+        # pandas also accepts date-only strings; leave short values to the scalar path
+        short = np.fromiter((len(values[i]) < 16 for i in idx), dtype=bool, count=len(idx))
+        out[idx[short]] = NAT_NS
+    parser = TimestampParser()
+    for i in np.flatnonzero(out == NAT_NS):
+        v = values[i]
+        try:
+            out[i] = parser.parse_ns(v)
+        except (ValueError, TypeError):
+            pass
+    return out
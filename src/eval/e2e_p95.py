@@ -3,7 +3,8 @@ import argparse
 import csv
 import subprocess
 from pathlib import Path
-import numpy as np
+
+from src.common.latency import LatencyHistogram, histogram_from_values, iter_csv_column, sibling_histogram
 
 
 def run_pipeline(phase: str) -> None:
@@ -16,21 +17,21 @@ def run_pipeline(phase: str) -> None:
 def compute_p95_from_latency_csv(csv_path: Path) -> float:
     if not csv_path.exists():
         raise FileNotFoundError(f"latency file not found: {csv_path}")
-    vals = []
-    with csv_path.open() as fh:
-        reader = csv.DictReader(fh)
-        # Expect a column named 'lat_ms' (match your features writer)
-        col = "lat_ms"
-        if col not in reader.fieldnames:
-            raise RuntimeError(f"Expected column '{col}' in {csv_path}, got {reader.fieldnames}")
-        for row in reader:
-            try:
-                vals.append(float(row[col]))
-            except Exception:
-                continue
-    if not vals:
+    # The features job saves a histogram next to the CSV; use it when it is from this run
+    hist_path = sibling_histogram(csv_path)
+    if hist_path is not None:
+        hist = LatencyHistogram.load(hist_path)
+    else:
+        with csv_path.open() as fh:
+            reader = csv.DictReader(fh)
+            # Expect a column named 'lat_ms' (match your features writer)
+            col = "lat_ms"
+            if col not in reader.fieldnames:
+                raise RuntimeError(f"Expected column '{col}' in {csv_path}, got {reader.fieldnames}")
+        hist = histogram_from_values(iter_csv_column(csv_path, (col,)))
+    if not hist.count:
         raise RuntimeError(f"No latency values parsed from {csv_path}")
-    return float(np.percentile(vals, 95))
+    return hist.percentile(95)
 
 
 def main() -> int:
@@ -1,19 +1,16 @@
 from __future__ import annotations
 import argparse, json
-from datetime import datetime, timezone
+from datetime import datetime
 from pathlib import Path
 from typing import Dict, Any, Optional, List
 
+from ..common.timeparse import TimestampParser
+
+_TS_PARSER = TimestampParser()
+
 def _parse_ts(v: Any) -> datetime:
-    if isinstance(v, (int, float)):
-        # treat as seconds epoch
-        return datetime.fromtimestamp(v, tz=timezone.utc)
-    if isinstance(v, str):
-        s = v.strip().replace(" ", "T")
-        if s.endswith("Z"):
-            s = s[:-1] + "+00:00"
-        return datetime.fromisoformat(s)
-    raise ValueError(f"Unparseable ts: {v!r}")
+    # numbers are epoch (s/ms/us/ns by magnitude); strings ISO-8601, naive = UTC
+    return _TS_PARSER.parse(v)
 
 def _bounds(ts_list: List[datetime], parts: int) -> List[datetime]:
     mn, mx = min(ts_list), max(ts_list)
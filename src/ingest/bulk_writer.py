@@ -0,0 +1,213 @@
+"""Streaming bulk writer for parsed events into Postgres.
+
+``BulkEventWriter`` feeds events through ``COPY ... FROM STDIN`` in bounded
+chunks, so memory stays flat regardless of input size and each chunk is a
+single round-trip instead of one INSERT per row. With ``staging=True`` each
+chunk is copied into a temporary table first and merged into the target
+with ``INSERT ... SELECT ... WHERE NOT EXISTS`` on ``merge_key``, which makes
+re-loading the same file idempotent.
+
+COPY needs a psycopg (v3) connection; for other engines (e.g. SQLite in
+tests) the writer falls back to chunked ``executemany`` inserts.
+"""
+import json
+import logging
+import time
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Column order of ParsedLogEvent rows (hdfs_events / hdfs_logs)
+EVENT_COLUMNS: Tuple[str, ...] = (
+    "ts", "host", "component", "template_id", "session_id", "level", "labels", "schema_ver",
+)
+
+# Natural key used to skip rows already present when merging from staging
+DEFAULT_MERGE_KEY: Tuple[str, ...] = ("ts", "host", "component", "template_id", "session_id")
+
+# Values for NULL fields of a table's NOT NULL columns: db/migrations/0001
+# declares hdfs_logs.level NOT NULL, while ParsedLogEvent.level is optional
+NOT_NULL_DEFAULTS: Dict[str, Dict[str, Any]] = {
+    "hdfs_logs": {"level": "UNKNOWN"},
+}
+
+HDFS_EVENTS_DDL = """
+CREATE TABLE IF NOT EXISTS hdfs_events (
+  ts           TIMESTAMPTZ NOT NULL,
+  host         TEXT        NOT NULL,
+  component    TEXT        NOT NULL,
+  template_id  INTEGER,
+  session_id   TEXT,
+  level        TEXT,
+  labels       JSONB,
+  schema_ver   TEXT
+)
+"""
+
+
+def event_row(
+    event: Any,
+    columns: Sequence[str] = EVENT_COLUMNS,
+    defaults: Optional[Dict[str, Any]] = None,
+) -> Tuple:
+    """Project an event (pydantic model or dict) onto ``columns``.
+
+    Reads attributes directly rather than calling ``model_dump()``; ``labels``
+    is serialized to compact JSON for the JSONB column. Missing (None)
+    values of columns in ``defaults`` are replaced by their default.
+    """
+    get = event.get if isinstance(event, dict) else lambda c: getattr(event, c, None)
+    row = []
+    for col in columns:
+        value = get(col)
+        if value is None and defaults:
+            value = defaults.get(col)
+        if col == "labels" and value is not None:
+            value = json.dumps(value, separators=(",", ":"), default=str)
+        row.append(value)
+    return tuple(row)
+
+
+def _chunks(rows: Iterable[Tuple], size: int) -> Iterator[List[Tuple]]:
+    it = iter(rows)
+    while chunk := list(islice(it, size)):
+        yield chunk
+
+
+class BulkEventWriter:
+    """Chunked COPY writer with optional staging-table merge."""
+
+    def __init__(
+        self,
+        engine: Engine,
+        table: str = "hdfs_events",
+        columns: Sequence[str] = EVENT_COLUMNS,
+        chunk_rows: int = 50_000,
+        staging: bool = False,
+        merge_key: Sequence[str] = DEFAULT_MERGE_KEY,
+        defaults: Optional[Dict[str, Any]] = None,
+    ):
+        """Configure the writer.
+
+        Args:
+            engine: SQLAlchemy engine (``postgresql+psycopg`` for COPY)
+            table: Target table, e.g. ``hdfs_events`` or ``hdfs_logs``
+            columns: Target columns, in ``event_row`` order
+            chunk_rows: Rows per COPY (bounds client memory and transaction size)
+            staging: Copy into a temp table and merge, skipping existing rows
+            merge_key: Columns identifying an existing row when ``staging``
+            defaults: Values for missing fields, by column (default: the
+                table's ``NOT_NULL_DEFAULTS``)
+        """
+        if chunk_rows < 1:
+            raise ValueError("chunk_rows must be positive")
+        self.engine = engine
+        self.table = table
+        self.columns = tuple(columns)
+        self.chunk_rows = chunk_rows
+        self.staging = staging
+        self.merge_key = tuple(merge_key)
+        self.defaults = NOT_NULL_DEFAULTS.get(table, {}) if defaults is None else dict(defaults)
+
+    @property
+    def supports_copy(self) -> bool:
+        return self.engine.dialect.name == "postgresql" and self.engine.dialect.driver == "psycopg"
+
+    def ensure_table(self) -> None:
+        """Create ``hdfs_events`` if missing (``hdfs_logs`` comes from db/migrations)."""
+        if self.table == "hdfs_events":
+            with self.engine.begin() as cx:
+                cx.exec_driver_sql(HDFS_EVENTS_DDL)
+
+    def write_events(self, events: Iterable[Any]) -> Dict[str, float]:
+        """Write events (models or dicts); see ``write_rows``."""
+        return self.write_rows(event_row(e, self.columns, self.defaults) for e in events)
+
+    def write_rows(self, rows: Iterable[Tuple]) -> Dict[str, float]:
+        """Stream row tuples into the target table, one transaction per chunk.
+
+        Returns:
+            Dict with ``rows`` (copied), ``inserted`` (after merge),
+            ``chunks``, ``seconds`` and ``rows_per_sec``
+        """
+        write_chunk = self._copy_chunk if self.supports_copy else self._insert_chunk
+        stats = {"rows": 0, "inserted": 0, "chunks": 0}
+        t0 = time.perf_counter()
+        for chunk in _chunks(rows, self.chunk_rows):
+            stats["inserted"] += write_chunk(chunk)
+            stats["rows"] += len(chunk)
+            stats["chunks"] += 1
+            logger.debug(f"Wrote chunk {stats['chunks']} ({len(chunk)} rows) to {self.table}")
+        stats["seconds"] = time.perf_counter() - t0
+        stats["rows_per_sec"] = stats["rows"] / stats["seconds"] if stats["seconds"] > 0 else 0.0
+        logger.info(
+            f"Wrote {stats['inserted']}/{stats['rows']} rows to {self.table} in "
+            f"{stats['seconds']:.2f}s ({stats['rows_per_sec']:.0f} rows/s)"
+        )
+        return stats
+
+    def _merge_sql(self, source: str) -> str:
+        cols = ", ".join(self.columns)
+        key = ", ".join(self.merge_key)
+        match = " AND ".join(f"t.{c} IS NOT DISTINCT FROM s.{c}" for c in self.merge_key)
+        return (
+            f"INSERT INTO {self.table} ({cols}) "
+            f"SELECT DISTINCT ON ({key}) {cols} FROM {source} s "
+            f"WHERE NOT EXISTS (SELECT 1 FROM {self.table} t WHERE {match})"
+        )
+
+    def _copy_chunk(self, chunk: List[Tuple]) -> int:
+        cols = ", ".join(self.columns)
+        raw = self.engine.raw_connection()
+        try:
+            conn = raw.driver_connection
+            with conn.cursor() as cur:
+                if self.staging:
+                    cur.execute(
+                        f"CREATE TEMP TABLE IF NOT EXISTS _stage_{self.table} "
+                        f"(LIKE {self.table} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+                    )
+                    target = f"_stage_{self.table}"
+                else:
+                    target = self.table
+                with cur.copy(f"COPY {target} ({cols}) FROM STDIN") as copy:
+                    for row in chunk:
+                        copy.write_row(row)
+                inserted = len(chunk)
+                if self.staging:
+                    cur.execute(self._merge_sql(target))
+                    inserted = cur.rowcount
+            conn.commit()
+            return inserted
+        except Exception:
+            raw.rollback()
+            raise
+        finally:
+            raw.close()
+
+    def _insert_chunk(self, chunk: List[Tuple]) -> int:
+        cols = ", ".join(self.columns)
+        params = [dict(zip(self.columns, row)) for row in chunk]
+        values = ", ".join(f":{c}" for c in self.columns)
+        with self.engine.begin() as cx:
+            if not self.staging:
+                cx.execute(text(f"INSERT INTO {self.table} ({cols}) VALUES ({values})"), params)
+                return len(chunk)
+            # Portable merge: skip rows whose merge key already exists
+            key_params = [{c: p[c] for c in self.merge_key} for p in params]
+            op = "IS" if self.engine.dialect.name == "sqlite" else "IS NOT DISTINCT FROM"
+            match = " AND ".join(f"{c} {op} :{c}" for c in self.merge_key)
+            exists = text(f"SELECT 1 FROM {self.table} WHERE {match} LIMIT 1")
+            inserted, seen = 0, set()
+            for p, kp in zip(params, key_params):
+                key = tuple(kp.values())
+                if key in seen or cx.execute(exists, kp).first() is not None:
+                    continue
+                seen.add(key)
+                cx.execute(text(f"INSERT INTO {self.table} ({cols}) VALUES ({values})"), p)
+                inserted += 1
+            return inserted
@@ -1,8 +1,14 @@
 """Event deduplication with content hashing."""
 import hashlib
 import json
-from typing import List, Dict, Set, Tuple
-from datetime import datetime
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Unit separator between fingerprinted fields, so ("ab", "c") != ("a", "bc")
+_FIELD_SEP = b"\x1f"
 
 def generate_event_hash(event: Dict, 
                        content_keys: List[str] = None) -> str:
@@ -27,15 +33,166 @@ def generate_event_hash(event: Dict,
     
     return hashlib.sha256(content_str.encode()).hexdigest()
 
+def _field_bytes(f: Any) -> bytes:
+    if isinstance(f, str):
+        return f.encode()
+    if isinstance(f, (dict, list, tuple)):
+        # canonical form: equal containers hash equal whatever their key order
+        return json.dumps(f, sort_keys=True, default=str).encode()
+    return repr(f).encode()
+
+
+def fingerprint(fields: Tuple[Any, ...], digest_size: int = 16) -> bytes:
+    """Fixed-width blake2b digest of a projected field tuple.
+
+    Args:
+        fields: Field values to hash (``str`` hashed as-is, dicts and lists
+            as sorted-key JSON, others by ``repr``)
+        digest_size: Digest width in bytes (8-16 is plenty for dedup)
+
+    Returns:
+        ``digest_size`` raw bytes
+    """
+    return hashlib.blake2b(
+        _FIELD_SEP.join(_field_bytes(f) for f in fields),
+        digest_size=digest_size,
+    ).digest()
+
+
+def event_fingerprint(event: Dict,
+                      content_keys: List[str] = None,
+                      digest_size: int = 16) -> bytes:
+    """Binary dedup key over ``content_keys`` of an event.
+
+    Same projection as ``generate_event_hash`` (all keys except timestamp by
+    default) but without building a JSON string per event.
+    """
+    if content_keys is None:
+        content_keys = [k for k in event.keys() if k != 'timestamp']
+    keys = sorted(k for k in content_keys if k in event)
+    return fingerprint(
+        tuple(keys) + tuple(event[k] for k in keys), digest_size
+    )
+
+
+class DedupStore:
+    """Memory-bounded, time-windowed set of event fingerprints.
+
+    Keys are fixed-width binary digests kept in time-bucketed generations:
+    each generation covers ``ttl / buckets`` seconds of event time, and
+    generations older than ``ttl`` are dropped whole as event time advances,
+    so eviction is O(1) amortized and needs no per-key scan. The total
+    number of keys is hard-capped at ``max_keys``; when the cap is hit the
+    oldest generation is evicted early (which may let a few old duplicates
+    through, but never grows memory).
+    """
+
+    def __init__(self,
+                 ttl: float = 300,
+                 buckets: int = 8,
+                 max_keys: int = 1_000_000,
+                 digest_size: int = 16):
+        """Create an empty store.
+
+        Args:
+            ttl: Dedup window in seconds of event time
+            buckets: Generations per ``ttl`` (eviction granularity)
+            max_keys: Hard cap on stored keys (~100 bytes each)
+            digest_size: Width of keys built by ``key()``
+        """
+        if ttl <= 0 or buckets < 1 or max_keys < 1:
+            raise ValueError("ttl, buckets and max_keys must be positive")
+        self.ttl = ttl
+        self.buckets = buckets
+        self.max_keys = max_keys
+        self.digest_size = digest_size
+        self._width = ttl / buckets
+        # bucket index -> {key: event time it was last kept}
+        self._generations: "OrderedDict[int, Dict[bytes, float]]" = OrderedDict()
+        self._size = 0
+        self.stats = {'added': 0, 'duplicates': 0, 'expired': 0, 'evicted': 0}
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, key: bytes) -> bool:
+        return self._lookup(key) is not None
+
+    def key(self, *fields: Any) -> bytes:
+        """Fingerprint a field tuple with this store's digest size."""
+        return fingerprint(fields, self.digest_size)
+
+    def _lookup(self, key: bytes) -> Optional[int]:
+        # Newest generation first: recent duplicates are the common case
+        for bucket in reversed(self._generations):
+            if key in self._generations[bucket]:
+                return bucket
+        return None
+
+    def _drop_oldest(self) -> int:
+        _, generation = self._generations.popitem(last=False)
+        self._size -= len(generation)
+        return len(generation)
+
+    def _advance(self, bucket: int) -> None:
+        if self._generations and bucket <= next(reversed(self._generations)):
+            return
+        self._generations[bucket] = {}
+        # Keep enough generations to always cover a full ttl behind ``bucket``
+        while next(iter(self._generations)) < bucket - self.buckets:
+            self.stats['expired'] += self._drop_oldest()
+
+    def check_and_add(self, key: bytes, ts: float) -> bool:
+        """Record ``key`` seen at event time ``ts`` (epoch seconds).
+
+        Returns:
+            True if the key is new (keep the event), False if it was already
+            kept within the last ``ttl`` seconds
+        """
+        self._advance(int(ts // self._width))
+        found = self._lookup(key)
+        if found is not None:
+            generation = self._generations[found]
+            if ts - generation[key] <= self.ttl:
+                self.stats['duplicates'] += 1
+                return False
+            del generation[key]
+            self._size -= 1
+
+        newest = next(reversed(self._generations))
+        self._generations[newest][key] = ts
+        self._size += 1
+        self.stats['added'] += 1
+
+        if self._size > self.max_keys:
+            evicted = self._drop_oldest()
+            if not self._generations:
+                self._generations[newest] = {}
+            self.stats['evicted'] += evicted
+            logger.warning(
+                f"Dedup store reached {self.max_keys} keys; evicted {evicted} "
+                f"keys before their {self.ttl}s TTL"
+            )
+        return True
+
+    def clear(self) -> None:
+        """Drop all keys (stats are kept)."""
+        self._generations.clear()
+        self._size = 0
+
+
 def dedup_events(events: List[Dict],
                 window: int = 300,
-                content_keys: List[str] = None) -> Tuple[List[Dict], Dict]:
+                content_keys: List[str] = None,
+                store: Optional[DedupStore] = None) -> Tuple[List[Dict], Dict]:
     """Remove duplicate events within time window.
     
     Args:
         events: List of event dicts
         window: Time window in seconds to check for dupes
         content_keys: List of keys to use for content hash
+        store: Dedup store to check against and update; pass a long-lived
+            store to dedup across calls. A fresh one is used if None.
         
     Returns:
         Tuple of (deduplicated events, dedup stats)
@@ -43,25 +200,17 @@ def dedup_events(events: List[Dict],
     if not events:
         return [], {'total': 0, 'duplicates': 0}
         
-    # Track seen hashes with timestamps
-    seen_hashes: Dict[str, datetime] = {}
+    if store is None:
+        store = DedupStore(ttl=window)
     duplicates = 0
     deduped = []
     
     for event in events:
-        event_hash = generate_event_hash(event, content_keys)
-        ts = event['timestamp']
-        
-        # Check if hash seen within window
-        if event_hash in seen_hashes:
-            last_ts = seen_hashes[event_hash]
-            if (ts - last_ts).total_seconds() <= window:
-                duplicates += 1
-                continue
-                
-        # Not a duplicate, keep event and update seen
+        key = event_fingerprint(event, content_keys, store.digest_size)
+        if not store.check_and_add(key, event['timestamp'].timestamp()):
+            duplicates += 1
+            continue
         deduped.append(event)
-        seen_hashes[event_hash] = ts
         
     stats = {
         'total': len(events),
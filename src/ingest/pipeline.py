@@ -6,9 +6,9 @@ from typing import Dict, List, Optional
 import pandas as pd
 from sqlalchemy.orm import Session
 
-from .scrub import scrub, scrub_mapping
+from .scrub import scrub_many
 from .session import parse_rfc3339, fix_clock_skew, sessionize
-from .dedup import dedup_events
+from .dedup import DedupStore, dedup_events
 from .template_cache import TemplateCache
 from ..enrich.cve_context import CVEEnricher
 
@@ -18,13 +18,15 @@ class Pipeline:
     def __init__(self, 
                  db_session: Session,
                  cache_dir: Path,
-                 window: int = 300):
+                 window: int = 300,
+                 dedup_max_keys: int = 1_000_000):
         """Initialize pipeline components.
         
         Args:
             db_session: Database session for enrichment
             cache_dir: Directory for template cache
             window: Time window in seconds for dedup/sessions
+            dedup_max_keys: Hard cap on dedup keys kept across batches
         """
         self.db_session = db_session
         self.cache_dir = cache_dir
@@ -32,6 +34,7 @@ class Pipeline:
         
         # Initialize components
         self.template_cache = TemplateCache(cache_dir)
+        self.dedup_store = DedupStore(ttl=window, max_keys=dedup_max_keys)
         self.cve_enricher = CVEEnricher(db_session)
         
         # Track stats
@@ -40,7 +43,8 @@ class Pipeline:
             'events_deduped': 0,
             'sessions_created': 0,
             'cves_enriched': 0,
-            'pii_found': 0
+            'pii_found': 0,
+            'pii_hits': {}
         }
         
     def process_events(self, events: List[Dict]) -> List[Dict]:
@@ -73,7 +77,7 @@ class Pipeline:
         events = fix_clock_skew(events)
         
         # 3. Deduplicate
-        events, dedup_stats = dedup_events(events, self.window)
+        events, dedup_stats = dedup_events(events, self.window, store=self.dedup_store)
         self.stats['events_deduped'] += dedup_stats['duplicates']
         
         # 4. Extract templates
@@ -85,25 +89,19 @@ class Pipeline:
                 event['template_id'] = tid
                 event['template_pattern'] = pattern
                 
-        # 5. Scrub PII
+        # 5. Scrub PII (hit counts come from the same pass)
         pii_stats = {'pre_scrub': {}, 'post_scrub': {}}
-        for event in events:
-            # Track PII matches
-            orig_msg = event.get('message', '')
-            orig_host = event.get('host', '')
-            
-            # Scrub message and host
-            if 'message' in event:
-                event['message'] = scrub(event['message'])
-                if event['message'] != orig_msg:
-                    pii_stats['pre_scrub']['message'] = \
-                        pii_stats['pre_scrub'].get('message', 0) + 1
-                    
-            if 'host' in event:
-                event['host'] = scrub(event['host'])
-                if event['host'] != orig_host:
-                    pii_stats['pre_scrub']['host'] = \
-                        pii_stats['pre_scrub'].get('host', 0) + 1
+        for field in ('message', 'host'):
+            with_field = [e for e in events if field in e]
+            scrubbed, hits = scrub_many(e[field] for e in with_field)
+            for event, value, h in zip(with_field, scrubbed, hits):
+                event[field] = value
+                if h:
+                    pii_stats['pre_scrub'][field] = \
+                        pii_stats['pre_scrub'].get(field, 0) + 1
+                    for pattern, n in h.items():
+                        self.stats['pii_hits'][pattern] = \
+                            self.stats['pii_hits'].get(pattern, 0) + n
                     
         self.stats['pii_found'] += sum(pii_stats['pre_scrub'].values())
         
@@ -148,5 +146,6 @@ class Pipeline:
         """Get pipeline processing stats."""
         return {
             **self.stats,
+            'dedup_stats': {**self.dedup_store.stats, 'keys': len(self.dedup_store)},
             'template_stats': self.template_cache.get_stats()
         }
@@ -1,18 +1,21 @@
 """Time-based log sessionization with privacy."""
 import datetime
-from datetime import timezone
-from typing import Optional, Dict, List, Tuple
+import heapq
+from functools import lru_cache
+from typing import Iterable, Iterator, Optional, Dict, List, Tuple
 import pandas as pd
-from dateutil.parser import parse as parse_date
-from ..common.pseudo import pseudo_host, pseudo_user
+from ..common.pseudo import Pseudonymizer, get_pseudonymizer, pseudo_host, pseudo_user
+from ..common.timeparse import EPOCH, TimestampParser
+
+# Strict: ISO 8601 only (no epoch numbers), values without a UTC offset are rejected
+_RFC3339 = TimestampParser(default_tz=None, formats=("iso",))
+# Datetime (naive: UTC) and epoch timestamps of streamed events
+_EVENT_TS = TimestampParser()
 
 def parse_rfc3339(ts_str: str) -> datetime.datetime:
     """Parse RFC3339 timestamp with validation."""
     try:
-        dt = parse_date(ts_str)
-        if not dt.tzinfo:
-            raise ValueError("Missing timezone")
-        return dt.astimezone(timezone.utc)
+        return _RFC3339.parse(ts_str)
     except Exception as e:
         raise ValueError(f"Invalid RFC3339: {ts_str}") from e
 
@@ -83,10 +86,6 @@ def generate_session_id(host: str,
     Returns:
         Session ID string
     """
-    # Pseudonymize identifiers
-    p_host = pseudo_host(host)
-    p_user = pseudo_user(user) if user else "nouser"
-    
     # Get 5-minute time bucket
     bucket = timestamp.replace(
         minute=(timestamp.minute // 5) * 5,
@@ -94,7 +93,19 @@ def generate_session_id(host: str,
         microsecond=0
     )
     
-    return f"{p_host}_{p_user}_{bucket.strftime('%Y%m%d%H%M')}"
+    return f"{_session_prefix(host, user)}_{bucket.strftime('%Y%m%d%H%M')}"
+
+def _session_prefix(host: str, user: Optional[str]) -> str:
+    """Pseudonymized ``host_user`` part of a session ID."""
+    return _cached_prefix(get_pseudonymizer(), host, user)
+
+@lru_cache(maxsize=65536)
+def _cached_prefix(pseudonymizer: Pseudonymizer, host: str, user: Optional[str]) -> str:
+    # keyed on the current pseudonymizer: a key rotation (reset_pseudonymizers)
+    # replaces it, so prefixes made with the old key are never served again
+    p_host = pseudo_host(host)
+    p_user = pseudo_user(user) if user else "nouser"
+    return f"{p_host}_{p_user}"
 
 def sessionize(events: List[Dict],
               timestamp_key: str = 'timestamp',
@@ -169,3 +180,143 @@ def sessionize(events: List[Dict],
         })
         
     return events, stats
+
+
+class StreamingSessionizer:
+    """Incremental sessionizer closing sessions on an event-time watermark.
+
+    Sessions are ``window``-aligned buckets per host/user (the IDs match
+    ``generate_session_id`` for the default 5 minutes). The watermark is the
+    largest event time seen minus ``allowed_lateness``; once it passes a
+    bucket's end, every session in that bucket is closed, summarized and
+    evicted, so state is proportional to the number of *active* sessions.
+    Events arriving for an already-closed bucket are counted as late and
+    still get their session ID, but do not reopen the session.
+    """
+
+    def __init__(self,
+                 timestamp_key: str = 'timestamp',
+                 host_key: str = 'host',
+                 user_key: Optional[str] = 'user',
+                 window: int = 300,
+                 allowed_lateness: float = 0.0):
+        """Create a sessionizer.
+
+        Args:
+            timestamp_key: Key for timestamp field (RFC3339 string, datetime
+                taken as UTC if naive, or epoch number)
+            host_key: Key for host field
+            user_key: Optional key for user field
+            window: Session bucket length in seconds
+            allowed_lateness: Seconds the watermark trails the newest event
+        """
+        if window <= 0:
+            raise ValueError("window must be positive")
+        self.timestamp_key = timestamp_key
+        self.host_key = host_key
+        self.user_key = user_key
+        self.window = window
+        self.allowed_lateness = allowed_lateness
+        self.watermark: Optional[float] = None
+        self._max_ts: Optional[float] = None
+        # bucket start (epoch s) -> (label, {session_id: state}); heap of open buckets
+        self._buckets: Dict[int, Tuple[str, Dict[str, Dict]]] = {}
+        self._heap: List[int] = []
+        self._closed_until: Optional[int] = None
+        self.stats = {
+            'total_events': 0, 'total_sessions': 0, 'closed_sessions': 0,
+            'late_events': 0, 'total_duration': 0.0,
+            'min_duration': None, 'max_duration': None,
+        }
+
+    @property
+    def active_sessions(self) -> int:
+        return sum(len(sessions) for _, sessions in self._buckets.values())
+
+    def process(self, event: Dict) -> List[Dict]:
+        """Assign ``event['session_id']`` and return summaries of sessions it closed."""
+        ts = event[self.timestamp_key]
+        if isinstance(ts, str):
+            ts = event[self.timestamp_key] = parse_rfc3339(ts)
+        elif not isinstance(ts, datetime.datetime) or ts.tzinfo is None:
+            ts = event[self.timestamp_key] = _EVENT_TS.parse(ts)
+        secs = (ts - EPOCH).total_seconds()
+        bucket = int(secs // self.window) * self.window
+        user = event.get(self.user_key) if self.user_key else None
+        self.stats['total_events'] += 1
+
+        entry = self._buckets.get(bucket)
+        if entry is None:
+            label = (EPOCH + datetime.timedelta(seconds=bucket)).strftime('%Y%m%d%H%M')
+            if self._closed_until is not None and bucket < self._closed_until:
+                # Bucket already flushed: tag the event but keep no state
+                self.stats['late_events'] += 1
+                event['session_id'] = f"{_session_prefix(event[self.host_key], user)}_{label}"
+                return []
+            entry = self._buckets[bucket] = (label, {})
+            heapq.heappush(self._heap, bucket)
+        label, sessions = entry
+        sid = f"{_session_prefix(event[self.host_key], user)}_{label}"
+        event['session_id'] = sid
+
+        state = sessions.get(sid)
+        if state is None:
+            sessions[sid] = {'first_event': ts, 'last_event': ts, 'event_count': 1}
+            self.stats['total_sessions'] += 1
+        else:
+            if ts < state['first_event']:
+                state['first_event'] = ts
+            if ts > state['last_event']:
+                state['last_event'] = ts
+            state['event_count'] += 1
+
+        if self._max_ts is None or secs > self._max_ts:
+            self._max_ts = secs
+            return self.advance(secs - self.allowed_lateness)
+        return []
+
+    def advance(self, watermark: float) -> List[Dict]:
+        """Move the watermark (epoch seconds) forward and close expired sessions."""
+        if self.watermark is not None and watermark <= self.watermark:
+            return []
+        self.watermark = watermark
+        closed: List[Dict] = []
+        while self._heap and self._heap[0] + self.window <= watermark:
+            closed.extend(self._close_bucket(heapq.heappop(self._heap)))
+        return closed
+
+    def flush(self) -> List[Dict]:
+        """Close every open session (end of stream)."""
+        closed: List[Dict] = []
+        while self._heap:
+            closed.extend(self._close_bucket(heapq.heappop(self._heap)))
+        return closed
+
+    def _close_bucket(self, bucket: int) -> List[Dict]:
+        _, sessions = self._buckets.pop(bucket)
+        end = bucket + self.window
+        if self._closed_until is None or end > self._closed_until:
+            self._closed_until = end
+        out = []
+        st = self.stats
+        for sid, state in sessions.items():
+            duration = (state['last_event'] - state['first_event']).total_seconds()
+            out.append({'session_id': sid, **state, 'duration': duration})
+            st['closed_sessions'] += 1
+            st['total_duration'] += duration
+            st['min_duration'] = duration if st['min_duration'] is None else min(st['min_duration'], duration)
+            st['max_duration'] = duration if st['max_duration'] is None else max(st['max_duration'], duration)
+        return out
+
+    def get_stats(self) -> Dict:
+        """Running stats in the shape of ``sessionize``'s (durations over closed sessions)."""
+        out = dict(self.stats, active_sessions=self.active_sessions)
+        if out['closed_sessions']:
+            out['mean_duration'] = out['total_duration'] / out['closed_sessions']
+        return out
+
+    def run(self, events: Iterable[Dict]) -> Iterator[Dict]:
+        """Feed ``events`` and yield session summaries as they close, then flush."""
+        for event in events:
+            yield from self.process(event)
+        yield from self.flush()
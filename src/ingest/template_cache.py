@@ -1,25 +1,96 @@
-"""Template extraction with persistent caching and pattern matching."""
-import json, re
+"""Template extraction with persistent caching and pattern matching.
+
+Cache entries are keyed by the normalized pattern (block ids, IPs, numbers
+... masked), so messages differing only in variable fields share one entry.
+Persistence is log-structured: new entries are appended to a journal in
+group commits, and a background compaction periodically folds the journal
+into a compact snapshot that is loaded at startup.
+
+Files in ``cache_dir``:
+    template_cache.json         snapshot {"version", "max_id", "entries"}
+    template_cache.journal      JSONL of entries added since the snapshot
+    template_cache.journal.old  journal segment being compacted (if any)
+    template_ids.json           the process-wide template interning table
+                                (``src.common.interning``), loaded on open and
+                                written on compaction and close
+"""
+import json, logging, os, re, threading, time, weakref
+from collections import OrderedDict
 from pathlib import Path
-from typing import Dict, Tuple
+from typing import Dict, List, Optional, Tuple
+
+from .template_extract import TemplateMiner as _LocalMiner
+
+class _CompatCluster:
+    def __init__(self, cluster_id: int, template: str) -> None:
+        self.cluster_id, self.size, self._template = cluster_id, 0, template
+    def get_template(self) -> str:
+        return self._template
+
+class _CompatTemplateMiner:
+    """Drain3-like ``add_log_message(...)`` and ``drain.clusters`` over the local miner.
+
+    The local miner's string ids are mapped to sequential ints from 1, like
+    Drain3 cluster ids, so the cache can offset them.
+    """
+    def __init__(self) -> None:
+        self._local = _LocalMiner()
+        self._clusters: Dict[str, _CompatCluster] = {}
+        self.drain = self
+    @property
+    def clusters(self) -> List[_CompatCluster]:
+        return list(self._clusters.values())
+    def add_log_message(self, msg: str):
+        tid = self._local.extract(msg)
+        cluster = self._clusters.get(tid)
+        if cluster is None:
+            cluster = self._clusters[tid] = _CompatCluster(len(self._clusters) + 1, self._local.get_template(tid))
+        cluster.size += 1
+        return {'cluster_id': cluster.cluster_id, 'template_mined': cluster.get_template()}
 
-# Prefer real Drain3; fall back to a local compat that mimics its API.
+# Prefer real Drain3; fall back to the local compat that mimics its API.
 try:
     from drain3 import TemplateMiner as TemplateMiner  # type: ignore
 except Exception:
-    from .template_extract import TemplateMiner as _LocalMiner
-    class _CompatResult:
-        def __init__(self, cluster_id: str, template_mined: str) -> None:
-            self.cluster_id = cluster_id
-            self.template_mined = template_mined
-    class TemplateMiner:  # compat wrapper exposing add_log_message(...)
-        def __init__(self) -> None:
-            self._local = _LocalMiner()
-        def add_log_message(self, msg: str):
-            tid = self._local.extract(msg)
-            return _CompatResult(cluster_id=tid, template_mined=self._local.get_template(tid))
+    TemplateMiner = _CompatTemplateMiner
 
-from ..common.pseudo import hmac_sha256_hex, get_salt
+from ..common.interning import INTERN_FILE, get_template_interner
+from ..common.pseudo import get_pseudonymizer
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 2
+
+class _Journal:
+    """Append handle of the journal plus the entries awaiting a group commit.
+
+    Kept apart from ``TemplateCache`` so its exit finalizer can commit them
+    without holding the cache (and its LRU) alive.
+    """
+    def __init__(self, path: Path, fsync: bool):
+        self.path = path
+        self.fsync = fsync
+        self.pending: List[str] = []
+        self.entries = 0  # entries in the current segment
+        self.fh = open(path, 'a', encoding='utf-8')
+    def write_pending(self) -> None:
+        if not self.pending:
+            return
+        self.fh.write(''.join(self.pending)); self.fh.flush()
+        if self.fsync:
+            os.fsync(self.fh.fileno())
+        self.entries += len(self.pending)
+        self.pending = []
+    def reopen(self) -> None:
+        self.fh = open(self.path, 'a', encoding='utf-8')
+        self.entries = 0
+    def close(self) -> None:
+        if not self.fh.closed:
+            self.write_pending(); self.fh.close()
+
+def _close_files(journal: _Journal, interner, interner_path: Path) -> None:
+    journal.close()
+    interner.save(interner_path)
 
 class TemplateCache:
     PATTERNS = {
@@ -30,20 +101,137 @@ class TemplateCache:
         'number':    re.compile(r'\b\d+\b'),
         'block_ref': re.compile(r'\bblock \d+\b')
     }
-    def __init__(self, cache_dir: Path):
+    def __init__(self, cache_dir: Path, max_entries: int = 100_000,
+                 commit_every: int = 256, commit_interval: float = 1.0,
+                 compact_every: int = 10_000, fsync: bool = True):
+        """Open (or create) the cache in ``cache_dir``.
+
+        Args:
+            cache_dir: Directory holding the snapshot and journal
+            max_entries: In-memory LRU bound; compaction keeps only live entries
+            commit_every: Journal group-commit size (entries per write)
+            commit_interval: Max seconds an entry may wait for a group commit
+            compact_every: Journal entries that trigger a background compaction
+            fsync: fsync the journal on each group commit
+        """
         self.cache_dir = cache_dir; self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.commit_every = commit_every
+        self.commit_interval = commit_interval
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self.snapshot_path = self.cache_dir / "template_cache.json"
+        self.journal_path = self.cache_dir / "template_cache.journal"
+        self._old_journal_path = self.cache_dir / "template_cache.journal.old"
+        self._lock = threading.Lock()
+        self._compactor: Optional[threading.Thread] = None
+        self._last_commit = time.monotonic()
         self.miner = TemplateMiner()  # real Drain3 if installed; otherwise compat wrapper
-        self._load_cache()
-    def _get_cache_key(self, message: str) -> str:
-        return hmac_sha256_hex(message, get_salt())
-    def _load_cache(self):
-        self.cache: Dict[str, Dict] = {}
-        f = self.cache_dir / "template_cache.json"
-        if f.exists():
-            with open(f) as fh: self.cache = json.load(fh)
-    def _save_cache(self):
-        f = self.cache_dir / "template_cache.json"
-        with open(f, 'w') as fh: json.dump(self.cache, fh)
+        self.interner = get_template_interner()
+        self.interner_path = self.cache_dir / INTERN_FILE
+        self.interner.load(self.interner_path)
+        replayed = self._load_cache()
+        self._journal = _Journal(self.journal_path, fsync)
+        self._journal.entries = replayed
+        # runs at exit, or when an unclosed cache is collected; holds no reference to the cache
+        self._finalizer = weakref.finalize(
+            self, _close_files, self._journal, self.interner, self.interner_path
+        )
+    def _get_cache_key(self, pattern: str) -> str:
+        return get_pseudonymizer().hexdigest(pattern)
+    def _put(self, key: str, ent: Dict) -> None:
+        self.cache[key] = ent; self.cache.move_to_end(key)
+        self.interner.intern(ent['id'])
+        if len(self.cache) > self.max_entries:
+            self.cache.popitem(last=False)
+        self.max_id = max(self.max_id, ent['id'])
+    def _replay(self, path: Path) -> int:
+        n = 0
+        with open(path, encoding='utf-8') as fh:
+            for line in fh:
+                try:
+                    key, tid, pattern = json.loads(line)
+                except ValueError:
+                    continue  # torn write from a crash
+                self._put(key, {'id': tid, 'pattern': pattern}); n += 1
+        return n
+    def _load_cache(self) -> int:
+        """Load the snapshot and replay journals; returns the journal entries replayed."""
+        self.cache: "OrderedDict[str, Dict]" = OrderedDict()
+        self.max_id = 0
+        if self.snapshot_path.exists():
+            with open(self.snapshot_path) as fh: data = json.load(fh)
+            if data.get('version') == SNAPSHOT_VERSION:
+                self.max_id = data['max_id']
+                for key, tid, pattern in data['entries']:
+                    self._put(key, {'id': tid, 'pattern': pattern})
+            else:
+                logger.info(f"Ignoring old-format template cache {self.snapshot_path}")
+        replayed = 0
+        for path in (self._old_journal_path, self.journal_path):
+            if path.exists():
+                replayed += self._replay(path)
+        # Drain ids restart at 1 in a fresh miner; offset them past every persisted id
+        self._id_base = self.max_id
+        return replayed
+    def _commit(self) -> None:
+        # Caller holds self._lock
+        self._journal.write_pending(); self._last_commit = time.monotonic()
+        if self._journal.entries >= self.compact_every:
+            self._start_compaction()
+    def flush(self) -> None:
+        """Group-commit any pending journal entries now."""
+        with self._lock:
+            self._commit()
+    def _write_snapshot(self, entries: List, max_id: int) -> None:
+        tmp = self.snapshot_path.with_suffix('.json.tmp')
+        with open(tmp, 'w') as fh:
+            json.dump({'version': SNAPSHOT_VERSION, 'max_id': max_id, 'entries': entries}, fh)
+            fh.flush(); os.fsync(fh.fileno())
+        os.replace(tmp, self.snapshot_path)
+        self._old_journal_path.unlink(missing_ok=True)
+    def _start_compaction(self) -> None:
+        # Caller holds self._lock. Rotate the journal so appends continue in a
+        # new segment while the snapshot is written in the background; the old
+        # segment is deleted only once the snapshot is atomically in place.
+        if self._compactor is not None and self._compactor.is_alive():
+            return
+        self._journal.write_pending()
+        self._journal.fh.close()
+        if self._old_journal_path.exists():
+            # A previous compaction never finished: keep that segment's entries
+            with open(self._old_journal_path, 'a', encoding='utf-8') as old, \
+                 open(self.journal_path, encoding='utf-8') as cur:
+                old.write(cur.read())
+            self.journal_path.unlink()
+        else:
+            os.replace(self.journal_path, self._old_journal_path)
+        self._journal.reopen()
+        entries = [[k, e['id'], e['pattern']] for k, e in self.cache.items()]
+        self._compactor = threading.Thread(
+            target=self._write_snapshot, args=(entries, self.max_id), daemon=True
+        )
+        self._compactor.start()
+    def compact(self) -> None:
+        """Fold the journal into a fresh snapshot of the live (LRU) entries and wait."""
+        with self._lock:
+            if self._compactor is not None:
+                self._compactor.join()
+            self._start_compaction()
+        self._compactor.join()
+        self.interner.save(self.interner_path)
+    def close(self) -> None:
+        """Commit pending entries and wait for any running compaction."""
+        if self._journal.fh.closed:
+            return
+        self.flush()
+        if self._compactor is not None:
+            self._compactor.join()
+        self._finalizer()
+    def __enter__(self) -> "TemplateCache":
+        return self
+    def __exit__(self, *exc) -> None:
+        self.close()
     def _normalize_pattern(self, message: str) -> str:
         if not message: return ''
         t = message
@@ -55,17 +243,23 @@ class TemplateCache:
         t = self.PATTERNS['block_ref'].sub('block *', t)
         return t
     def extract_template(self, message: str) -> Tuple[int, str]:
-        key = self._get_cache_key(message)
-        if key in self.cache:
-            ent = self.cache[key]; return ent['id'], ent['pattern']
         normalized = self._normalize_pattern(message)
-        result = self.miner.add_log_message(normalized)
-        ent = {'id': result.cluster_id, 'pattern': result.template_mined}
-        self.cache[key] = ent; self._save_cache()
+        key = self._get_cache_key(normalized)
+        with self._lock:
+            ent = self.cache.get(key)
+            if ent is not None:
+                self.cache.move_to_end(key); return ent['id'], ent['pattern']
+            result = self.miner.add_log_message(normalized)
+            ent = {'id': self._id_base + result['cluster_id'], 'pattern': result['template_mined']}
+            self._put(key, ent)
+            self._journal.pending.append(json.dumps([key, ent['id'], ent['pattern']]) + '\n')
+            if (len(self._journal.pending) >= self.commit_every
+                    or time.monotonic() - self._last_commit >= self.commit_interval):
+                self._commit()
         return ent['id'], ent['pattern']
     def get_stats(self) -> Dict:
         clusters = []
         drain = getattr(getattr(self.miner, "drain", None), "clusters", None)
         if drain:
-            clusters = [{'id': c.cluster_id, 'size': c.size, 'pattern': c.get_template()} for c in drain]
+            clusters = [{'id': self._id_base + c.cluster_id, 'size': c.size, 'pattern': c.get_template()} for c in drain]
         return {'total_templates': len(clusters), 'cache_size': len(self.cache), 'clusters': clusters}
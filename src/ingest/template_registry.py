@@ -0,0 +1,121 @@
+"""Shared template-id namespace for sharded ingest.
+
+Each ingest worker mines templates with its own Drain3 miner, so local
+``cluster_id``s are only meaningful inside that worker. ``TemplateRegistry``
+reconciles those local templates into one persistent, stable integer id
+space: templates are matched token-wise (Drain-style similarity, ``<*>``
+acting as a wildcard) against registered entries, generalized on merge,
+and new entries get the next free id. Ids never change once assigned.
+"""
+import json
+import os
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+WILDCARD = "<*>"
+
+
+class TemplateRegistry:
+    """Persistent mapping of mined templates to stable integer ids."""
+
+    def __init__(self, path: Path, sim_th: float = 0.5):
+        """Load (or start) a registry.
+
+        Args:
+            path: JSON file holding registered templates
+            sim_th: Minimum token similarity for two templates to merge
+                (matches ``sim_th`` in drain3.ini)
+        """
+        self.path = Path(path)
+        self.sim_th = sim_th
+        self._templates: Dict[int, List[str]] = {}
+        self._by_length: Dict[int, List[int]] = defaultdict(list)
+        self._resolved: Dict[str, int] = {}
+        self._next_id = 1
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._templates)
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            return
+        with open(self.path) as f:
+            data = json.load(f)
+        for entry in data.get("templates", []):
+            self._register(int(entry["id"]), entry["template"].split())
+        self._next_id = max(self._templates, default=0) + 1
+
+    def save(self) -> None:
+        """Atomically write the registry to disk."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(
+                {"templates": [
+                    {"id": tid, "template": " ".join(tokens)}
+                    for tid, tokens in sorted(self._templates.items())
+                ]},
+                f,
+            )
+        os.replace(tmp, self.path)
+
+    def _register(self, tid: int, tokens: List[str]) -> None:
+        self._templates[tid] = tokens
+        self._by_length[len(tokens)].append(tid)
+
+    def template(self, tid: int) -> Optional[str]:
+        """Return the (possibly generalized) template registered under ``tid``."""
+        tokens = self._templates.get(tid)
+        return None if tokens is None else " ".join(tokens)
+
+    def _similarity(self, registered: List[str], tokens: List[str]) -> float:
+        same = sum(
+            1 for a, b in zip(registered, tokens) if a == b and a != WILDCARD
+        )
+        return same / len(tokens)
+
+    def _match(self, tokens: List[str]) -> Optional[int]:
+        best_id, best_key = None, None
+        for tid in self._by_length.get(len(tokens), []):
+            registered = self._templates[tid]
+            sim = self._similarity(registered, tokens)
+            if sim < self.sim_th:
+                continue
+            # Prefer higher similarity, then the more general entry, then the older id
+            key = (sim, registered.count(WILDCARD), -tid)
+            if best_key is None or key > best_key:
+                best_id, best_key = tid, key
+        return best_id
+
+    def resolve(self, template: str) -> int:
+        """Map one template to its global id, registering it if new."""
+        if template in self._resolved:
+            return self._resolved[template]
+        tokens = template.split()
+        tid = self._match(tokens) if tokens else None
+        if tid is None:
+            tid = self._next_id
+            self._next_id += 1
+            self._register(tid, tokens)
+        else:
+            registered = self._templates[tid]
+            self._templates[tid] = [
+                a if a == b else WILDCARD for a, b in zip(registered, tokens)
+            ]
+        self._resolved[template] = tid
+        return tid
+
+    def merge(self, templates: Iterable[str]) -> Dict[str, int]:
+        """Reconcile a batch of locally mined templates into global ids.
+
+        Templates are merged in a canonical order (most general first, then
+        lexicographic) so the result does not depend on which worker mined
+        what, or in which order shards finished.
+
+        Returns:
+            Dict mapping each input template to its global id
+        """
+        ordered = sorted(set(templates), key=lambda t: (-t.split().count(WILDCARD), t))
+        return {t: self.resolve(t) for t in ordered}
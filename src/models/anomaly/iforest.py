@@ -92,20 +92,15 @@ class IForestModel:
         self._fitted = True
         logger.info("IsolationForest trained on %d samples (%d features)", X.shape[0], X.shape[1])
 
-    def predict(self, events: List[Dict]) -> Dict[str, Dict[str, float]]:
-        """
-        Predict anomaly scores for events, aggregated per session_id (latest ts kept).
-
-        Returns:
-            { session_id: { "score": float(0..1), "ts": timestamp_like } }
-        """
+    def _score_valid(self, events: List[Dict]) -> Tuple[np.ndarray, List[Dict]]:
+        """Anomaly scores in [0,1] (higher => more anomalous) of the events with valid features."""
         if not self._fitted:
-            raise RuntimeError("IForestModel.predict called before fit/load")
+            raise RuntimeError("IForestModel scoring called before fit/load")
 
         X_df, valid = self._extract_features(events)
         if X_df.empty:
             logger.warning("No valid features to score")
-            return {}
+            return np.empty(0), []
 
         X = self.scaler.transform(X_df.values)
         raw = self.model.score_samples(X)  # higher => more normal (by IF convention)
@@ -119,7 +114,27 @@ class IForestModel:
                 s = 1.0 - (raw - rmin) / (rmax - rmin)
         else:
             s = 1.0 / (1.0 + np.exp(-abs(raw)))  # single-row fallback
+        return np.clip(s, 0.0, 1.0), valid
+
+    def score(self, events: List[Dict]) -> List[float]:
+        """
+        Anomaly score per event, in input order (NaN for events with invalid features).
 
+        Takes window feature rows as stored in ``window_features`` or as
+        emitted by ``src.stream.features``.
+        """
+        s, valid = self._score_valid(events)
+        by_id = {id(ev): float(sc) for ev, sc in zip(valid, s)}
+        return [by_id.get(id(ev), float("nan")) for ev in events]
+
+    def predict(self, events: List[Dict]) -> Dict[str, Dict[str, float]]:
+        """
+        Predict anomaly scores for events, aggregated per session_id (latest ts kept).
+
+        Returns:
+            { session_id: { "score": float(0..1), "ts": timestamp_like } }
+        """
+        s, valid = self._score_valid(events)
         out: Dict[str, Dict[str, float]] = {}
         for ev, sc in zip(valid, s):
             sid = ev.get("session_id")
@@ -129,7 +144,7 @@ class IForestModel:
                 continue
             # keep latest ts per session_id
             if sid not in out or (ts is not None and ts > out[sid]["ts"]):
-                out[sid] = {"score": float(np.clip(sc, 0.0, 1.0)), "ts": ts}
+                out[sid] = {"score": float(sc), "ts": ts}
         return out
 
     def save(self, path: str) -> None:
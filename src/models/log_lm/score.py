@@ -1,12 +1,20 @@
 import math
 from collections import defaultdict
-from typing import List, Iterable, Tuple, Dict
+from typing import Hashable, List, Iterable, Tuple, Dict
+
+from src.common.interning import TemplateBitset, get_template_interner
+
+BOS = -1  # padding id; interned ids are >= 0
+UNKNOWN = -2  # template never interned (in no n-gram)
 
 
 class PerplexityScorer:
     """
     Simple n-gram perplexity scorer for sequences of template IDs.
     Higher perplexity => more anomalous sequence.
+
+    Template ids are interned (``src.common.interning``), so n-grams are
+    tuples of small ints and the vocabulary is a bitset.
     """
 
     def __init__(self, n: int = 3, smoothing_alpha: float = 1.0):
@@ -14,38 +22,44 @@ class PerplexityScorer:
             raise ValueError("n must be at least 2 for n-gram models.")
         self.n = int(n)
         self.k = float(smoothing_alpha)
-        self.n_gram_counts: Dict[Tuple[str, ...], int] = defaultdict(int)
-        self.context_counts: Dict[Tuple[str, ...], int] = defaultdict(int)
-        self.vocab: set[str] = set()
+        self.n_gram_counts: Dict[Tuple[int, ...], int] = defaultdict(int)
+        self.context_counts: Dict[Tuple[int, ...], int] = defaultdict(int)
+        self.vocab = TemplateBitset()
+        self._vocab_size = 0
+        self._interner = get_template_interner()
         self._fitted = False
 
-    def fit(self, sequences: Iterable[List[str]]) -> None:
+    def fit(self, sequences: Iterable[List[Hashable]]) -> None:
         for sequence in sequences:
             if not sequence:
                 continue
-            self.vocab.update(sequence)
-            pad = ["<s>"] * (self.n - 1)
-            padded = pad + sequence
+            ids = self._interner.intern_many(sequence)
+            self.vocab.update(ids)
+            pad = [BOS] * (self.n - 1)
+            padded = pad + ids
             for i in range(len(padded) - self.n + 1):
                 ngram = tuple(padded[i : i + self.n])
                 ctx = ngram[:-1]
                 self.n_gram_counts[ngram] += 1
                 self.context_counts[ctx] += 1
+        self._vocab_size = len(self.vocab)
         self._fitted = True
 
-    def score(self, sequence: List[str]) -> float:
+    def score(self, sequence: List[Hashable]) -> float:
         """
         Perplexity of the sequence. If model not fitted or sequence empty, returns 1.0.
         """
         if not sequence:
             return 1.0
-        if not self._fitted or len(self.vocab) == 0:
+        if not self._fitted or self._vocab_size == 0:
             return 1.0
 
         log_prob = 0.0
-        V = float(len(self.vocab))
-        pad = ["<s>"] * (self.n - 1)
-        padded = pad + sequence
+        V = float(self._vocab_size)
+        lookup = self._interner.lookup
+        ids = [UNKNOWN if i is None else i for i in map(lookup, sequence)]
+        pad = [BOS] * (self.n - 1)
+        padded = pad + ids
 
         for i in range(len(padded) - self.n + 1):
             ngram = tuple(padded[i : i + self.n])
@@ -0,0 +1,334 @@
+"""Online multi-horizon burst detection over window event counts.
+
+Each key (a host, a partition key, or the whole stream) keeps, for every
+horizon, an exponentially weighted mean and variance of its per-window
+event count, updated in O(1) per window with the Welford-style
+recurrence of West (1979):
+
+    diff = x - mean;  mean += a * diff;  var = (1 - a) * (var + a * diff**2)
+
+A horizon of N windows uses a = 2 / (N + 1) (the EWMA span convention).
+Horizons are given in windows (``10w``) or in time (``1h``, ``24h``),
+converted with the window stride. A window is scored against the
+statistics from *before* it: z = (x - mean) / max(std, 1). The floor keeps
+a flat history from flagging a difference of one event. A horizon flags a
+burst when z exceeds ``z_threshold`` and the count exceeds ``min_count``.
+
+A key absent from some windows contributed zero events to them. Those
+zero observations are applied lazily when the key is next seen, in
+closed form. After k zeros, with r = (1 - a)^k:
+
+    mean' = r * mean;  var' = r * (var + mean**2 * (1 - r))
+
+So a window only touches the keys present in it, however many keys exist.
+
+``BurstDetector`` stores the state of all keys struct-of-arrays in flat
+typed buffers (64 bytes per key with three horizons, plus its dict entry)
+and scores the keys of a window in one vectorized step. ``BurstMonitor``
+combines a stream-level detector with a per-host one and builds the
+burst fields of a feature record. Windows with only a few keys (the
+stream-level series, a handful of hosts) take a scalar path with the same
+arithmetic, as numpy's per-call overhead would dominate.
+"""
+import math
+import re
+from array import array
+from datetime import datetime
+from typing import Dict, Hashable, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+DEFAULT_HORIZONS = "10w,1h,24h"
+_VECTORIZE_MIN_KEYS = 32
+_UNITS = {"w": None, "s": 1.0, "m": 60.0, "h": 3600.0, "d": 86400.0}
+
+
+class Horizon(NamedTuple):
+    name: str
+    windows: float  # span in windows
+    alpha: float
+
+
+def parse_horizons(spec: str, stride_sec: float) -> List[Horizon]:
+    """Horizons from ``"10w,1h,24h"`` (w: windows; s/m/h/d: time, divided by the stride).
+
+    Raises:
+        ValueError: For a malformed horizon or a span under one window
+    """
+    horizons = []
+    for part in (p.strip() for p in spec.split(",") if p.strip()):
+        m = re.fullmatch(r"(\d+(?:\.\d+)?)([wsmhd])", part)
+        if not m:
+            raise ValueError(f"Bad burst horizon {part!r} (expected e.g. 10w, 90s, 1h, 24h)")
+        value, unit = float(m.group(1)), m.group(2)
+        windows = value if _UNITS[unit] is None else value * _UNITS[unit] / stride_sec
+        if windows < 1:
+            raise ValueError(f"Burst horizon {part!r} is shorter than one window")
+        horizons.append(Horizon(part, windows, 2.0 / (windows + 1.0)))
+    if not horizons:
+        raise ValueError("No burst horizons given")
+    return horizons
+
+
+class BurstDetector:
+    """Per-key EW mean/variance of window counts over several horizons."""
+
+    def __init__(
+        self,
+        horizons: Sequence[Horizon],
+        stride_sec: float,
+        z_threshold: float = 2.0,
+        min_count: int = 20,
+        capacity: int = 16,
+    ):
+        """Create a detector with no keys.
+
+        Args:
+            horizons: From ``parse_horizons``
+            stride_sec: Window stride (a gap of k strides is k - 1 empty windows)
+            z_threshold: z-score above which a horizon flags a burst
+            min_count: Counts at or below this never flag
+            capacity: Initial number of key slots (grows as needed)
+        """
+        self.horizons = list(horizons)
+        self.stride_sec = stride_sec
+        self.z_threshold = z_threshold
+        self.min_count = min_count
+        self._alpha = np.array([h.alpha for h in self.horizons])
+        self._slots: Dict[Hashable, int] = {}
+        self._free: List[int] = []
+        # flat buffers: cheap scalar access for the few-key path, numpy views for the vectorized one
+        width = len(self.horizons)
+        self._last = array("d", bytes(8 * capacity))  # time (epoch seconds) of the key's last window
+        self._n = array("q", bytes(8 * capacity))  # windows observed
+        self._mean = array("d", bytes(8 * capacity * width))  # row-major, one row per slot
+        self._var = array("d", bytes(8 * capacity * width))
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the per-key state buffers."""
+        return sum(a.itemsize * len(a) for a in (self._last, self._n, self._mean, self._var))
+
+    def _slot(self, key: Hashable) -> int:
+        slot = self._slots.get(key)
+        if slot is None:
+            if self._free:
+                slot = self._free.pop()
+            else:
+                slot = len(self._slots)
+                if slot == len(self._n):
+                    self._grow()
+            self._slots[key] = slot
+            self._n[slot] = 0
+        return slot
+
+    def _grow(self) -> None:
+        extra = max(len(self._n), 16)  # slots
+        for buf, width in ((self._last, 1), (self._n, 1), (self._mean, len(self.horizons)), (self._var, len(self.horizons))):
+            buf.frombytes(bytes(buf.itemsize * width * extra))
+
+    def forget(self, key: Hashable) -> None:
+        """Drop the state of ``key`` (e.g. a session that ended)."""
+        slot = self._slots.pop(key, None)
+        if slot is not None:
+            self._free.append(slot)
+
+    def observe(self, counts: Mapping[Hashable, int], t: float) -> Tuple[List[Hashable], np.ndarray, np.ndarray]:
+        """Score and then absorb one window's counts per key.
+
+        Args:
+            counts: Event count per key in the window (absent keys: zero)
+            t: Window time in epoch seconds
+
+        Returns:
+            ``(keys, z, flags)``: z-scores and burst flags, one row per key
+            and one column per horizon (z is 0 for a key's first window)
+        """
+        keys = list(counts)
+        if len(keys) < _VECTORIZE_MIN_KEYS:
+            return self._observe_scalar(keys, counts, t)
+        idx = np.fromiter((self._slot(k) for k in keys), dtype=np.int64, count=len(keys))
+        x = np.fromiter((counts[k] for k in keys), dtype=float, count=len(keys))[:, None]
+        width = len(self.horizons)
+        last_buf, n_buf = np.frombuffer(self._last), np.frombuffer(self._n, dtype=np.int64)
+        mean_buf = np.frombuffer(self._mean).reshape(-1, width)
+        var_buf = np.frombuffer(self._var).reshape(-1, width)
+        n = n_buf[idx]
+        seen = (n > 0)[:, None]
+        alpha = self._alpha
+
+        # zero-count windows since the key was last seen, in closed form
+        gap = np.maximum((t - last_buf[idx]) / self.stride_sec - 1.0, 0.0)[:, None]
+        r = (1.0 - alpha) ** gap
+        mean = mean_buf[idx]
+        var = r * (var_buf[idx] + mean * mean * (1.0 - r))
+        mean = r * mean
+
+        z = np.where(seen, (x - mean) / np.maximum(np.sqrt(var), 1.0), 0.0)
+        flags = seen & (z > self.z_threshold) & (x > self.min_count)
+
+        diff = x - mean
+        incr = alpha * diff
+        mean_buf[idx] = np.where(seen, mean + incr, x)
+        var_buf[idx] = np.where(seen, (1.0 - alpha) * (var + diff * incr), 0.0)
+        last_buf[idx] = t
+        n_buf[idx] = n + 1
+        return keys, z, flags
+
+    def _observe_scalar(self, keys: List[Hashable], counts: Mapping[Hashable, int],
+                        t: float) -> Tuple[List[Hashable], np.ndarray, np.ndarray]:
+        # same arithmetic as ``observe``, key by key (numpy calls cost more than they save on few keys)
+        alphas = [h.alpha for h in self.horizons]
+        width = len(alphas)
+        stride, thr, min_count = self.stride_sec, self.z_threshold, self.min_count
+        means, variances = self._mean, self._var
+        z_flat, flag_flat = [], []
+        for key in keys:
+            slot = self._slot(key)
+            x = float(counts[key])
+            n = self._n[slot]
+            base = slot * width
+            if n == 0:
+                z_flat.extend([0.0] * width)
+                flag_flat.extend([False] * width)
+                for j in range(base, base + width):
+                    means[j] = x
+                    variances[j] = 0.0
+            else:
+                gap = (t - self._last[slot]) / stride - 1.0
+                for j, a in zip(range(base, base + width), alphas):
+                    mean, var = means[j], variances[j]
+                    if gap > 0.0:
+                        r = (1.0 - a) ** gap
+                        var = r * (var + mean * mean * (1.0 - r))
+                        mean = r * mean
+                    diff = x - mean
+                    z = diff / (math.sqrt(var) if var > 1.0 else 1.0)
+                    z_flat.append(z)
+                    flag_flat.append(z > thr and x > min_count)
+                    incr = a * diff
+                    means[j] = mean + incr
+                    variances[j] = (1.0 - a) * (var + diff * incr)
+            self._last[slot] = t
+            self._n[slot] = n + 1
+        return (keys, np.array(z_flat, dtype=float).reshape(-1, width),
+                np.array(flag_flat, dtype=bool).reshape(-1, width))
+
+    def to_dict(self) -> Dict:
+        return {
+            "horizons": [tuple(h) for h in self.horizons],
+            "stride_sec": self.stride_sec,
+            "z_threshold": self.z_threshold,
+            "min_count": self.min_count,
+            "slots": dict(self._slots),
+            "free": list(self._free),
+            "state": [bytes(buf) for buf in (self._last, self._n, self._mean, self._var)],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "BurstDetector":
+        det = cls([Horizon(*h) for h in data["horizons"]], data["stride_sec"],
+                  data["z_threshold"], data["min_count"], capacity=0)
+        det._slots = dict(data["slots"])
+        det._free = list(data["free"])
+        for buf, raw in zip((det._last, det._n, det._mean, det._var), data["state"]):
+            buf.frombytes(raw)
+        return det
+
+
+class BurstMonitor:
+    """Stream-level and per-host burst fields for feature records."""
+
+    def __init__(
+        self,
+        stride_sec: float,
+        horizons: str = DEFAULT_HORIZONS,
+        z_threshold: float = 2.0,
+        min_count: int = 20,
+        per_host: bool = True,
+        host_z_threshold: float = 3.0,
+        top_hosts: int = 10,
+    ):
+        """Create the detectors.
+
+        Args:
+            stride_sec: Window stride
+            horizons: Horizon spec (see ``parse_horizons``); the first is the
+                one behind ``is_burst``
+            z_threshold: See ``BurstDetector``
+            min_count: See ``BurstDetector`` (applies to hosts as well)
+            per_host: Also track every host's own counts
+            host_z_threshold: ``z_threshold`` of the per-host detector
+                (higher: with thousands of hosts, 2 sigma flags dozens per
+                window by chance)
+            top_hosts: Most hosts listed in ``burst_hosts`` (highest z first)
+        """
+        parsed = parse_horizons(horizons, stride_sec)
+        self.total = BurstDetector(parsed, stride_sec, z_threshold, min_count)
+        self.hosts = BurstDetector(parsed, stride_sec, host_z_threshold, min_count) if per_host else None
+        self.top_hosts = top_hosts
+
+    def observe(
+        self,
+        window_end: datetime,
+        event_count: int,
+        host_counts: Optional[Mapping[Hashable, int]] = None,
+        key: Hashable = None,
+    ) -> Dict:
+        """Burst fields of one window.
+
+        Args:
+            window_end: Window time
+            event_count: Events in the window
+            host_counts: Events per host in the window (per-host detection)
+            key: Series the window belongs to (e.g. the partition key);
+                None for the whole stream
+
+        Returns:
+            ``is_burst`` (first horizon), ``burst_z`` (z per horizon),
+            ``burst_horizons`` (horizons that flag) and, with per-host
+            tracking, ``burst_hosts`` (host -> {horizon: z} for flagged
+            horizons)
+        """
+        t = window_end.timestamp()
+        names = [h.name for h in self.total.horizons]
+        _, z, flags = self.total.observe({key: event_count}, t)
+        fields = {
+            "is_burst": bool(flags[0, 0]),
+            "burst_z": {name: round(float(v), 2) for name, v in zip(names, z[0])},
+            "burst_horizons": [name for name, f in zip(names, flags[0]) if f],
+        }
+        if self.hosts is not None:
+            bursting = {}
+            hosts, hz, hflags = self.hosts.observe(host_counts, t) if host_counts else ([], None, None)
+            if hosts and hflags.any():
+                rows = np.flatnonzero(hflags.any(axis=1))
+                if len(rows) > self.top_hosts:
+                    rows = rows[np.argsort(-hz[rows].max(axis=1), kind="stable")[:self.top_hosts]]
+                for i in rows:
+                    bursting[hosts[i]] = {
+                        name: round(float(v), 2) for name, v, f in zip(names, hz[i], hflags[i]) if f
+                    }
+            fields["burst_hosts"] = bursting
+        return fields
+
+    def forget(self, key: Hashable) -> None:
+        self.total.forget(key)
+
+    def to_dict(self) -> Dict:
+        return {
+            "total": self.total.to_dict(),
+            "hosts": None if self.hosts is None else self.hosts.to_dict(),
+            "top_hosts": self.top_hosts,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "BurstMonitor":
+        monitor = cls.__new__(cls)
+        monitor.total = BurstDetector.from_dict(data["total"])
+        monitor.hosts = None if data["hosts"] is None else BurstDetector.from_dict(data["hosts"])
+        monitor.top_hosts = data["top_hosts"]
+        return monitor
@@ -0,0 +1,532 @@
+"""Source and sink connectors for the continuously running stream job.
+
+A source yields ``SourceBatch``es of raw records (JSON lines, not decoded:
+``src.stream.features`` parses them). Once the records of every window
+holding an event of a batch have been emitted and written by the sink
+(``written``), the pipeline calls ``mark_processed(batch)``; the source
+commits those offsets from its own thread on the next poll and on
+``close``, so a restart resumes after the last batch whose output is
+durable (at-least-once delivery).
+
+Sources:
+
+- ``FileTailSource`` (``tail:PATH``): follows a growing file like
+  ``tail -F``, across rotation and truncation. The offset is the byte
+  position after the last processed line, committed atomically to
+  ``PATH.offset``.
+- ``UnixSocketSource`` (``unix:PATH``): listens on a Unix-domain stream
+  socket; any number of producers connect and write newline-delimited
+  records. There is nothing to replay, so commits are no-ops.
+- ``KafkaSource`` (``kafka://HOST:PORT[,HOST:PORT]/TOPIC?group=GROUP``):
+  a consumer group member with manual offset commits, through the
+  optional ``kafka-python`` client.
+
+Sinks buffer records and write them in batches (``max_batch`` records or
+``linger_sec``, whichever comes first): ``FileSink`` (``file:PATH``,
+a plain path, or ``-`` for stdout) and ``KafkaSink`` (``kafka://HOST:PORT/TOPIC``).
+A database URL (``postgresql+psycopg://…``, ``sqlite:///…``) opens the
+asynchronous ``window_features`` sink of ``src.stream.db_sink``.
+
+``FakeBroker`` stands in for Kafka in-process: topics with partitions,
+consumer groups with committed offsets and the same consumer/producer
+calls as the ``kafka-python`` adapter. ``memory://TOPIC`` specs use the
+process-wide ``LOCAL_BROKER``, so the whole job runs offline in tests.
+
+``open_source`` / ``open_sink`` build a connector from such a spec.
+"""
+import logging
+import os
+import selectors
+import socket
+import sys
+import threading
+import time
+import zlib
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+
+class SourceBatch(list):
+    """Raw records (the list) and the offsets to commit once they are processed."""
+
+    def __init__(self, records: Iterable[str] = (), offsets: Optional[Dict] = None):
+        super().__init__(records)
+        self.offsets = offsets
+
+
+# ---------- fake broker ----------
+class FakeBroker:
+    """In-process stand-in for a Kafka cluster (tests and offline runs)."""
+
+    def __init__(self, partitions: int = 1):
+        """Create an empty broker.
+
+        Args:
+            partitions: Partitions of topics created on first use
+        """
+        self.partitions = partitions
+        self.topics: Dict[str, List[List[bytes]]] = {}
+        self.committed: Dict[Tuple[str, str], Dict[int, int]] = {}  # (group, topic) -> partition -> offset
+        self._cond = threading.Condition()
+
+    def _topic(self, topic: str) -> List[List[bytes]]:
+        if topic not in self.topics:
+            self.topics[topic] = [[] for _ in range(self.partitions)]
+        return self.topics[topic]
+
+    def produce(self, topic: str, values: List[bytes], key: Optional[bytes] = None) -> None:
+        """Append ``values`` to one partition (by ``key``, else round-robin by size)."""
+        with self._cond:
+            parts = self._topic(topic)
+            if key is not None:
+                part = parts[zlib.crc32(key) % len(parts)]
+            else:
+                part = min(parts, key=len)
+            part.extend(values)
+            self._cond.notify_all()
+
+    def consumer(self, topic: str, group: str) -> "FakeConsumer":
+        return FakeConsumer(self, topic, group)
+
+    def producer(self, topic: str) -> "FakeProducer":
+        return FakeProducer(self, topic)
+
+
+class FakeConsumer:
+    """Consumer group member of a ``FakeBroker`` topic (owns all partitions)."""
+
+    def __init__(self, broker: FakeBroker, topic: str, group: str):
+        self.broker, self.topic, self.group = broker, topic, group
+        with broker._cond:
+            committed = broker.committed.get((group, topic), {})
+            self.position = {p: committed.get(p, 0) for p in range(len(broker._topic(topic)))}
+
+    def poll(self, max_records: int, timeout: float) -> List[Tuple[int, int, bytes]]:
+        """Up to ``max_records`` ``(partition, offset, value)``, waiting up to ``timeout``."""
+        broker = self.broker
+        with broker._cond:
+            parts = broker._topic(self.topic)
+            if not any(len(parts[p]) > pos for p, pos in self.position.items()):
+                broker._cond.wait(timeout)
+            out: List[Tuple[int, int, bytes]] = []
+            for p, pos in self.position.items():
+                values = parts[p][pos:pos + max_records - len(out)]
+                out.extend((p, pos + i, v) for i, v in enumerate(values))
+                self.position[p] = pos + len(values)
+            return out
+
+    def commit(self, offsets: Dict[int, int]) -> None:
+        with self.broker._cond:
+            self.broker.committed.setdefault((self.group, self.topic), {}).update(offsets)
+
+    def close(self) -> None:
+        pass
+
+
+class FakeProducer:
+    def __init__(self, broker: FakeBroker, topic: str):
+        self.broker, self.topic = broker, topic
+
+    def send_batch(self, values: List[bytes]) -> None:
+        self.broker.produce(self.topic, values)
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+LOCAL_BROKER = FakeBroker()
+
+
+# ---------- kafka-python adapter ----------
+class _KafkaConsumer:
+    """``FakeConsumer`` interface over ``kafka.KafkaConsumer`` (manual commits)."""
+
+    def __init__(self, bootstrap: str, topic: str, group: str):
+        try:
+            from kafka import KafkaConsumer  # optional dependency
+        except ImportError as e:
+            raise ImportError("Kafka connectors need kafka-python: pip install kafka-python") from e
+        self.topic = topic
+        self._consumer = KafkaConsumer(
+            topic, bootstrap_servers=bootstrap.split(","), group_id=group,
+            enable_auto_commit=False, auto_offset_reset="earliest",
+        )
+
+    def poll(self, max_records: int, timeout: float) -> List[Tuple[int, int, bytes]]:
+        polled = self._consumer.poll(timeout_ms=int(timeout * 1000), max_records=max_records)
+        return [(tp.partition, r.offset, r.value) for tp, records in polled.items() for r in records]
+
+    def commit(self, offsets: Dict[int, int]) -> None:
+        from kafka import TopicPartition
+        from kafka.structs import OffsetAndMetadata
+
+        extra = (-1,) if len(OffsetAndMetadata._fields) == 3 else ()  # leader_epoch in kafka-python >= 2.1
+        self._consumer.commit({
+            TopicPartition(self.topic, p): OffsetAndMetadata(o, "", *extra) for p, o in offsets.items()
+        })
+
+    def close(self) -> None:
+        self._consumer.close(autocommit=False)
+
+
+class _KafkaProducer:
+    def __init__(self, bootstrap: str, topic: str):
+        try:
+            from kafka import KafkaProducer  # optional dependency
+        except ImportError as e:
+            raise ImportError("Kafka connectors need kafka-python: pip install kafka-python") from e
+        self.topic = topic
+        self._producer = KafkaProducer(bootstrap_servers=bootstrap.split(","), linger_ms=5, acks=1)
+
+    def send_batch(self, values: List[bytes]) -> None:
+        for value in values:
+            self._producer.send(self.topic, value)
+
+    def flush(self) -> None:
+        self._producer.flush()
+
+    def close(self) -> None:
+        self._producer.close()
+
+
+# ---------- sources ----------
+class Source:
+    """Base class: ``batches`` yields ``SourceBatch``es until closed or idle.
+
+    Subclasses implement ``_poll`` (records available within ``timeout``)
+    and optionally ``_commit``. ``idle_timeout`` ends the stream after that
+    many seconds without records (None: run until ``close``).
+    """
+
+    def __init__(self, max_batch: int = 1000, poll_timeout: float = 0.1, idle_timeout: Optional[float] = None):
+        self.max_batch = max_batch
+        self.poll_timeout = poll_timeout
+        self.idle_timeout = idle_timeout
+        self.records = 0
+        self._closed = threading.Event()
+        self._processed: Optional[Dict] = None
+        self._committed: Optional[Dict] = None
+
+    def _poll(self, timeout: float) -> SourceBatch:
+        raise NotImplementedError
+
+    def _commit(self, offsets: Dict) -> None:
+        pass
+
+    def mark_processed(self, batch: SourceBatch) -> None:
+        """Offsets of ``batch`` may be committed (thread-safe; committed on the next poll)."""
+        if batch.offsets is not None:
+            self._processed = batch.offsets
+
+    def commit(self) -> None:
+        """Commit the offsets of the last processed batch (source thread only)."""
+        offsets = self._processed
+        if offsets is not None and offsets is not self._committed:
+            self._commit(offsets)
+            self._committed = offsets
+
+    def batches(self) -> Iterator[SourceBatch]:
+        idle_since = time.monotonic()
+        while not self._closed.is_set():
+            self.commit()
+            batch = self._poll(self.poll_timeout)
+            if batch:
+                self.records += len(batch)
+                idle_since = time.monotonic()
+                yield batch
+            elif self.idle_timeout is not None and time.monotonic() - idle_since >= self.idle_timeout:
+                logging.info(f"{type(self).__name__}: no records for {self.idle_timeout}s, stopping.")
+                break
+        self.commit()
+
+    def stop(self) -> None:
+        """Ask ``batches`` to return after the current poll (any thread)."""
+        self._closed.set()
+
+    def close(self) -> None:
+        """Stop and commit what has been processed (call once ``batches`` has returned)."""
+        self.stop()
+        self.commit()
+
+
+class FileTailSource(Source):
+    """Follows a growing JSONL file, resuming at the committed byte offset."""
+
+    def __init__(self, path: str, offset_path: Optional[str] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.offset_path = offset_path or path + ".offset"
+        self._fh = None
+        self._inode: Optional[int] = None
+        self._pos = 0  # byte offset after the last complete line read
+        self._partial = b""
+        if os.path.exists(self.offset_path):
+            with open(self.offset_path) as fh:
+                inode, pos = (int(x) for x in fh.read().split())
+            self._inode, self._pos = inode, pos
+
+    def _open(self) -> bool:
+        try:
+            fh = open(self.path, "rb")
+        except FileNotFoundError:
+            return False
+        inode = os.fstat(fh.fileno()).st_ino
+        if inode != self._inode:
+            self._inode, self._pos = inode, 0  # new (or rotated) file
+        fh.seek(self._pos)
+        self._fh, self._partial = fh, b""
+        return True
+
+    def _poll(self, timeout: float) -> SourceBatch:
+        if self._fh is None and not self._open():
+            time.sleep(timeout)
+            return SourceBatch()
+        lines = self._read_lines()
+        if not lines:
+            try:
+                st = os.stat(self.path)
+            except FileNotFoundError:
+                st = None
+            if st is not None and (st.st_ino != self._inode or st.st_size < self._pos):
+                # rotated or truncated: the old handle is drained, follow the new file
+                self._fh.close()
+                self._fh = None
+                if st.st_ino == self._inode:
+                    self._inode = None  # truncated in place: restart at 0
+                return SourceBatch()
+            time.sleep(timeout)
+            return SourceBatch()
+        return SourceBatch(lines, {"inode": self._inode, "pos": self._pos})
+
+    def _read_lines(self) -> List[str]:
+        out: List[str] = []
+        while len(out) < self.max_batch:
+            chunk = self._fh.readline()
+            if not chunk:
+                break
+            if not chunk.endswith(b"\n"):
+                self._partial += chunk  # writer is mid-line: wait for the rest
+                break
+            line, self._partial = self._partial + chunk, b""
+            self._pos += len(line)
+            if line.strip():
+                out.append(line.decode("utf-8", errors="replace"))
+        return out
+
+    def _commit(self, offsets: Dict) -> None:
+        tmp = self.offset_path + ".tmp"
+        with open(tmp, "w") as fh:
+            fh.write(f"{offsets['inode']} {offsets['pos']}\n")
+        os.replace(tmp, self.offset_path)
+
+    def close(self) -> None:
+        super().close()
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+
+class UnixSocketSource(Source):
+    """Newline-delimited records from any number of Unix-socket producers."""
+
+    def __init__(self, path: str, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        if os.path.exists(path):
+            os.unlink(path)  # stale socket of a previous run
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(path)
+        self._server.listen()
+        self._server.setblocking(False)
+        self._sel = selectors.DefaultSelector()
+        self._sel.register(self._server, selectors.EVENT_READ)
+        self._partial: Dict[socket.socket, bytes] = {}
+
+    def _poll(self, timeout: float) -> SourceBatch:
+        out: List[str] = []
+        for key, _ in self._sel.select(timeout):
+            sock = key.fileobj
+            if sock is self._server:
+                conn, _ = self._server.accept()
+                conn.setblocking(False)
+                self._sel.register(conn, selectors.EVENT_READ)
+                self._partial[conn] = b""
+                continue
+            try:
+                data = sock.recv(1 << 16)
+            except BlockingIOError:
+                continue
+            except ConnectionResetError:
+                data = b""
+            buf = self._partial[sock] + data
+            if not data:  # producer hung up: keep a last unterminated record
+                self._sel.unregister(sock)
+                sock.close()
+                del self._partial[sock]
+                if buf.strip():
+                    out.append(buf.decode("utf-8", errors="replace"))
+                continue
+            *lines, self._partial[sock] = buf.split(b"\n")
+            out.extend(line.decode("utf-8", errors="replace") for line in lines if line.strip())
+        return SourceBatch(out)
+
+    def close(self) -> None:
+        super().close()
+        for key in list(self._sel.get_map().values()):
+            key.fileobj.close()
+        self._sel.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+class KafkaSource(Source):
+    """Consumer group member of a Kafka topic (or of a ``FakeBroker`` topic)."""
+
+    def __init__(self, topic: str, group: str, bootstrap: Optional[str] = None,
+                 broker: Optional[FakeBroker] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.topic, self.group = topic, group
+        self._consumer = broker.consumer(topic, group) if broker is not None else _KafkaConsumer(bootstrap, topic, group)
+
+    def _poll(self, timeout: float) -> SourceBatch:
+        polled = self._consumer.poll(self.max_batch, timeout)
+        offsets: Dict[int, int] = {}
+        for part, offset, _ in polled:
+            offsets[part] = offset + 1  # committed offset = next record to read
+        records = [v.decode("utf-8", errors="replace") if isinstance(v, bytes) else v for _, _, v in polled]
+        return SourceBatch(records, offsets or None)
+
+    def mark_processed(self, batch: SourceBatch) -> None:
+        if batch.offsets:
+            merged = dict(self._processed or {})
+            merged.update(batch.offsets)
+            self._processed = merged
+
+    def _commit(self, offsets: Dict) -> None:
+        self._consumer.commit(offsets)
+
+    def close(self) -> None:
+        super().close()
+        self._consumer.close()
+
+
+# ---------- sinks ----------
+class Sink:
+    """Base class: buffers records and sends them in batches.
+
+    Subclasses implement ``_send`` (one batch). ``write`` takes text as
+    ``stream_processor`` writes it (one or more newline-terminated records).
+    """
+
+    def __init__(self, max_batch: int = 500, linger_sec: float = 0.05):
+        self.max_batch = max_batch
+        self.linger_sec = linger_sec
+        self.records = 0
+        self.batches = 0
+        self._buf: List[str] = []
+        self._first: Optional[float] = None
+
+    def _send(self, records: List[str]) -> None:
+        raise NotImplementedError
+
+    @property
+    def written(self) -> int:
+        """Records sent (``_send`` returns once they are durable)."""
+        return self.records
+
+    def write(self, text: str) -> int:
+        if self._first is None:
+            self._first = time.monotonic()
+        self._buf.extend(line for line in text.splitlines() if line)
+        if len(self._buf) >= self.max_batch or time.monotonic() - self._first >= self.linger_sec:
+            self.flush()
+        return len(text)
+
+    def flush(self) -> None:
+        if self._buf:
+            self._send(self._buf)
+            self.records += len(self._buf)
+            self.batches += 1
+            self._buf = []
+        self._first = None
+
+    def close(self) -> None:
+        self.flush()
+
+
+class FileSink(Sink):
+    """Appends records as JSON lines to a file (``-``: stdout)."""
+
+    def __init__(self, path: str, **kwargs):
+        super().__init__(**kwargs)
+        self._fh = sys.stdout if path == "-" else open(path, "a")
+
+    def _send(self, records: List[str]) -> None:
+        self._fh.write("\n".join(records) + "\n")
+        self._fh.flush()
+
+    def close(self) -> None:
+        super().close()
+        if self._fh is not sys.stdout:
+            self._fh.close()
+
+
+class KafkaSink(Sink):
+    """Produces records to a Kafka topic (or a ``FakeBroker`` topic)."""
+
+    def __init__(self, topic: str, bootstrap: Optional[str] = None, broker: Optional[FakeBroker] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.topic = topic
+        self._producer = broker.producer(topic) if broker is not None else _KafkaProducer(bootstrap, topic)
+
+    def _send(self, records: List[str]) -> None:
+        self._producer.send_batch([r.encode("utf-8") for r in records])
+        self._producer.flush()
+
+    def close(self) -> None:
+        super().close()
+        self._producer.close()
+
+
+# ---------- specs ----------
+def open_source(spec: str, **kwargs) -> Source:
+    """Source for ``tail:PATH``, ``unix:PATH``, ``kafka://…/TOPIC?group=G`` or ``memory://TOPIC?group=G``.
+
+    Keyword arguments go to the ``Source`` constructor (``max_batch``,
+    ``poll_timeout``, ``idle_timeout``).
+
+    Raises:
+        ValueError: For an unknown scheme
+    """
+    if spec.startswith("tail:"):
+        return FileTailSource(spec[len("tail:"):], **kwargs)
+    if spec.startswith("unix:"):
+        return UnixSocketSource(spec[len("unix:"):], **kwargs)
+    url = urlparse(spec)
+    group = parse_qs(url.query).get("group", ["dovah-features"])[0]
+    if url.scheme == "kafka":
+        return KafkaSource(url.path.lstrip("/"), group, bootstrap=url.netloc, **kwargs)
+    if url.scheme == "memory":
+        return KafkaSource(url.netloc, group, broker=LOCAL_BROKER, **kwargs)
+    raise ValueError(f"Unknown source: {spec} (expected tail:, unix:, kafka:// or memory://)")
+
+
+def open_sink(spec: str, window_size_sec: float = 0, window_stride_sec: float = 0, **kwargs):
+    """Sink for ``-``, ``file:PATH`` / ``PATH``, ``kafka://…/TOPIC``, ``memory://TOPIC`` or a database URL.
+
+    The window size and stride are stored with each row by the database
+    sink (``src.stream.db_sink.WindowFeaturesSink``); the others ignore them.
+    """
+    url = urlparse(spec)
+    if url.scheme.split("+")[0] in ("postgresql", "postgres", "sqlite"):
+        from src.stream.db_sink import WindowFeaturesSink
+
+        return WindowFeaturesSink(spec, window_size_sec, window_stride_sec, **kwargs)
+    if url.scheme == "kafka":
+        return KafkaSink(url.path.lstrip("/"), bootstrap=url.netloc, **kwargs)
+    if url.scheme == "memory":
+        return KafkaSink(url.netloc, broker=LOCAL_BROKER, **kwargs)
+    return FileSink(spec[len("file:"):] if spec.startswith("file:") else spec, **kwargs)
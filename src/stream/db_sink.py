@@ -0,0 +1,282 @@
+"""Asynchronous sink from ``src.stream.features`` into ``window_features``.
+
+``WindowFeaturesSink`` is file-like (``write`` / ``flush`` / ``close``), so
+it can be handed to ``stream_processor`` as ``out`` or used as the sink of
+``src.stream.job --mode live``. ``write`` only queues the text it is given
+(a ``BoundedQueue``, so a database that falls behind applies backpressure
+instead of growing memory). A background writer thread maps the records
+to ``window_features`` rows and upserts them on ``(ts, session_id)`` in
+batches of ``max_batch`` rows, or after ``linger_sec`` if fewer rows are
+waiting. Window emission latency never includes a database round trip.
+
+On ``postgresql+psycopg`` engines a batch is ``COPY``-ed into a temporary
+staging table and merged with ``INSERT ... SELECT ... ON CONFLICT DO
+UPDATE``. Other engines (e.g. SQLite in tests) get the same upsert as a
+multi-row ``executemany``.
+
+Row mapping: ``ts`` is the window end. Records keyed by session
+(``--partitions`` with ``--partition-key session_id``) go under their
+session. Global records (the single-process stream, or the ``--merge``
+record) go under ``ALL_SESSIONS``. ``host`` is ``ALL_HOSTS``. Host-keyed
+records cannot be told apart under the table's ``(ts, session_id)`` key
+and are rejected.
+
+Metrics: ``flush_ms`` (one batch's database time), ``commit_lag_ms`` (from
+``write`` of a batch's oldest row to its commit), ``backlog`` (rows
+written but not yet committed, with its maximum) and the time ``write``
+spent blocked on a full backlog; ``stats()`` summarizes them and
+``close`` logs them.
+"""
+import json
+import logging
+import queue
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import sqlalchemy as sa
+from sqlalchemy.engine import Engine
+
+from src.common.latency import LatencyHistogram
+from src.common.timeparse import TimestampParser
+from src.stream.queues import BoundedQueue, QueueAborted, run_stage
+
+TABLE = "window_features"
+WINDOW_FEATURE_COLUMNS: Tuple[str, ...] = (
+    "ts", "session_id", "host", "window_size", "window_slide", "event_count",
+    "unique_components", "error_ratio", "template_entropy", "component_entropy",
+)
+CONFLICT_KEY: Tuple[str, ...] = ("ts", "session_id")
+ALL_SESSIONS = "*"
+ALL_HOSTS = "*"
+_WINDOW_END = TimestampParser()  # parses feature_row window ends
+
+
+def feature_row(record: Dict, window_size_sec: float, window_stride_sec: float,
+                keyed_by_session: bool = False) -> Tuple:
+    """Project a feature record onto ``WINDOW_FEATURE_COLUMNS``."""
+    key = record.get("partition_key") if keyed_by_session else None
+    return (
+        _WINDOW_END.parse(record["window_end"]),
+        ALL_SESSIONS if key is None else str(key),
+        ALL_HOSTS,
+        int(round(window_size_sec)),
+        int(round(window_stride_sec)),
+        record["event_count"],
+        record["unique_components"],
+        record["error_ratio"],
+        record["template_entropy"],
+        record["component_entropy"],
+    )
+
+
+class WindowFeaturesSink:
+    """Batched upserts of feature records into ``window_features`` on a writer thread."""
+
+    def __init__(
+        self,
+        db: Any,
+        window_size_sec: float,
+        window_stride_sec: float,
+        partition_key: Optional[str] = None,
+        max_batch: int = 500,
+        linger_sec: float = 1.0,
+        backlog_capacity: int = 100_000,
+        put_timeout: Optional[float] = None,
+        table: str = TABLE,
+    ):
+        """Start the writer thread.
+
+        Args:
+            db: SQLAlchemy engine or database URL
+            window_size_sec: Stored as ``window_size``
+            window_stride_sec: Stored as ``window_slide``
+            partition_key: ``session_id`` if per-key records are keyed by
+                session (``host`` is rejected, see the module docstring)
+            max_batch: Rows per upsert
+            linger_sec: Longest a row waits for its batch to fill
+            backlog_capacity: Writes queued before ``write`` blocks
+            put_timeout: Seconds ``write`` may block on a full backlog
+                before raising ``queue.Full`` (None: block)
+            table: Target table
+
+        Raises:
+            ValueError: For ``partition_key`` ``host`` or a bad ``max_batch``
+        """
+        if partition_key not in (None, "session_id"):
+            raise ValueError(f"{table} rows are keyed by (ts, session_id); cannot store records keyed by {partition_key}")
+        if max_batch < 1:
+            raise ValueError("max_batch must be positive")
+        self.engine: Engine = sa.create_engine(db, pool_pre_ping=True) if isinstance(db, str) else db
+        self.window_size_sec = window_size_sec
+        self.window_stride_sec = window_stride_sec
+        self.keyed_by_session = partition_key == "session_id"
+        self.max_batch = max_batch
+        self.linger_sec = linger_sec
+        self.table = table
+        self.records = 0  # rows accepted by write
+        self.rows_written = 0  # rows committed
+        self.batches = 0
+        self.backlog_max = 0
+        self.flush_ms = LatencyHistogram()
+        self.commit_lag_ms = LatencyHistogram()
+        self._queue = BoundedQueue(f"features->{table}", backlog_capacity, put_timeout)
+        self._closed = False
+        self._writer = run_stage(f"{table}-writer", self._drain, upstream=self._queue)
+
+    @property
+    def supports_copy(self) -> bool:
+        return self.engine.dialect.name == "postgresql" and self.engine.dialect.driver == "psycopg"
+
+    @property
+    def written(self) -> int:
+        """Rows committed (the connector ``Sink`` counterpart)."""
+        return self.rows_written
+
+    @property
+    def backlog(self) -> int:
+        """Rows written but not yet committed (queued, batching or in flight)."""
+        return self.records - self.rows_written
+
+    # --- producer side (feature stage) ---
+    def write(self, text: str) -> int:
+        """Queue the feature records in ``text`` (JSON lines).
+
+        Raises:
+            QueueAborted: If the writer thread failed
+            queue.Full: If the backlog stayed full for ``put_timeout``
+        """
+        if not text:
+            return 0
+        n = text.count("\n") + (not text.endswith("\n"))  # records are never empty lines
+        self._queue.put((text, time.perf_counter()), units=n)
+        self.records += n
+        backlog = self.backlog
+        if backlog > self.backlog_max:
+            self.backlog_max = backlog
+        return len(text)
+
+    def flush(self) -> None:
+        """No-op: rows are committed by the writer thread (by size or ``linger_sec``)."""
+
+    def close(self) -> None:
+        """Commit everything written, stop the writer and log the metrics.
+
+        Raises:
+            RuntimeError: If the writer thread failed (rows may be lost)
+        """
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._queue.close()
+        except QueueAborted:
+            pass  # the writer failed: raised below
+        self._writer.join()
+        self.log_stats()
+        if self._writer.error is not None:
+            raise RuntimeError(f"{self.table} writer failed after {self.rows_written} rows") from self._writer.error
+
+    # --- writer thread ---
+    def _drain(self) -> None:
+        batch: List[Tuple[Tuple, float]] = []
+        deadline = 0.0
+        while True:
+            try:
+                item = self._queue.get(None if not batch else max(deadline - time.perf_counter(), 0.0))
+            except queue.Empty:
+                self._flush(batch)
+                batch = []
+                continue
+            except StopIteration:
+                break
+            if not batch:
+                deadline = time.perf_counter() + self.linger_sec
+            text, written_at = item
+            for line in text.splitlines():
+                row = feature_row(json.loads(line), self.window_size_sec, self.window_stride_sec,
+                                  self.keyed_by_session)
+                batch.append((row, written_at))
+            if len(batch) >= self.max_batch or time.perf_counter() >= deadline:
+                self._flush(batch)
+                batch = []
+        if batch:
+            self._flush(batch)
+
+    def _flush(self, batch: List[Tuple[Tuple, float]]) -> None:
+        # one row per (ts, session_id): ON CONFLICT cannot update a row twice in one statement
+        rows = list({row[:2]: row for row, _ in batch}.values())
+        t0 = time.perf_counter()
+        if self.supports_copy:
+            self._copy_upsert(rows)
+        else:
+            self._upsert(rows)
+        done = time.perf_counter()
+        self.flush_ms.record((done - t0) * 1000.0)
+        self.commit_lag_ms.record((done - batch[0][1]) * 1000.0)
+        self.rows_written += len(batch)  # superseded duplicates count as written
+        self.batches += 1
+
+    def _upsert_sql(self, source: Optional[str] = None) -> str:
+        cols = ", ".join(WINDOW_FEATURE_COLUMNS)
+        key = ", ".join(CONFLICT_KEY)
+        updates = ", ".join(f"{c} = EXCLUDED.{c}" for c in WINDOW_FEATURE_COLUMNS if c not in CONFLICT_KEY)
+        if source is None:
+            values = "VALUES (" + ", ".join(f":{c}" for c in WINDOW_FEATURE_COLUMNS) + ")"
+        else:
+            values = f"SELECT {cols} FROM {source}"
+        return f"INSERT INTO {self.table} ({cols}) {values} ON CONFLICT ({key}) DO UPDATE SET {updates}"
+
+    def _upsert(self, rows: Sequence[Tuple]) -> None:
+        params = [dict(zip(WINDOW_FEATURE_COLUMNS, row)) for row in rows]
+        with self.engine.begin() as cx:
+            cx.execute(sa.text(self._upsert_sql()), params)
+
+    def _copy_upsert(self, rows: Sequence[Tuple]) -> None:
+        cols = ", ".join(WINDOW_FEATURE_COLUMNS)
+        stage = f"_stage_{self.table}"
+        raw = self.engine.raw_connection()
+        try:
+            conn = raw.driver_connection
+            with conn.cursor() as cur:
+                cur.execute(
+                    f"CREATE TEMP TABLE IF NOT EXISTS {stage} ON COMMIT DELETE ROWS "
+                    f"AS SELECT {cols} FROM {self.table} WITH NO DATA"
+                )
+                with cur.copy(f"COPY {stage} ({cols}) FROM STDIN") as copy:
+                    for row in rows:
+                        copy.write_row(row)
+                cur.execute(self._upsert_sql(stage))
+            conn.commit()
+        except Exception:
+            raw.rollback()
+            raise
+        finally:
+            raw.close()
+
+    # --- metrics ---
+    def stats(self) -> Dict[str, float]:
+        """Rows, batches, flush latency, commit lag and backlog summary."""
+        def pct(hist: LatencyHistogram, p: float) -> float:
+            return hist.percentile(p) if hist.count else 0.0
+
+        return {
+            "rows": self.records,
+            "rows_written": self.rows_written,
+            "batches": self.batches,
+            "backlog": self.backlog,
+            "backlog_max": self.backlog_max,
+            "write_blocked_ms_total": self._queue.put_wait.total,
+            "flush_p50_ms": pct(self.flush_ms, 50),
+            "flush_p99_ms": pct(self.flush_ms, 99),
+            "commit_lag_p50_ms": pct(self.commit_lag_ms, 50),
+            "commit_lag_p99_ms": pct(self.commit_lag_ms, 99),
+        }
+
+    def log_stats(self) -> None:
+        s = self.stats()
+        logging.info(
+            "%s sink: %d/%d rows committed in %d batches, flush p50 %.1fms p99 %.1fms, "
+            "commit lag p50 %.1fms p99 %.1fms, backlog max %d",
+            self.table, s["rows_written"], s["rows"], s["batches"], s["flush_p50_ms"], s["flush_p99_ms"],
+            s["commit_lag_p50_ms"], s["commit_lag_p99_ms"], s["backlog_max"],
+        )
@@ -0,0 +1,161 @@
+"""Compact event records for the windowing hot path of ``src.stream.features``.
+
+A decoded event is a dict of strings plus an ``_internal`` dict of three
+aware datetimes, over a kilobyte per event once its strings are counted.
+Windows only need six things from it, so a buffered event is reduced to:
+
+- ``ts_ns`` / ``replay_ns``: event and replay time, int64 epoch nanoseconds;
+- ``host`` / ``component`` / ``template``: ints interned in the
+  process-wide tables of ``src.common.interning`` (``NO_KEY`` for a
+  missing host or component);
+- ``error``: whether the level is in ``ERROR_LEVELS``.
+
+``StreamEvent`` is that record as a ``__slots__`` object (events waiting in
+the out-of-order buffer). ``EventBuffer`` is the in-window FIFO. It stores
+records column-wise in typed arrays: 29 bytes per event, with no per-event
+Python objects for the garbage collector to walk. Appends go at the end.
+Evictions advance a head index, and the evicted prefix is cut off once it
+is as long as the rest, so both are amortized O(1).
+
+Interned ids are only meaningful in the process that assigned them;
+``to_tuple`` / ``from_tuple`` carry records across processes and restarts
+by name.
+"""
+from array import array
+from typing import Dict, Iterator, Mapping, Optional, Tuple
+
+from src.common.interning import Interner, get_interner, get_template_interner
+from src.common.timeparse import to_epoch_ns
+
+ERROR_LEVELS = frozenset({"ERROR", "FATAL", "CRITICAL"})
+NO_KEY = -1  # missing host or component
+
+HOSTS = get_interner("host")
+COMPONENTS = get_interner("component")
+TEMPLATES = get_template_interner()
+
+_COMPACT_MIN = 4096  # evicted events kept before the prefix is cut off
+
+
+def key_name(interner: Interner, i: int) -> Optional[str]:
+    """Name of an interned host or component (None for ``NO_KEY``)."""
+    return None if i < 0 else interner.names[i]
+
+
+def by_name(counts: Mapping[int, int], interner: Interner) -> Dict[Optional[str], int]:
+    """``counts`` keyed by interned id, re-keyed by name."""
+    names = interner.names
+    return {(None if i < 0 else names[i]): c for i, c in counts.items()}
+
+
+class StreamEvent:
+    """The fields of one event that windows use (see the module docstring)."""
+
+    __slots__ = ("ts_ns", "replay_ns", "host", "component", "template", "error")
+
+    def __init__(self, ts_ns: int, replay_ns: int, host: int, component: int, template: int, error: bool):
+        self.ts_ns = ts_ns
+        self.replay_ns = replay_ns
+        self.host = host
+        self.component = component
+        self.template = template
+        self.error = error
+
+    @classmethod
+    def from_event(cls, event: Dict) -> "StreamEvent":
+        """Record of a prepared event (``_internal["original_ts"]``, optionally ``replay_ts``)."""
+        internal = event["_internal"]
+        ts_ns = to_epoch_ns(internal["original_ts"])
+        replay = internal.get("replay_ts")
+        host = event.get("host")
+        comp = event.get("component")
+        return cls(
+            ts_ns,
+            ts_ns if replay is None else to_epoch_ns(replay),
+            NO_KEY if host is None else HOSTS.intern(host),
+            COMPONENTS.intern(comp) if comp else NO_KEY,
+            TEMPLATES.intern(event.get("template_id")),
+            event.get("level") in ERROR_LEVELS,
+        )
+
+    def to_tuple(self) -> Tuple:
+        """Process-independent form (names instead of interned ids)."""
+        return (self.ts_ns, self.replay_ns, key_name(HOSTS, self.host), key_name(COMPONENTS, self.component),
+                TEMPLATES.names[self.template], self.error)
+
+    @classmethod
+    def from_tuple(cls, data: Tuple) -> "StreamEvent":
+        ts_ns, replay_ns, host, comp, template, error = data
+        return cls(ts_ns, replay_ns, NO_KEY if host is None else HOSTS.intern(host),
+                   COMPONENTS.intern(comp) if comp else NO_KEY, TEMPLATES.intern(template), error)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, StreamEvent) and all(
+            getattr(self, f) == getattr(other, f) for f in self.__slots__
+        )
+
+    def __repr__(self) -> str:
+        return "StreamEvent(" + ", ".join(f"{f}={getattr(self, f)!r}" for f in self.__slots__) + ")"
+
+
+class EventBuffer:
+    """FIFO of ``StreamEvent``s stored column-wise."""
+
+    def __init__(self):
+        self.ts_ns = array("q")
+        self.replay_ns = array("q")
+        self.host = array("i")
+        self.component = array("i")
+        self.template = array("i")
+        self.error = array("b")
+        self._head = 0  # index of the oldest event
+
+    def _columns(self) -> Tuple[array, ...]:
+        return self.ts_ns, self.replay_ns, self.host, self.component, self.template, self.error
+
+    def __len__(self) -> int:
+        return len(self.ts_ns) - self._head
+
+    def __bool__(self) -> bool:
+        return len(self.ts_ns) > self._head
+
+    def append(self, ev: StreamEvent) -> None:
+        self.ts_ns.append(ev.ts_ns)
+        self.replay_ns.append(ev.replay_ns)
+        self.host.append(ev.host)
+        self.component.append(ev.component)
+        self.template.append(ev.template)
+        self.error.append(ev.error)
+
+    @property
+    def first_ts_ns(self) -> int:
+        """Event time of the oldest event (IndexError if empty)."""
+        if self._head >= len(self.ts_ns):
+            raise IndexError("first_ts_ns of an empty EventBuffer")
+        return self.ts_ns[self._head]
+
+    def _record(self, i: int) -> StreamEvent:
+        return StreamEvent(self.ts_ns[i], self.replay_ns[i], self.host[i], self.component[i],
+                           self.template[i], bool(self.error[i]))
+
+    def popleft(self) -> StreamEvent:
+        """Remove and return the oldest event."""
+        i = self._head
+        if i >= len(self.ts_ns):
+            raise IndexError("popleft from an empty EventBuffer")
+        ev = self._record(i)
+        self._head = i + 1
+        if self._head >= _COMPACT_MIN and 2 * self._head >= len(self.ts_ns):
+            for col in self._columns():
+                del col[:self._head]
+            self._head = 0
+        return ev
+
+    def __iter__(self) -> Iterator[StreamEvent]:
+        for i in range(self._head, len(self.ts_ns)):
+            yield self._record(i)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the columns (including evicted events not yet cut off)."""
+        return sum(col.itemsize * col.buffer_info()[1] for col in self._columns())
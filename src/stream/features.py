@@ -4,6 +4,9 @@
 Usage:
     python -m src.stream.replay --input-file sample_data/hdfs/sample.jsonl | \
     python -m src.stream.features --window-size-sec 60
+
+    # upsert the records into window_features instead of printing them
+    ... | python -m src.stream.features --db-url postgresql+psycopg://dovah@localhost/dovah
 """
 from __future__ import annotations
 
@@ -12,14 +15,23 @@ import csv
 import json
 import logging
 import sys
-from collections import Counter, deque
+from collections import deque
 from datetime import datetime, timedelta, timezone
-from itertools import takewhile
+from functools import partial
+from itertools import islice
 from pathlib import Path
-from typing import Deque, Dict, List, Optional, Set
+from typing import Callable, Deque, Dict, Iterable, Mapping, Optional, TextIO, Tuple
+
+from jsonschema import ValidationError
 
-import numpy as np
-from jsonschema import ValidationError, validate
+from src.common.latency import LatencyHistogram
+from src.common.schema import SchemaValidator
+from src.common.timeparse import TimestampParser
+from src.stream.burst import DEFAULT_HORIZONS, BurstMonitor
+from src.stream.checkpoint import Checkpointer, load_checkpoint
+from src.stream.events import HOSTS, by_name
+from src.stream.framing import open_input
+from src.stream.windows import SlidingWindowState, Watermark, WindowedStream
 
 # ---------- logging ----------
 logging.basicConfig(
@@ -29,58 +41,79 @@ logging.basicConfig(
 )
 
 # ---------- helpers ----------
-def _parse_ts(s: str) -> datetime:
-    """Robust ISO-8601 parser that accepts 'Z' (UTC) and offsets."""
+# One parser per timestamp field: each locks onto the format of its own values
+_EVENT_TS = TimestampParser()
+_REPLAY_TS = TimestampParser()
+
+def _parse_ts(s: str, parser: TimestampParser = _EVENT_TS) -> datetime:
+    """Parse an event timestamp (ISO-8601, 'Z' or offsets, epoch) to UTC."""
     if s is None:
         raise ValueError("timestamp is None")
-    return datetime.fromisoformat(s.replace("Z", "+00:00"))
+    return parser.parse(s)
+
+def _prepare_event(item, validator: SchemaValidator) -> Dict:
+    """Decodes (JSON line) and validates an input item and attaches ``_internal`` timestamps.
+
+    Raises:
+        json.JSONDecodeError, KeyError, ValueError, ValidationError: For invalid events
+    """
+    event = json.loads(item) if isinstance(item, str) else item
+
+    # 'replay_ts' is not in the formal schema; pop it before validate
+    replay_ts_str = event.pop("replay_ts", None)
+    validator(event)
+
+    received_ts = datetime.now(timezone.utc)
+    event_ts = _parse_ts(event["timestamp"])
+    replay_ts_dt = _parse_ts(replay_ts_str, _REPLAY_TS) if replay_ts_str else received_ts
+
+    event["_internal"] = {
+        "received_ts": received_ts,
+        "replay_ts": replay_ts_dt,
+        "original_ts": event_ts,
+    }
+    return event
 
 # ---------- window processor ----------
-def process_window(
-    window_events: List[Dict],
-    prev_window_components: Set[str],
-    seen_templates: Set[str],
-    recent_event_counts: Deque[int],
+def _emit_features(
+    window_start: datetime,
+    window_end: datetime,
+    last_replay_ts: datetime,
+    event_count: int,
+    unique_templates: int,
+    rare_templates: int,
+    component_churn: int,
+    is_unseen_template: bool,
+    burst: BurstMonitor,
     latency_log_writer: Optional[csv.DictWriter] = None,
+    latency_hist: Optional[LatencyHistogram] = None,
+    out: Optional[TextIO] = None,
+    extra_fields: Optional[Dict] = None,
+    host_counts: Optional[Mapping] = None,
+    burst_key=None,
+    unique_components: int = 0,
+    error_count: int = 0,
+    template_entropy: float = 0.0,
+    component_entropy: float = 0.0,
 ) -> Dict:
-    """Calculates and emits features for a single window of events."""
-    if not window_events:
-        return {}
-
-    # --- Basic Features ---
-    timestamps = [e["_internal"]["original_ts"] for e in window_events]
-    window_start = min(timestamps)
-    window_end = max(timestamps)
-    event_count = len(window_events)
-
-    # --- Template Features ---
-    template_counts = Counter(e.get("template_id") for e in window_events)
-    current_window_templates = set(template_counts.keys())
-    unique_templates = len(template_counts)
-    rare_templates = sum(1 for c in template_counts.values() if c == 1)
+    """Builds, logs and writes one feature record from window aggregates.
+
+    ``extra_fields`` (e.g. the partition key) are appended to the record.
+    ``burst`` scores the window count (of the series ``burst_key``) and
+    ``host_counts`` against their multi-horizon history (``src.stream.burst``).
+    ``unique_components``, ``error_ratio`` and the entropies (bits) are the
+    ``IForestModel`` inputs, so records can be scored as they are emitted.
+    """
     rare_rate = rare_templates / event_count if event_count > 0 else 0.0
+    error_ratio = error_count / event_count if event_count > 0 else 0.0
 
-    # --- Component Churn ---
-    current_window_components = {e.get("component") for e in window_events if e.get("component")}
-    new_components = current_window_components - prev_window_components
-    disappeared_components = prev_window_components - current_window_components
-    component_churn = len(new_components) + len(disappeared_components)
-
-    # --- CEP Features ---
-    new_templates = current_window_templates - seen_templates
-    is_unseen_template = len(new_templates) > 0
-
-    is_burst = False
-    if recent_event_counts:
-        avg_count = float(np.mean(recent_event_counts))
-        std_count = float(np.std(recent_event_counts))
-        if event_count > avg_count + 2 * std_count and event_count > 20:
-            is_burst = True
+    burst_fields = burst.observe(window_end, event_count, host_counts, key=burst_key)
 
     # --- Latency (ingest -> features) ---
     emit_ts = datetime.now(timezone.utc)
-    last_replay_ts = max(e["_internal"]["replay_ts"] for e in window_events)
     lat_ms = (emit_ts - last_replay_ts).total_seconds() * 1000.0
+    if latency_hist is not None:
+        latency_hist.record(lat_ms)
 
     feature_record = {
         "window_start": window_start.isoformat(),
@@ -88,17 +121,19 @@ def process_window(
         "event_count": event_count,
         "unique_templates": unique_templates,
         "rare_template_rate": round(rare_rate, 4),
+        "unique_components": unique_components,
+        "error_ratio": round(error_ratio, 4),
+        "template_entropy": round(template_entropy, 4),
+        "component_entropy": round(component_entropy, 4),
         "component_churn": component_churn,
-        "is_burst": is_burst,
+        **burst_fields,
         "is_unseen_template": is_unseen_template,
         "emit_ts": emit_ts.isoformat(),
         "last_replay_ts": last_replay_ts.isoformat(),
         "lat_ms": round(lat_ms, 1),
-        "_internal": {
-            "components": current_window_components,
-            "templates": current_window_templates,
-        },
     }
+    if extra_fields:
+        feature_record.update(extra_fields)
 
     # optional CSV logging (match headers!)
     if latency_log_writer:
@@ -109,134 +144,406 @@ def process_window(
             }
         )
 
-    # Emit to stdout (without internals)
-    out = {k: v for k, v in feature_record.items() if k != "_internal"}
+    # Emit to stdout (or the in-process sink)
+    out = out or sys.stdout
     try:
-        sys.stdout.write(json.dumps(out) + "\n")
-        sys.stdout.flush()
+        out.write(json.dumps(feature_record) + "\n")
+        out.flush()
     except BrokenPipeError:
         logging.warning("Broken pipe. Exiting feature generation.")
         sys.exit(0)
 
     return feature_record
 
-# ---------- stream processor ----------
-def stream_processor(
-    window_size_sec: int,
-    window_stride_sec: float,
-    latency_log_file: Optional[str] = None,
-    schema_path: Optional[str] = None,
-):
-    """Reads events from stdin, windows them, and computes features in a streaming fashion."""
-    logging.info(f"Starting stream processing with {window_size_sec}s windows and {window_stride_sec}s stride.")
+def process_window_state(
+    state: SlidingWindowState,
+    burst: BurstMonitor,
+    latency_log_writer: Optional[csv.DictWriter] = None,
+    latency_hist: Optional[LatencyHistogram] = None,
+    out: Optional[TextIO] = None,
+    extra_fields: Optional[Dict] = None,
+    burst_key=None,
+) -> Dict:
+    """Emits the feature record of the window held in ``state``.
 
-    # Resolve schema path (default: file next to this module)
+    The caller commits ``state`` once the window counts as emitted.
+    """
+    if not state.count:
+        return {}
+    return _emit_features(
+        window_start=state.window_start,
+        window_end=state.window_end,
+        last_replay_ts=state.last_replay_ts,
+        event_count=state.count,
+        unique_templates=state.unique_templates,
+        rare_templates=state.rare_templates,
+        component_churn=state.component_churn,
+        is_unseen_template=state.has_unseen_template,
+        burst=burst,
+        latency_log_writer=latency_log_writer,
+        latency_hist=latency_hist,
+        out=out,
+        extra_fields=extra_fields,
+        host_counts=by_name(state.host_counts, HOSTS) if burst.hosts is not None else None,
+        burst_key=burst_key,
+        unique_components=state.unique_components,
+        error_count=state.error_count,
+        template_entropy=state.template_entropy,
+        component_entropy=state.component_entropy,
+    )
+
+class _WindowOperator:
+    """Event-time sliding windows of the single-process path.
+
+    Holds the state a checkpoint saves (window, watermark, burst
+    estimators, late event count and input offset) and hands each window
+    the watermark passes to ``emit(state, burst)``. Late events are counted
+    and written to ``late_file``; ``on_emitted`` is as in ``stream_processor``.
+    """
+
+    def __init__(self, windows: WindowedStream, watermark: Watermark, burst: BurstMonitor):
+        self.windows = windows
+        self.watermark = watermark
+        self.burst = burst
+        self.late_events = 0
+        self.offset = 0  # input items consumed
+        self.watermark_lag_hist = LatencyHistogram()
+        # outputs, set once they are open
+        self.emit: Callable[[SlidingWindowState, BurstMonitor], object] = process_window_state
+        self.late_file: Optional[TextIO] = None
+        self.on_emitted: Optional[Callable[[int], None]] = None
+        self._retained: Deque[Tuple[int, datetime]] = deque()  # (input item, event time) of buffered events
+        self._reported = 0  # last ``on_emitted`` value
+
+    def snapshot(self) -> Dict:
+        return {
+            "offset": self.offset,
+            "windows": self.windows.to_dict(),
+            "watermark": self.watermark.to_dict(),
+            "burst": self.burst.to_dict(),
+            "late_events": self.late_events,
+        }
+
+    def restore(self, saved: Dict) -> None:
+        """Continues from the ``snapshot`` ``saved``, keeping the current lateness settings.
+
+        Raises:
+            ValueError: If it was written with another window size or stride
+        """
+        windows = WindowedStream.from_dict(saved["windows"])
+        if (windows.window_size, windows.stride) != (self.windows.window_size, self.windows.stride):
+            raise ValueError("the checkpoint was written with other window size/stride")
+        self.windows = windows
+        self.watermark = Watermark.from_dict(dict(
+            saved["watermark"],
+            allowed_lateness=self.watermark.allowed_lateness,
+            idle_timeout=self.watermark.idle_timeout,
+        ))
+        self.burst = BurstMonitor.from_dict(saved["burst"])
+        self.late_events = saved["late_events"]
+        self.offset = saved["offset"]
+
+    def add(self, event: Dict) -> bool:
+        """Adds a validated event; returns whether windows were closed (a point to checkpoint at)."""
+        event_ts = event["_internal"]["original_ts"]
+        self.watermark.observe(event.get("host"), event_ts)
+        if self.windows.is_late(event_ts):
+            self.late_events += 1
+            if self.late_file:
+                self.late_file.write(json.dumps({k: v for k, v in event.items() if k != "_internal"}) + "\n")
+            return False
+        self.windows.add(event)
+        if self.on_emitted is not None:
+            self._retained.append((self.offset - 1, event_ts))
+
+        # Process all windows the watermark has passed (it never exceeds the latest timestamp)
+        next_end = self.windows.next_end
+        if next_end is not None and self.watermark.max_ts < next_end:
+            return False
+        self._close_until(self.watermark.value)
+        self._report_emitted()
+        return True
+
+    def finish(self) -> None:
+        """End of input: no more events can arrive, close up to the latest event time and flush the rest."""
+        if self.watermark.max_ts is not None:
+            self._close_until(self.watermark.max_ts)
+        window = self.windows.state
+        if self.windows.flush():
+            logging.info(f"Processing final window with {window.count} events.")
+            self.emit(window, self.burst)
+        self._retained.clear()
+        self._report_emitted()
+
+    def counted(self, items: Iterable) -> Iterable:
+        """``items``, counting them into ``offset`` as they are consumed."""
+        for item in items:
+            self.offset += 1
+            yield item
+
+    def _close_until(self, ts: datetime) -> None:
+        window = self.windows.state
+        for window_end in self.windows.advance(ts):
+            logging.info(f"Processing window ending {window_end.isoformat()} with {window.count} events.")
+            self.emit(window, self.burst)
+            window.commit()
+            self.watermark_lag_hist.record(self.watermark.lag.total_seconds() * 1000.0)
+
+    def _report_emitted(self) -> None:
+        if self.on_emitted is None:
+            return
+        start = self.windows.next_start
+        if start is not None:
+            # events before the window start were in emitted windows only
+            while self._retained and self._retained[0][1] < start:
+                self._retained.popleft()
+        low = self._retained[0][0] if self._retained else self.offset
+        if low > self._reported:
+            self._reported = low
+            self.on_emitted(low)
+
+
+def _load_validator(schema_path: Optional[str], mode: str, sample_every: int,
+                    first_n: int) -> Tuple[Dict, SchemaValidator]:
+    """The schema (default: file next to this module) and its validator; exits if it cannot be loaded."""
     if schema_path is None:
         schema_path = str(Path(__file__).with_name("parsed_log.schema.json"))
-
     try:
         schema = json.loads(Path(schema_path).read_text())
+        return schema, SchemaValidator(schema, mode=mode, sample_every=sample_every, first_n=first_n)
     except Exception as e:
         logging.error(f"Could not load or parse schema '{schema_path}': {e}")
         sys.exit(1)
 
-    # State
-    events_buffer: Deque[Dict] = deque()
-    first_event_time: Optional[datetime] = None
-    next_window_start: Optional[datetime] = None
-    prev_window_components: Set[str] = set()
-    seen_templates: Set[str] = set()
-    recent_event_counts: Deque[int] = deque(maxlen=10)
-
-    # CSV latency logging
-    latency_file = None
-    latency_log_writer: Optional[csv.DictWriter] = None
-    if latency_log_file:
-        try:
-            latency_file = open(latency_log_file, "w", newline="")
-            fieldnames = ["window_end_ts", "lat_ms"]
-            latency_log_writer = csv.DictWriter(latency_file, fieldnames=fieldnames)
-            latency_log_writer.writeheader()
-            logging.info(f"Logging latency stats to {latency_log_file}")
-        except IOError as e:
-            logging.error(f"Could not open latency log file {latency_log_file}: {e}")
-
-    # Consume stream
-    for line in sys.stdin:
-        try:
-            event = json.loads(line)
-
-            # 'replay_ts' is not in the formal schema; pop it before validate
-            replay_ts_str = event.pop("replay_ts", None)
-            validate(instance=event, schema=schema)
 
-            received_ts = datetime.now(timezone.utc)
-            event_ts = _parse_ts(event["timestamp"])
-            replay_ts_dt = _parse_ts(replay_ts_str) if replay_ts_str else received_ts
-
-            event["_internal"] = {
-                "received_ts": received_ts,
-                "replay_ts": replay_ts_dt,
-                "original_ts": event_ts,
-            }
-        except (json.JSONDecodeError, KeyError, ValueError, ValidationError) as e:
-            logging.warning(f"Skipping invalid event: {line.strip()} ({e})")
-            continue
-
-        if first_event_time is None:
-            first_event_time = event_ts
-            next_window_start = first_event_time
-
-        events_buffer.append(event)
+def _open_latency_log(path: Optional[str]) -> Tuple[Optional[TextIO], Optional[csv.DictWriter]]:
+    """CSV latency log (window_end_ts,lat_ms) and its writer, or ``(None, None)``."""
+    if not path:
+        return None, None
+    try:
+        latency_file = open(path, "w", newline="")
+        latency_log_writer = csv.DictWriter(latency_file, fieldnames=["window_end_ts", "lat_ms"])
+        latency_log_writer.writeheader()
+        logging.info(f"Logging latency stats to {path}")
+        return latency_file, latency_log_writer
+    except IOError as e:
+        logging.error(f"Could not open latency log file {path}: {e}")
+        return None, None
+
+
+def _open_late_events(path: Optional[str]) -> Optional[TextIO]:
+    if not path:
+        return None
+    try:
+        return open(path, "w")
+    except IOError as e:
+        logging.error(f"Could not open late events file {path}: {e}")
+        return None
 
-        # Process all complete windows
-        assert next_window_start is not None
-        while event_ts >= next_window_start + timedelta(seconds=window_size_sec):
-            window_end = next_window_start + timedelta(seconds=window_size_sec)
 
-            # take events < window_end (buffer is time-ordered)
-            events_in_window = list(
-                takewhile(lambda e: e["_internal"]["original_ts"] < window_end, events_buffer)
-            )
+def _save_histogram(hist: LatencyHistogram, path: Optional[str], what: str) -> None:
+    if not path:
+        return
+    try:
+        hist.save(path)
+    except IOError as e:
+        logging.error(f"Could not write {what} {path}: {e}")
+
+
+def _log_summary(operator: _WindowOperator, latency_hist: LatencyHistogram, latency_hist_file: Optional[str],
+                 watermark_lag_file: Optional[str], validator: SchemaValidator) -> None:
+    """Logs late events, latency and watermark lag quantiles and validation stats; saves the histograms."""
+    if operator.late_events:
+        logging.warning(f"Dropped {operator.late_events} events that arrived after their windows were emitted.")
+    if latency_hist.count:
+        logging.info(
+            "Window latency p50=%.1fms p95=%.1fms p99=%.1fms over %d windows.",
+            latency_hist.percentile(50), latency_hist.percentile(95),
+            latency_hist.percentile(99), latency_hist.count,
+        )
+    _save_histogram(latency_hist, latency_hist_file, "latency histogram")
+    lag = operator.watermark_lag_hist
+    if lag.count:
+        logging.info(
+            "Watermark lag p50=%.1fms p99=%.1fms max=%.1fms.",
+            lag.percentile(50), lag.percentile(99), lag.percentile(100),
+        )
+    _save_histogram(lag, watermark_lag_file, "watermark lag histogram")
+    if validator.mode != "full":
+        logging.info(f"Schema validation ({validator.mode}): {validator.stats}")
+    logging.info("Finished feature generation.")
 
-            if events_in_window:
-                logging.info(
-                    f"Processing window ending {window_end.isoformat()} with {len(events_in_window)} events."
-                )
-                feature_record = process_window(
-                    events_in_window,
-                    prev_window_components,
-                    seen_templates,
-                    recent_event_counts,
-                    latency_log_writer,
-                )
-                if feature_record and "_internal" in feature_record:
-                    prev_window_components = feature_record["_internal"].get("components", set())
-                    seen_templates.update(feature_record["_internal"].get("templates", set()))
-                    recent_event_counts.append(feature_record["event_count"])
-
-            # slide window
-            next_window_start += timedelta(seconds=window_stride_sec)
-
-            # prune buffer (events older than new window start)
-            while events_buffer and events_buffer[0]["_internal"]["original_ts"] < next_window_start:
-                events_buffer.popleft()
-
-    # Flush remaining events as a final window
-    if events_buffer:
-        logging.info(f"Processing final window with {len(events_buffer)} events.")
-        process_window(
-            list(events_buffer),
-            prev_window_components,
-            seen_templates,
-            recent_event_counts,
-            latency_log_writer,
+# ---------- stream processor ----------
+def stream_processor(
+    window_size_sec: int,
+    window_stride_sec: float,
+    latency_log_file: Optional[str] = None,
+    schema_path: Optional[str] = None,
+    latency_hist_file: Optional[str] = None,
+    validation_mode: str = "full",
+    validation_sample_every: int = 100,
+    validation_first_n: int = 1000,
+    events: Optional[Iterable[Dict]] = None,
+    out: Optional[TextIO] = None,
+    wire_format: str = "auto",
+    partitions: int = 1,
+    partition_key: str = "session_id",
+    merge: bool = False,
+    align_windows: bool = False,
+    allowed_lateness_sec: float = 0.0,
+    host_idle_sec: Optional[float] = None,
+    late_events_file: Optional[str] = None,
+    watermark_lag_file: Optional[str] = None,
+    checkpoint_path: Optional[str] = None,
+    checkpoint_interval_sec: float = 60.0,
+    restore_from: Optional[str] = None,
+    burst_horizons: str = DEFAULT_HORIZONS,
+    burst_z_threshold: float = 2.0,
+    on_emitted: Optional[Callable[[int], None]] = None,
+):
+    """Reads events from stdin, windows them, and computes features in a streaming fashion.
+
+    Stdin carries JSON lines or binary frames (``src.stream.framing``);
+    ``wire_format`` ``auto`` tells them apart by the first byte. With
+    ``events`` (e.g. ``replay.iter_replay``), event dicts are consumed
+    directly instead; feature records go to ``out`` (default stdout).
+
+    Events are checked against the schema with a compiled validator; with
+    ``validation_mode`` ``sampled`` (1 in ``validation_sample_every``) or
+    ``first_n`` (first ``validation_first_n`` per host) only a subset is.
+
+    With ``partitions`` > 1, events are hash-partitioned by ``partition_key``
+    across that many worker processes, which emit per-key feature records
+    (see ``src.stream.partition``); ``merge`` adds the global record per
+    window; each worker keeps its own watermark with the lateness settings
+    below. Partitioned windows start on the epoch grid of the stride;
+    ``align_windows`` does the same for the single-process path (which
+    otherwise starts the first window at the first event).
+
+    Windows close on event time: events are buffered in timestamp order and
+    a window is emitted once the watermark passes its end. Each host may be
+    up to ``allowed_lateness_sec`` out of order; the watermark is the
+    minimum over hosts of their latest timestamp minus that, ignoring hosts
+    more than ``host_idle_sec`` (default: the allowed lateness) behind the
+    leading one (see ``windows.Watermark``). An event arriving after a
+    window it belongs to was emitted is too late: it is counted and written
+    to ``late_events_file`` (JSON lines) instead. How far the watermark
+    trails the latest event time at each window is recorded in a histogram
+    saved to ``watermark_lag_file``.
+
+    With ``checkpoint_path``, the operator state (buffered events, window
+    position, template/component baselines, recent counts, watermark and
+    input offset) is checkpointed atomically at most every
+    ``checkpoint_interval_sec`` (``src.stream.checkpoint``).
+    ``restore_from`` resumes from such a checkpoint: the input must be the
+    same source replayed from its start, and the items before the
+    checkpoint's offset are skipped, so only the records after the
+    checkpoint are recomputed (and those emitted between the checkpoint
+    and the restart are emitted again).
+
+    ``is_burst`` and the other burst fields come from online estimators of
+    the window count per host and overall, over each of ``burst_horizons``
+    (comma-separated, e.g. ``10w,1h,24h``: windows or time; see
+    ``src.stream.burst``): a horizon flags when its z-score exceeds
+    ``burst_z_threshold``.
+
+    Window latencies are also recorded in a ``LatencyHistogram``; it is saved
+    to ``latency_hist_file`` (default: ``<latency_log_file>.hist.json``) so
+    SLO checks can read quantiles without re-sorting the CSV.
+
+    ``on_emitted(n)`` is called whenever the first ``n`` input items are
+    fully reflected in the records written to ``out`` so far: none of their
+    events is still buffered for a window that has not been emitted. A
+    source may commit those items once the records are durable (see
+    ``src.stream.job``). With ``partitions`` > 1 it is only called at the
+    end of the input. It cannot be combined with checkpoints: the source
+    replays from its committed offsets instead.
+    """
+    logging.info(f"Starting stream processing with {window_size_sec}s windows and {window_stride_sec}s stride.")
+    schema, validator = _load_validator(schema_path, validation_mode, validation_sample_every, validation_first_n)
+    if partitions > 1 and (checkpoint_path or restore_from):
+        raise ValueError("checkpoints are not supported with partitions > 1")
+    if on_emitted is not None and (checkpoint_path or restore_from):
+        # a committing source resumes from its committed offsets, not from a checkpoint's
+        raise ValueError("checkpoints are not supported with on_emitted")
+
+    operator = _WindowOperator(
+        WindowedStream(timedelta(seconds=window_size_sec), timedelta(seconds=window_stride_sec),
+                       align=align_windows),
+        Watermark(timedelta(seconds=allowed_lateness_sec),
+                  None if host_idle_sec is None else timedelta(seconds=host_idle_sec)),
+        BurstMonitor(window_stride_sec, burst_horizons, burst_z_threshold),
+    )
+    if restore_from:
+        try:
+            operator.restore(load_checkpoint(restore_from))
+        except (OSError, ValueError) as e:
+            logging.error(f"Could not restore from checkpoint {restore_from}: {e}")
+            sys.exit(1)
+        logging.info(f"Restored state from {restore_from}; resuming after input offset {operator.offset}.")
+
+    latency_hist = LatencyHistogram()
+    if latency_hist_file is None and latency_log_file:
+        latency_hist_file = str(Path(latency_log_file).with_suffix(".hist.json"))
+    latency_file, latency_log_writer = _open_latency_log(latency_log_file)
+    # Side output for events that arrive after their windows were emitted
+    late_file = _open_late_events(late_events_file)
+    operator.emit = partial(process_window_state, latency_log_writer=latency_log_writer,
+                            latency_hist=latency_hist, out=out)
+    operator.late_file = late_file
+    operator.on_emitted = on_emitted
+    checkpointer = Checkpointer(checkpoint_path, checkpoint_interval_sec) if checkpoint_path else None
+
+    # Consume stream: JSON lines or decoded frames from stdin, or event dicts handed over in-process
+    if events is None:
+        try:
+            events = open_input(sys.stdin, wire_format)
+        except ValueError as e:
+            logging.error(f"Cannot read input: {e}")
+            sys.exit(1)
+    if operator.offset:
+        events = islice(events, operator.offset, None)  # already reflected in the restored state
+
+    if partitions > 1:
+        from src.stream.partition import run_partitioned
+
+        operator.late_events = run_partitioned(
+            events if on_emitted is None else operator.counted(events),
+            partitions=partitions,
+            partition_key=partition_key,
+            window_size_sec=window_size_sec,
+            window_stride_sec=window_stride_sec,
+            schema=schema,
+            validation_mode=validation_mode,
+            validation_sample_every=validation_sample_every,
+            validation_first_n=validation_first_n,
+            merge=merge,
+            burst_horizons=burst_horizons,
+            burst_z_threshold=burst_z_threshold,
+            latency_log_writer=latency_log_writer,
+            latency_hist=latency_hist,
+            out=out,
+            allowed_lateness_sec=allowed_lateness_sec,
+            host_idle_sec=host_idle_sec,
+            late_out=late_file,
         )
+        events = ()  # consumed by the partitioned run
 
-    if latency_file:
-        latency_file.close()
+    for item in events:
+        operator.offset += 1
+        try:
+            event = _prepare_event(item, validator)
+        except (json.JSONDecodeError, KeyError, ValueError, ValidationError) as e:
+            logging.warning(f"Skipping invalid event: {str(item).strip()} ({e})")
+            continue
+        if operator.add(event) and checkpointer:
+            checkpointer.maybe_save(operator.snapshot)
+    operator.finish()
 
-    logging.info("Finished feature generation.")
+    for f in (latency_file, late_file):
+        if f:
+            f.close()
+    _log_summary(operator, latency_hist, latency_hist_file, watermark_lag_file, validator)
 
 # ---------- CLI ----------
 if __name__ == "__main__":
@@ -259,17 +566,151 @@ if __name__ == "__main__":
         default=None,
         help="Path to a CSV file to log latency metrics (window_end_ts,lat_ms).",
     )
+    parser.add_argument(
+        "--latency-hist-file",
+        type=str,
+        default=None,
+        help="Where to save the latency histogram (default: <latency-log-file>.hist.json).",
+    )
     parser.add_argument(
         "--schema-path",
         type=str,
         default=None,
         help="Path to the JSON schema for parsed events. Defaults to parsed_log.schema.json next to this file.",
     )
+    parser.add_argument(
+        "--validation-mode",
+        choices=["full", "sampled", "first-n"],
+        default="full",
+        help="Validate every event, 1 in --validation-sample-every, or the first --validation-first-n per host.",
+    )
+    parser.add_argument("--validation-sample-every", type=int, default=100)
+    parser.add_argument("--validation-first-n", type=int, default=1000)
+    parser.add_argument(
+        "--wire-format",
+        choices=["auto", "jsonl", "binary"],
+        default="auto",
+        help="Input encoding; auto detects binary frames from replay --wire-format binary.",
+    )
+    parser.add_argument(
+        "--partitions",
+        type=int,
+        default=1,
+        help="Worker processes; > 1 computes per-key windows partitioned by --partition-key.",
+    )
+    parser.add_argument("--partition-key", choices=["session_id", "host"], default="session_id")
+    parser.add_argument(
+        "--merge",
+        action="store_true",
+        help="With --partitions, also emit the global record per window (partition_key null).",
+    )
+    parser.add_argument(
+        "--allowed-lateness-sec",
+        type=float,
+        default=0.0,
+        help="How far out of event-time order a host's events may arrive before they count as late.",
+    )
+    parser.add_argument(
+        "--host-idle-sec",
+        type=float,
+        default=None,
+        help="Hosts further behind the leading host stop holding the watermark (default: allowed lateness).",
+    )
+    parser.add_argument(
+        "--late-events-file",
+        type=str,
+        default=None,
+        help="JSONL side output for events that arrive after their windows were emitted.",
+    )
+    parser.add_argument(
+        "--watermark-lag-file",
+        type=str,
+        default=None,
+        help="Where to save the histogram of watermark lag behind the latest event time (ms).",
+    )
+    parser.add_argument(
+        "--checkpoint-path",
+        type=str,
+        default=None,
+        help="Periodically write the operator state to this file (atomic replace).",
+    )
+    parser.add_argument(
+        "--checkpoint-interval-sec",
+        type=float,
+        default=60.0,
+        help="Minimum wall-clock seconds between checkpoints.",
+    )
+    parser.add_argument(
+        "--restore-from",
+        type=str,
+        default=None,
+        help="Resume from this checkpoint; the input is replayed from its start and skipped up to the checkpoint.",
+    )
+    parser.add_argument(
+        "--burst-horizons",
+        type=str,
+        default=DEFAULT_HORIZONS,
+        help="Burst detection horizons: windows (10w) or time (90s, 1h, 24h), comma-separated.",
+    )
+    parser.add_argument(
+        "--burst-z-threshold",
+        type=float,
+        default=2.0,
+        help="z-score of the window count above which a horizon flags a burst.",
+    )
+    parser.add_argument(
+        "--db-url",
+        type=str,
+        default=None,
+        help="Upsert the records into window_features at this database URL instead of printing them.",
+    )
+    parser.add_argument("--db-batch", type=int, default=500, help="Rows per window_features upsert.")
+    parser.add_argument(
+        "--db-linger-sec",
+        type=float,
+        default=1.0,
+        help="Longest a record waits for its window_features batch to fill.",
+    )
     args = parser.parse_args()
 
-    stream_processor(
-        window_size_sec=args.window_size_sec,
-        window_stride_sec=args.window_stride_sec,
-        latency_log_file=args.latency_log_file,
-        schema_path=args.schema_path,
-    )
+    out = None
+    if args.db_url:
+        from src.stream.db_sink import WindowFeaturesSink
+
+        try:
+            out = WindowFeaturesSink(
+                args.db_url, args.window_size_sec, args.window_stride_sec,
+                partition_key=args.partition_key if args.partitions > 1 else None,
+                max_batch=args.db_batch, linger_sec=args.db_linger_sec,
+            )
+        except ValueError as e:
+            parser.error(str(e))
+
+    try:
+        stream_processor(
+            window_size_sec=args.window_size_sec,
+            window_stride_sec=args.window_stride_sec,
+            latency_log_file=args.latency_log_file,
+            schema_path=args.schema_path,
+            latency_hist_file=args.latency_hist_file,
+            validation_mode=args.validation_mode,
+            validation_sample_every=args.validation_sample_every,
+            validation_first_n=args.validation_first_n,
+            wire_format=args.wire_format,
+            partitions=args.partitions,
+            partition_key=args.partition_key,
+            merge=args.merge,
+            allowed_lateness_sec=args.allowed_lateness_sec,
+            host_idle_sec=args.host_idle_sec,
+            late_events_file=args.late_events_file,
+            watermark_lag_file=args.watermark_lag_file,
+            checkpoint_path=args.checkpoint_path,
+            checkpoint_interval_sec=args.checkpoint_interval_sec,
+            restore_from=args.restore_from,
+            burst_horizons=args.burst_horizons,
+            burst_z_threshold=args.burst_z_threshold,
+            out=out,
+        )
+    finally:
+        if out is not None:
+            out.close()
@@ -0,0 +1,351 @@
+"""Compact binary framing for the replay -> features pipe.
+
+JSON lines with ISO-8601 timestamps cost most of the pipe's CPU time: both
+ends encode and decode every event as text. ``--wire-format binary``
+replaces them with length-prefixed frames of columnar micro-batches:
+
+- every frame is ``<u32 length><u8 kind><payload>`` (little endian);
+- ``host``, ``component``, ``template_id``, ``level`` and ``session_id`` are
+  dictionary encoded: a ``DICT`` frame carries the strings a batch is about
+  to use for the first time, and the batch carries u32 codes;
+- ``timestamp``, ``replay_ts`` and ``orig_ts`` travel as int64 epoch
+  nanoseconds;
+- ``message`` is a length-prefixed UTF-8 column; other fields, and values of
+  an unexpected type, go in a per-event JSON "extras" column.
+
+A stream starts with ``MAGIC``. Its first byte (0xFF) never occurs in UTF-8
+text, so ``sniff_wire_format`` can tell binary input from JSON lines.
+Decoded events are plain dicts with ISO-8601 UTC timestamps (``...Z``,
+microsecond precision), i.e. the same events a JSON-lines consumer sees.
+"""
+import json
+import logging
+import struct
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, TextIO, Union
+
+import numpy as np
+
+from src.common.timeparse import NAT_NS, TimestampParser
+
+WIRE_FORMATS = ("jsonl", "binary")
+MAGIC = b"\xffDVF\x01"
+
+TS_FIELDS = ("timestamp", "replay_ts", "orig_ts")
+DICT_FIELDS = ("host", "component", "template_id", "level", "session_id")
+TEXT_FIELD = "message"
+_KNOWN = frozenset(TS_FIELDS + DICT_FIELDS + (TEXT_FIELD,))
+
+# Frame kinds
+DICT = b"D"  # u8 field, u32 count, count x u32 lengths, UTF-8 blob
+BATCH = b"B"  # u32 n, columns (see FrameEncoder.encode)
+RESET = b"R"  # drop all dictionaries
+
+# Dictionary codes 0/1 and text lengths ABSENT/NULL mark a missing key / None
+_ABSENT = object()
+_CODE_ABSENT = 0
+_CODE_NULL = 1
+_FIRST_CODE = 2
+_LEN_ABSENT = 0xFFFFFFFF
+_LEN_NULL = 0xFFFFFFFE
+
+_U32 = struct.Struct("<I")
+_DICT_HEAD = struct.Struct("<cBI")
+_BATCH_HEAD = struct.Struct("<cI")
+
+
+def _frame(payload: bytes) -> bytes:
+    return _U32.pack(len(payload)) + payload
+
+
+def _iso_utc(ns: List[int]) -> List[str]:
+    """ISO-8601 UTC strings (microseconds, ``Z``) for epoch nanoseconds, vectorized."""
+    arr = np.array(ns, dtype=np.int64).view("M8[ns]").astype("M8[us]")
+    return np.datetime_as_string(arr, unit="us", timezone="UTC").tolist()
+
+
+_I64_MAX = (1 << 63) - 1
+
+
+def _new_codes() -> Dict[Any, int]:
+    return {_ABSENT: _CODE_ABSENT, None: _CODE_NULL}
+
+
+class FrameEncoder:
+    """Encodes event batches into frames; keeps the dictionaries of one stream."""
+
+    def __init__(self, max_dict_size: int = 1 << 20):
+        """Create an encoder for one stream.
+
+        Args:
+            max_dict_size: Once a dictionary holds more strings than this, all
+                dictionaries are reset (bounds memory on both ends when e.g.
+                session ids never repeat)
+        """
+        self.max_dict_size = max_dict_size
+        self._codes: List[Dict[Any, int]] = [_new_codes() for _ in DICT_FIELDS]
+        self._ts_parsers = {field: TimestampParser() for field in TS_FIELDS}
+        self._started = False
+
+    def encode(self, events: List[Dict[str, Any]]) -> bytes:
+        """Frames for one batch: stream header, dictionary deltas, then the batch.
+
+        Batch layout after the header: the ``TS_FIELDS`` as n x i64 each, the
+        ``DICT_FIELDS`` as n x u32 codes each, n x u32 message lengths, n x
+        u32 extras lengths, then the message and extras blobs.
+        """
+        out: List[bytes] = []
+        if not self._started:
+            out.append(MAGIC)
+            self._started = True
+        if any(len(codes) - _FIRST_CODE > self.max_dict_size for codes in self._codes):
+            out.append(_frame(RESET))
+            self._codes = [_new_codes() for _ in DICT_FIELDS]
+
+        n = len(events)
+        extras: Dict[int, Dict[str, Any]] = {}
+        for i, event in enumerate(events):
+            rest = event.keys() - _KNOWN
+            if rest:
+                extras[i] = {k: event[k] for k in rest}
+        qn, un = f"<{n}q", f"<{n}I"
+        parts = [_BATCH_HEAD.pack(BATCH, n)]
+
+        ns_cache: Dict[Any, int] = {_ABSENT: NAT_NS}  # replay stamps a whole batch with one time
+        for field in TS_FIELDS:
+            col = [e.get(field, _ABSENT) for e in events]
+            try:
+                ns_col = [ns_cache[v] for v in col]
+            except (KeyError, TypeError):
+                ns_col = [self._ts_slow(i, field, v, ns_cache, extras) for i, v in enumerate(col)]
+            parts.append(struct.pack(qn, *ns_col))
+
+        for f, field in enumerate(DICT_FIELDS):
+            col = [e.get(field, _ABSENT) for e in events]
+            codes = self._codes[f]
+            new: List[bytes] = []
+            try:
+                code_col = [codes[v] for v in col]
+            except (KeyError, TypeError):
+                code_col = [self._code_slow(i, field, v, codes, new, extras) for i, v in enumerate(col)]
+            if new:
+                lens = struct.pack(f"<{len(new)}I", *map(len, new))
+                out.append(_frame(_DICT_HEAD.pack(DICT, f, len(new)) + lens + b"".join(new)))
+            parts.append(struct.pack(un, *code_col))
+
+        texts = []
+        text_lens = []
+        for i, e in enumerate(events):
+            v = e.get(TEXT_FIELD, _ABSENT)
+            if v.__class__ is str:
+                b = v.encode()
+                texts.append(b)
+                text_lens.append(len(b))
+            elif v is None:
+                text_lens.append(_LEN_NULL)
+            else:
+                if v is not _ABSENT:
+                    extras.setdefault(i, {})[TEXT_FIELD] = v
+                text_lens.append(_LEN_ABSENT)
+        parts.append(struct.pack(un, *text_lens))
+
+        blobs = [json.dumps(extras[i]).encode() if i in extras else b"" for i in range(n)] if extras else []
+        parts.append(struct.pack(un, *map(len, blobs)) if extras else bytes(4 * n))
+        parts.extend(texts)
+        parts.extend(blobs)
+        out.append(_frame(b"".join(parts)))
+        return b"".join(out)
+
+    def _ts_slow(self, i: int, field: str, v: Any, ns_cache: Dict[Any, int], extras: Dict[int, Dict]) -> int:
+        if v.__class__ is str:
+            ns = ns_cache.get(v)
+            if ns is not None:
+                return ns
+            try:
+                ns = self._ts_parsers[field].parse_ns(v)
+            except ValueError:
+                pass
+            else:
+                if NAT_NS < ns <= _I64_MAX:  # else (e.g. year 1500 or 2300): kept as-is
+                    ns_cache[v] = ns
+                    return ns
+        elif v is _ABSENT:
+            return NAT_NS
+        extras.setdefault(i, {})[field] = v  # kept as-is
+        return NAT_NS
+
+    @staticmethod
+    def _code_slow(
+        i: int, field: str, v: Any, codes: Dict[Any, int], new: List[bytes], extras: Dict[int, Dict]
+    ) -> int:
+        if v.__class__ is str:
+            code = codes.get(v)
+            if code is None:
+                code = codes[v] = len(codes)
+                new.append(v.encode())
+            return code
+        if v is None or v is _ABSENT:
+            return codes[v]
+        extras.setdefault(i, {})[field] = v
+        return _CODE_ABSENT
+
+
+class FrameDecoder:
+    """Decodes frame payloads back into event dicts."""
+
+    def __init__(self):
+        self._values: List[List[Any]] = [[_ABSENT, None] for _ in DICT_FIELDS]
+
+    def decode(self, payload: bytes) -> List[Dict[str, Any]]:
+        """Events of one frame (empty for dictionary / reset frames).
+
+        Raises:
+            ValueError: On an unknown frame kind or a malformed payload
+        """
+        kind = payload[:1]
+        try:
+            if kind == BATCH:
+                return self._batch(payload)
+            if kind == DICT:
+                self._dict(payload)
+            elif kind == RESET:
+                self._values = [[_ABSENT, None] for _ in DICT_FIELDS]
+            else:
+                raise ValueError(f"Unknown frame kind: {kind!r}")
+        except (struct.error, IndexError, UnicodeDecodeError) as e:
+            raise ValueError(f"Malformed {kind!r} frame: {e}") from e
+        return []
+
+    def _dict(self, payload: bytes) -> None:
+        _, field, count = _DICT_HEAD.unpack_from(payload)
+        off = _DICT_HEAD.size
+        lens = struct.unpack_from(f"<{count}I", payload, off)
+        off += 4 * count
+        values = self._values[field]
+        for size in lens:
+            values.append(payload[off:off + size].decode())
+            off += size
+
+    def _batch(self, payload: bytes) -> List[Dict[str, Any]]:
+        _, n = _BATCH_HEAD.unpack_from(payload)
+        off = _BATCH_HEAD.size
+        qn, un = f"<{n}q", f"<{n}I"
+        columns: List[List[Any]] = []
+
+        iso_cache: Dict[int, Any] = {NAT_NS: _ABSENT}
+        for _ in TS_FIELDS:
+            col = struct.unpack_from(qn, payload, off)
+            off += 8 * n
+            missing = list(set(col).difference(iso_cache))
+            if missing:
+                iso_cache.update(zip(missing, _iso_utc(missing)))
+            columns.append([iso_cache[ns] for ns in col])
+
+        for values in self._values:
+            columns.append([values[c] for c in struct.unpack_from(un, payload, off)])
+            off += 4 * n
+
+        text_lens = struct.unpack_from(un, payload, off)
+        extra_lens = struct.unpack_from(un, payload, off + 4 * n)
+        off += 8 * n
+        texts = []
+        for size in text_lens:
+            if size < _LEN_NULL:
+                texts.append(payload[off:off + size].decode())
+                off += size
+            else:
+                texts.append(_ABSENT if size == _LEN_ABSENT else None)
+        columns.append(texts)
+
+        # Columns present in every event go through one dict(zip()) per row
+        keys = TS_FIELDS + DICT_FIELDS + (TEXT_FIELD,)
+        dense = [i for i, col in enumerate(columns) if _ABSENT not in col]
+        dense_keys = [keys[i] for i in dense]
+        events = [dict(zip(dense_keys, row)) for row in zip(*(columns[i] for i in dense))] or [{} for _ in range(n)]
+        for i, col in enumerate(columns):
+            if i not in dense:
+                key = keys[i]
+                for event, v in zip(events, col):
+                    if v is not _ABSENT:
+                        event[key] = v
+        if any(extra_lens):
+            for event, size in zip(events, extra_lens):
+                if size:
+                    event.update(json.loads(payload[off:off + size]))
+                    off += size
+        return events
+
+
+def iter_frames(stream: BinaryIO) -> Iterator[bytes]:
+    """Frame payloads from a binary stream (after ``MAGIC``).
+
+    A frame cut short by the producer exiting ends the stream with a warning.
+    """
+    read = stream.read
+    while True:
+        head = read(4)
+        if len(head) < 4:
+            if head:
+                logging.warning("Truncated frame header at end of stream.")
+            return
+        (size,) = _U32.unpack(head)
+        payload = read(size)
+        if len(payload) < size:
+            logging.warning(f"Truncated frame at end of stream ({len(payload)}/{size} bytes).")
+            return
+        yield payload
+
+
+def read_events(stream: BinaryIO) -> Iterator[Dict[str, Any]]:
+    """Events from a binary stream written by ``FrameEncoder``.
+
+    The header is checked right away; frames are decoded lazily.
+
+    Raises:
+        ValueError: If the stream does not start with ``MAGIC`` or (while
+            iterating) a frame is malformed
+    """
+    magic = stream.read(len(MAGIC))
+    if magic and magic != MAGIC:
+        raise ValueError(f"Not a binary event stream (header {magic!r})")
+    return _decode_frames(stream)
+
+
+def _decode_frames(stream: BinaryIO) -> Iterator[Dict[str, Any]]:
+    decoder = FrameDecoder()
+    for payload in iter_frames(stream):
+        yield from decoder.decode(payload)
+
+
+def encode_events(events: Iterable[Dict[str, Any]], batch_size: int = 1000) -> bytes:
+    """Whole binary stream for ``events`` (tests and benchmarks)."""
+    encoder = FrameEncoder()
+    events = list(events)
+    out = [encoder.encode(events[i:i + batch_size]) for i in range(0, len(events), batch_size)]
+    return b"".join(out) if out else MAGIC
+
+
+def sniff_wire_format(stream: BinaryIO) -> str:
+    """``binary`` if the stream starts with ``MAGIC``, else ``jsonl`` (nothing is consumed)."""
+    peek = getattr(stream, "peek", None)
+    head = peek(1)[:1] if peek is not None else b""
+    return "binary" if isinstance(head, bytes) and head == MAGIC[:1] else "jsonl"
+
+
+def open_input(stream: TextIO, wire_format: str = "auto") -> Union[TextIO, Iterator[Dict[str, Any]]]:
+    """Input for ``features.stream_processor``: JSON lines or decoded events.
+
+    Args:
+        stream: Text stream (e.g. ``sys.stdin``); binary frames are read from
+            its underlying ``buffer``
+        wire_format: ``jsonl``, ``binary`` or ``auto`` (sniff the first byte)
+    """
+    if wire_format not in WIRE_FORMATS + ("auto",):
+        raise ValueError(f"Unknown wire format: {wire_format} (expected one of {WIRE_FORMATS} or auto)")
+    buffer = getattr(stream, "buffer", None)
+    if wire_format == "auto":
+        wire_format = sniff_wire_format(buffer) if buffer is not None else "jsonl"
+    if wire_format == "binary":
+        if buffer is None:
+            raise ValueError("Binary wire format needs a stream with a byte buffer")
+        return read_events(buffer)
+    return stream
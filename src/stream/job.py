@@ -1,9 +1,15 @@
 # src/stream/job.py
 from __future__ import annotations
 """
-DOVAH streaming launcher with THREE modes:
+DOVAH streaming launcher with FIVE modes:
 
 - python (default): pure-Python replay → features (Day-3/4 golden path). No Flink, no jars.
+- inproc: the same replay → features in one process; events are handed over as
+  dicts (no JSON re-serialization, no pipe) through bounded queues between
+  stage threads (backpressure + queue metrics). Same output and latency files.
+- live: runs continuously from a source connector (file tail, Unix socket,
+  Kafka) to a sink connector (file/stdout, Kafka, the window_features table),
+  committing source offsets as batches are processed (src.stream.connectors).
 - smoke: quick PyFlink connector factory check (Kafka/JDBC/Postgres). Prints clear “MISSING …” if jars are absent.
 - flink: guarded Flink stub that first runs the smoke; if OK, you extend it with real logic later.
 
@@ -17,6 +23,20 @@ Run examples (from repo root):
     --out reports/phase4/metrics/features.jsonl \
     --eps 100 --warmup-sec 10 --run-duration-sec 120
 
+  # Binary frames instead of JSON lines on the pipe
+  python -m src.stream.job --mode python --wire-format binary --input sample_data/hdfs/sample.jsonl
+
+  # Same pipeline without the subprocess pipe
+  python -m src.stream.job --mode inproc --input sample_data/hdfs/sample.jsonl
+
+  # Continuous: follow a growing log file, write features to Kafka
+  python -m src.stream.job --mode live --source tail:/var/log/dovah/parsed.jsonl \
+    --sink kafka://localhost:9092/window_features
+
+  # ... or upsert the features straight into Postgres (window_features)
+  python -m src.stream.job --mode live --source tail:/var/log/dovah/parsed.jsonl \
+    --sink postgresql+psycopg://dovah@localhost/dovah
+
   # Optional: diagnose Flink jars
   python -m src.stream.job --mode smoke
 
@@ -32,11 +52,16 @@ Environment:
 """
 
 import argparse
+import json
 import os
+import queue
 import subprocess
 import sys
+from collections import deque
 from pathlib import Path
-from typing import List
+from typing import Deque, List, Optional, Tuple
+
+_RELEASE_POLL_SEC = 0.1  # how often the sink stage checks asynchronous writes
 
 
 # -----------------------------
@@ -51,11 +76,14 @@ def _run_python_pipeline(
     eps: int,
     warmup_sec: int,
     run_duration_sec: int,
+    validation_mode: str = "full",
+    wire_format: str = "jsonl",
 ) -> int:
     """
     Same composition as your Makefile:
       replay | features > features.jsonl
     Uses the current interpreter and -m so src.* imports always resolve.
+    ``wire_format`` selects the encoding on the pipe (jsonl or binary frames).
     """
     py = sys.executable
     out_fp = Path(out_path)
@@ -67,12 +95,15 @@ def _run_python_pipeline(
         "--eps", str(eps),
         "--warmup-sec", str(warmup_sec),
         "--run-duration-sec", str(run_duration_sec),
+        "--wire-format", wire_format,
     ]
     features_cmd = [
         py, "-m", "src.stream.features",
         "--window-size-sec", str(window_size_sec),
         "--window-stride-sec", str(window_stride_sec),
         "--latency-log-file", latency_log_file,
+        "--validation-mode", validation_mode,
+        "--wire-format", wire_format,
     ]
 
     print("[job] python pipeline:")
@@ -96,6 +127,255 @@ def _run_python_pipeline(
     return 0
 
 
+class _Emitted:
+    """Marker on the sink queue: the batches whose events are all in the records before it."""
+
+    def __init__(self, batches: List):
+        self.batches = batches
+
+
+def _run_stages(
+    source_name: str,
+    produce,
+    sink_write,
+    sink_flush=None,
+    on_processed=None,
+    sink_written=None,
+    sink_close=None,
+    queue_capacity: int = 64,
+    queue_put_timeout: Optional[float] = None,
+    queue_metrics_file: Optional[str] = None,
+    **features_kwargs,
+) -> int:
+    """
+    source → features → sink in this process, one thread per stage, joined by
+    bounded queues (src.stream.queues). ``produce(put)`` runs on the source
+    thread and hands event batches to ``put``; the feature engine consumes
+    them on this thread; ``sink_write`` gets its output on the sink thread
+    (``sink_flush`` whenever the sink has caught up, so it batches under
+    load only; ``sink_close`` at the end of the stream).
+
+    ``on_processed(batch)`` is called, in batch order, once the records of
+    every window holding an event of the batch are durable: the feature
+    engine has emitted them (``stream_processor(on_emitted=...)``) and
+    ``sink_written()`` (records the sink has durably written) has reached
+    them (``sink_written`` is required with ``on_processed``). Events
+    buffered in open windows or in the sink are never covered, so a source
+    committing on it delivers at least once. Returns the exit code.
+    """
+    from src.stream.features import stream_processor
+    from src.stream.queues import BoundedQueue, QueueAborted, QueueWriter, run_stage
+
+    to_features = BoundedQueue(f"{source_name}->features", queue_capacity, queue_put_timeout)
+    to_sink = BoundedQueue("features->sink", queue_capacity, queue_put_timeout)
+
+    def source_stage() -> None:
+        produce(lambda batch: to_features.put(batch, units=len(batch)))
+
+    written_after: Deque[Tuple[int, List]] = deque()  # (records the sink must have written, batches)
+
+    def release() -> None:
+        written = sink_written()
+        while written_after and written_after[0][0] <= written:
+            for batch in written_after.popleft()[1]:
+                on_processed(batch)
+
+    def sink_stage() -> None:
+        records = 0  # records handed to the sink
+        while True:
+            try:
+                # wake up now and then while batches wait for the sink to write asynchronously
+                item = to_sink.get(_RELEASE_POLL_SEC if written_after else None)
+            except queue.Empty:
+                release()
+                continue
+            except StopIteration:
+                break
+            if isinstance(item, _Emitted):
+                written_after.append((records, item.batches))
+            else:
+                sink_write(item)
+                records += item.count("\n")
+            if sink_flush is not None and not len(to_sink):
+                sink_flush()
+            if written_after:
+                release()
+        if sink_close is not None:
+            sink_close()
+        if written_after:
+            release()
+
+    # Batches handed to the feature engine: (input items up to and including the batch, batch)
+    pending: Deque[Tuple[int, List]] = deque()
+    consumed = 0
+
+    def events():
+        nonlocal consumed
+        for batch in to_features:
+            consumed += len(batch)
+            pending.append((consumed, batch))
+            yield from batch
+
+    def emitted(n: int) -> None:
+        # on the feature thread, right after the records covering them were queued
+        done = []
+        while pending and pending[0][0] <= n:
+            done.append(pending.popleft()[1])
+        if done:
+            to_sink.put(_Emitted(done))
+
+    stages = [
+        run_stage(source_name, source_stage, downstream=to_features),
+        run_stage("sink", sink_stage, upstream=to_sink),
+    ]
+    if on_processed is not None:
+        features_kwargs["on_emitted"] = emitted
+    try:
+        stream_processor(events=events(), out=QueueWriter(to_sink), **features_kwargs)
+        to_sink.close()
+    except BaseException as e:
+        for q in (to_features, to_sink):
+            q.abort(e)
+        if not isinstance(e, QueueAborted):
+            raise  # else another stage failed: reported below
+    finally:
+        for stage in stages:
+            stage.join()
+
+    queues = (to_features, to_sink)
+    for q in queues:
+        q.log_stats()
+    if queue_metrics_file:
+        Path(queue_metrics_file).write_text(json.dumps({q.name: q.stats() for q in queues}, indent=2))
+    failed = [stage for stage in stages if stage.error is not None]
+    if failed:
+        print(f"[job] stage {failed[0].name} failed: {failed[0].error!r}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def _run_inproc_pipeline(
+    input_path: str,
+    window_size_sec: int,
+    window_stride_sec: int,
+    latency_log_file: str,
+    out_path: str,
+    eps: int,
+    warmup_sec: int,
+    run_duration_sec: int,
+    validation_mode: str = "full",
+    wire_format: str = "jsonl",
+    queue_capacity: int = 64,
+    queue_put_timeout: Optional[float] = None,
+    queue_metrics_file: Optional[str] = None,
+) -> int:
+    """
+    replay → features → sink in this process, one thread per stage, joined by
+    bounded queues (src.stream.queues): event batches are handed over as
+    dicts (never re-serialized) and a slow stage blocks the one before it
+    once ``queue_capacity`` items are queued (or fails it after
+    ``queue_put_timeout`` seconds). Per-queue depth, wait time and
+    throughput are logged and written to ``queue_metrics_file`` (JSON).
+    Writes the same features.jsonl / latency CSV as the subprocess pipeline.
+    ``wire_format`` is accepted for symmetry and ignored (there is no wire).
+    """
+    from src.stream.replay import iter_replay_batches
+
+    out_fp = Path(out_path)
+    out_fp.parent.mkdir(parents=True, exist_ok=True)
+    print(f"[job] in-process pipeline: {input_path} -> {out_fp}")
+
+    def replay(put) -> None:
+        for batch in iter_replay_batches(
+            input_file=input_path,
+            eps=eps,
+            warmup_sec=warmup_sec,
+            run_duration_sec=run_duration_sec,
+        ):
+            put(batch)
+
+    with out_fp.open("w") as fh:
+        rc = _run_stages(
+            "replay", replay, fh.write,
+            queue_capacity=queue_capacity,
+            queue_put_timeout=queue_put_timeout,
+            queue_metrics_file=queue_metrics_file,
+            window_size_sec=window_size_sec,
+            window_stride_sec=window_stride_sec,
+            latency_log_file=latency_log_file,
+            validation_mode=validation_mode,
+        )
+    if rc == 0:
+        print(f"[job] OK -> {out_fp}")
+    return rc
+
+
+def _run_live_pipeline(
+    source: str,
+    sink: str,
+    window_size_sec: int,
+    window_stride_sec: int,
+    latency_log_file: str,
+    validation_mode: str = "full",
+    source_batch: int = 1000,
+    idle_timeout_sec: Optional[float] = None,
+    queue_capacity: int = 64,
+    queue_put_timeout: Optional[float] = None,
+    queue_metrics_file: Optional[str] = None,
+    **features_kwargs,
+) -> int:
+    """
+    Continuous pipeline over connectors (src.stream.connectors): a live source
+    (tail:, unix:, kafka://, memory://) → features → sink (file, -, kafka://,
+    memory://, or a database URL for window_features), staged like ``inproc``.
+    Source offsets are committed once every window holding an event of a
+    batch has been emitted and written by the sink (at-least-once: a restart
+    replays whatever was only buffered). Runs until the source has been idle
+    for ``idle_timeout_sec`` (never by default) or SIGINT/SIGTERM.
+    """
+    import signal
+    import threading
+
+    from src.stream.connectors import open_sink, open_source
+
+    src = open_source(source, max_batch=source_batch, idle_timeout=idle_timeout_sec)
+    out = open_sink(sink, window_size_sec=window_size_sec, window_stride_sec=window_stride_sec)
+    print(f"[job] live pipeline: {source} -> {sink}")
+
+    def stop(signum, frame) -> None:
+        print(f"[job] signal {signum}: draining and stopping", file=sys.stderr)
+        src.stop()
+
+    if threading.current_thread() is threading.main_thread():
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, stop)
+
+    def consume(put) -> None:
+        for batch in src.batches():
+            put(batch)
+
+    try:
+        rc = _run_stages(
+            "source", consume, out.write, sink_flush=out.flush,
+            on_processed=src.mark_processed,
+            sink_written=lambda: out.written,
+            sink_close=out.close,
+            queue_capacity=queue_capacity,
+            queue_put_timeout=queue_put_timeout,
+            queue_metrics_file=queue_metrics_file,
+            window_size_sec=window_size_sec,
+            window_stride_sec=window_stride_sec,
+            latency_log_file=latency_log_file,
+            validation_mode=validation_mode,
+            **features_kwargs,
+        )
+    finally:
+        src.close()
+        out.close()
+    print(f"[job] {src.records} records in, {out.records} records out in {out.batches} batches")
+    return rc
+
+
 # -----------------------------
 # Flink helpers (optional)
 # -----------------------------
@@ -215,7 +495,7 @@ def _flink_job(jars_dir: str) -> int:
 # -----------------------------
 def main() -> int:
     ap = argparse.ArgumentParser(description="DOVAH stream launcher (safe by default)")
-    ap.add_argument("--mode", choices=("auto", "python", "smoke", "flink"), default="auto")
+    ap.add_argument("--mode", choices=("auto", "python", "inproc", "live", "smoke", "flink"), default="auto")
 
     # Python pipeline args
     ap.add_argument("--input", default="sample_data/hdfs/sample.jsonl")
@@ -226,6 +506,26 @@ def main() -> int:
     ap.add_argument("--eps", type=int, default=100)
     ap.add_argument("--warmup-sec", type=int, default=10)
     ap.add_argument("--run-duration-sec", type=int, default=120)
+    ap.add_argument("--validation-mode", choices=("full", "sampled", "first-n"), default="full",
+                    help="Schema validation mode passed to src.stream.features")
+    ap.add_argument("--wire-format", choices=("jsonl", "binary"), default="jsonl",
+                    help="replay → features encoding in python mode (binary: length-prefixed frames)")
+    ap.add_argument("--queue-capacity", type=int, default=64,
+                    help="inproc/live: items buffered between two stages before the upstream one blocks")
+    ap.add_argument("--queue-put-timeout-sec", type=float, default=None,
+                    help="inproc/live: fail a stage blocked on a full queue this long (default: block)")
+    ap.add_argument("--queue-metrics-file", default=None,
+                    help="inproc/live: write per-queue depth / wait / throughput metrics as JSON")
+
+    # Live pipeline args
+    ap.add_argument("--source", default=None,
+                    help="live: tail:PATH | unix:PATH | kafka://HOST:PORT/TOPIC?group=G | memory://TOPIC")
+    ap.add_argument("--sink", default=None,
+                    help="live: PATH | file:PATH | - | kafka://HOST:PORT/TOPIC | memory://TOPIC | "
+                         "postgresql+psycopg://… (window_features upserts) (default: --out)")
+    ap.add_argument("--source-batch", type=int, default=1000, help="live: max records per source poll")
+    ap.add_argument("--idle-timeout-sec", type=float, default=None,
+                    help="live: stop after the source has been idle this long (default: run until signalled)")
 
     # Flink jars dir
     ap.add_argument("--jars-dir", default="jars")
@@ -235,8 +535,8 @@ def main() -> int:
     if mode == "auto":
         mode = "flink" if os.getenv("DOVAH_USE_FLINK") == "1" else "python"
 
-    if mode == "python":
-        return _run_python_pipeline(
+    if mode in ("python", "inproc"):
+        common = dict(
             input_path=args.input,
             window_size_sec=args.window_size_sec,
             window_stride_sec=args.window_stride_sec,
@@ -245,6 +545,32 @@ def main() -> int:
             eps=args.eps,
             warmup_sec=args.warmup_sec,
             run_duration_sec=args.run_duration_sec,
+            validation_mode=args.validation_mode,
+            wire_format=args.wire_format,
+        )
+        if mode == "python":
+            return _run_python_pipeline(**common)
+        return _run_inproc_pipeline(
+            **common,
+            queue_capacity=args.queue_capacity,
+            queue_put_timeout=args.queue_put_timeout_sec,
+            queue_metrics_file=args.queue_metrics_file,
+        )
+    if mode == "live":
+        if not args.source:
+            ap.error("--mode live needs --source")
+        return _run_live_pipeline(
+            source=args.source,
+            sink=args.sink or args.out,
+            window_size_sec=args.window_size_sec,
+            window_stride_sec=args.window_stride_sec,
+            latency_log_file=args.latency_log_file,
+            validation_mode=args.validation_mode,
+            source_batch=args.source_batch,
+            idle_timeout_sec=args.idle_timeout_sec,
+            queue_capacity=args.queue_capacity,
+            queue_put_timeout=args.queue_put_timeout_sec,
+            queue_metrics_file=args.queue_metrics_file,
         )
     if mode == "smoke":
         return _flink_smoke(args.jars_dir)
@@ -0,0 +1,495 @@
+"""Key-partitioned, multi-process feature computation for ``src.stream.features``.
+
+The router (the calling process) hash-partitions events by ``session_id``
+or ``host`` across N worker processes. A key always goes to the same worker
+(CRC32 of the key, stable across processes and runs). Raw JSON lines are
+routed without decoding them, so the workers do all the parsing,
+validation and windowing.
+
+Each worker keeps one sliding window per key and emits per-key feature
+records with two extra fields: ``partition_key`` (the key value) and
+``partition`` (the worker index). Windows are aligned to the stride grid,
+so every key and worker agrees on window boundaries. A worker closes the
+windows of all its keys when its event time (the latest event timestamp
+it has seen) passes their end. A key whose window runs empty is dropped
+together with its churn and novelty baseline; this bounds memory when
+keys are sessions.
+
+Event time is tracked per worker with a ``windows.Watermark`` over the
+hosts it receives, so each worker tolerates the same out-of-order
+``allowed_lateness_sec`` as the single-process path. Events that arrive
+after their key's window was emitted (or, for a key without open windows,
+after the worker closed windows past them) are sent back to the router,
+which counts them and writes them to ``late_out``.
+
+With ``merge``, workers also return the mergeable aggregates of each
+closed window (event, error, template, component and host counts,
+bounds; keyed by name, as each process interns its own ids). The router
+combines them into the global record for that window (``partition_key``
+null) once every worker that received events has passed the window's end.
+
+Burst detection (``src.stream.burst``) runs per key in the workers and
+per host on the global records.
+
+Records are written in the order they reach the router, so per-key
+records of different workers interleave.
+"""
+import io
+import json
+import logging
+import multiprocessing as mp
+import queue
+import re
+import sys
+import zlib
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set, TextIO, Tuple
+
+from jsonschema import ValidationError
+
+from src.common.interning import TemplateBitset
+from src.common.latency import LatencyHistogram
+from src.common.schema import SchemaValidator
+from src.common.timeparse import EPOCH
+from src.stream.burst import DEFAULT_HORIZONS, BurstMonitor
+from src.stream.events import COMPONENTS, HOSTS, TEMPLATES, by_name
+from src.stream.features import _emit_features, _prepare_event, process_window_state
+from src.stream.windows import Watermark, WindowedStream, counts_entropy
+
+PARTITION_KEYS = ("session_id", "host")
+FINAL = "final"  # window id of the end-of-stream flush
+_POLL_SEC = 1.0  # how often the router checks that its workers are alive
+
+
+def partition_for(key: Any, partitions: int) -> int:
+    """Worker index for a key (stable across processes, unlike ``hash``)."""
+    return zlib.crc32(str(key).encode()) % partitions
+
+
+def _key_extractor(field: str):
+    """Key of a raw JSON line without decoding it (falls back to ``json.loads``)."""
+    pattern = re.compile(r'"%s"\s*:\s*"([^"\\]*)"' % re.escape(field))
+
+    def key_of(item) -> Any:
+        if not isinstance(item, str):
+            return item.get(field) if isinstance(item, dict) else None
+        m = pattern.search(item)
+        if m:
+            return m.group(1)
+        try:
+            event = json.loads(item)
+        except json.JSONDecodeError:
+            return None  # the worker reports it as invalid
+        return event.get(field) if isinstance(event, dict) else None
+
+    return key_of
+
+
+class _Rows:
+    """Collects latency CSV rows in a worker (``csv.DictWriter.writerow`` stand-in)."""
+
+    def __init__(self):
+        self.rows: List[Dict] = []
+
+    def writerow(self, row: Dict) -> None:
+        self.rows.append(row)
+
+
+class _WindowAggregate:
+    """Mergeable aggregates of one window (per worker, then global).
+
+    Templates, components and hosts are counted by name: interned ids are
+    only meaningful in the process that assigned them.
+    """
+
+    __slots__ = ("count", "errors", "templates", "components", "hosts", "start", "end", "replay")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.templates: Counter = Counter()
+        self.components: Counter = Counter()
+        self.hosts: Counter = Counter()
+        self.start: Optional[datetime] = None
+        self.end: Optional[datetime] = None
+        self.replay: Optional[datetime] = None
+
+    def add_state(self, state) -> None:
+        self._add(state.count, state.error_count, by_name(state.template_counts, TEMPLATES),
+                  by_name(state.component_counts, COMPONENTS), by_name(state.host_counts, HOSTS),
+                  state.window_start, state.window_end, state.last_replay_ts)
+
+    def merge(self, other: "_WindowAggregate") -> None:
+        self._add(other.count, other.errors, other.templates, other.components, other.hosts, other.start,
+                  other.end, other.replay)
+
+    def _add(self, count, errors, templates, components, hosts, start, end, replay) -> None:
+        self.count += count
+        self.errors += errors
+        self.templates.update(templates)
+        self.components.update(components)
+        self.hosts.update(hosts)
+        self.start = start if self.start is None else min(self.start, start)
+        self.end = end if self.end is None else max(self.end, end)
+        self.replay = replay if self.replay is None else max(self.replay, replay)
+
+
+def _worker(index: int, inbox, outbox, cfg: Dict) -> None:
+    """Worker process entry point; reports a failure to the router instead of dying silently."""
+    try:
+        _run_worker(index, inbox, outbox, cfg)
+    except Exception as e:
+        logging.exception(f"Worker {index} failed")
+        outbox.put(("error", index, repr(e)))
+
+
+def _run_worker(index: int, inbox, outbox, cfg: Dict) -> None:
+    """Per-key windows over the events routed to worker ``index``."""
+    validator = SchemaValidator(
+        cfg["schema"],
+        mode=cfg["validation_mode"],
+        sample_every=cfg["validation_sample_every"],
+        first_n=cfg["validation_first_n"],
+    )
+    key_field, merge = cfg["partition_key"], cfg["merge"]
+    size = timedelta(seconds=cfg["window_size_sec"])
+    stride = timedelta(seconds=cfg["window_stride_sec"])
+    streams: Dict[Any, WindowedStream] = {}
+    burst = BurstMonitor(cfg["window_stride_sec"], cfg["burst_horizons"], cfg["burst_z_threshold"],
+                         per_host=False)
+    hist = LatencyHistogram()
+    idle = cfg["host_idle_sec"]
+    watermark = Watermark(timedelta(seconds=cfg["allowed_lateness_sec"]),
+                          None if idle is None else timedelta(seconds=idle))
+    next_close: Optional[datetime] = None  # first window end after the watermark
+    closed: Optional[datetime] = None  # end of the last window closed for every key
+
+    def emit(key, ws, out, rows, partials, window_id) -> None:
+        process_window_state(ws.state, burst, rows, hist, out,
+                             extra_fields={"partition_key": key, "partition": index}, burst_key=key)
+        if merge:
+            partials.setdefault(window_id, _WindowAggregate()).add_state(ws.state)
+        ws.state.commit()
+
+    def close_until(ts, out, rows, partials) -> None:
+        for key, ws in list(streams.items()):
+            for window_end in ws.advance(ts):
+                emit(key, ws, out, rows, partials, window_end)
+            if ws.idle:
+                del streams[key]
+                burst.forget(key)
+
+    while True:
+        msg = inbox.get()
+        if msg is None:
+            break
+        out, rows, partials, late = io.StringIO(), _Rows(), {}, []
+        if isinstance(msg, tuple):
+            # end of input: close windows up to the latest event time of all workers
+            close_until(msg[1], out, rows, partials)
+            msg = []
+        for item in msg:
+            try:
+                event = _prepare_event(item, validator)
+            except (json.JSONDecodeError, KeyError, ValueError, ValidationError) as e:
+                logging.warning(f"Skipping invalid event: {str(item).strip()} ({e})")
+                continue
+            key = event.get(key_field)
+            ts = event["_internal"]["original_ts"]
+            watermark.observe(event.get("host"), ts)
+            ws = streams.get(key)
+            # checked against the worker's close too: a key without a stream
+            # (new, or dropped as idle) has missed the windows closed before it
+            if (closed is not None and ts < closed) or (ws is not None and ws.is_late(ts)):
+                late.append(json.dumps({k: v for k, v in event.items() if k != "_internal"}))
+                continue
+            if ws is None:
+                ws = streams[key] = WindowedStream(size, stride, align=True)
+            ws.add(event)
+
+            if next_close is None or watermark.max_ts >= next_close:
+                current = watermark.value
+                if next_close is None or current >= next_close:
+                    close_until(current, out, rows, partials)
+                    # window ends lie on the stride grid shifted by the window size
+                    n = (current - size - EPOCH) // stride + 1
+                    next_close = EPOCH + n * stride + size
+                    closed = next_close - stride
+        outbox.put(("batch", index, out.getvalue(), rows.rows, partials, (watermark.value, watermark.max_ts), late))
+
+    out, rows, partials = io.StringIO(), _Rows(), {}
+    for key, ws in streams.items():
+        if ws.flush():
+            emit(key, ws, out, rows, partials, FINAL)
+    outbox.put(("done", index, out.getvalue(), rows.rows, partials, hist.to_dict(), []))
+
+
+class _GlobalMerger:
+    """Combines per-worker window aggregates into global feature records."""
+
+    def __init__(self, burst: BurstMonitor, latency_log_writer=None, latency_hist=None,
+                 out: Optional[TextIO] = None):
+        self.pending: Dict[Any, _WindowAggregate] = {}
+        self.prev_components: Set[str] = set()
+        self.seen_templates = TemplateBitset()
+        self.burst = burst
+        self.latency_log_writer = latency_log_writer
+        self.latency_hist = latency_hist
+        self.out = out
+        self.late = 0
+        self._emitted_until: Optional[datetime] = None
+
+    def add(self, partials: Dict[Any, _WindowAggregate]) -> None:
+        for window_id, agg in partials.items():
+            if window_id != FINAL and self._emitted_until is not None and window_id <= self._emitted_until:
+                self.late += 1  # a worker's first events fell in an already merged window
+                continue
+            self.pending.setdefault(window_id, _WindowAggregate()).merge(agg)
+
+    def emit_ready(self, watermarks: Dict[int, datetime], active: Iterable[int]) -> None:
+        """Emit the windows every worker in ``active`` has closed."""
+        marks = [watermarks.get(i) for i in active]
+        if not marks or None in marks:
+            return
+        low = min(marks)
+        for window_id in sorted(w for w in self.pending if w != FINAL and w <= low):
+            self._emit(self.pending.pop(window_id))
+            self._emitted_until = window_id
+
+    def finish(self) -> None:
+        for window_id in sorted(w for w in self.pending if w != FINAL):
+            self._emit(self.pending.pop(window_id))
+        if FINAL in self.pending:
+            self._emit(self.pending.pop(FINAL))
+        if self.late:
+            logging.warning(f"Merge: dropped {self.late} late window aggregates.")
+
+    def _emit(self, agg: _WindowAggregate) -> None:
+        templates = TemplateBitset(TEMPLATES.intern_many(agg.templates))
+        _emit_features(
+            window_start=agg.start,
+            window_end=agg.end,
+            last_replay_ts=agg.replay,
+            event_count=agg.count,
+            unique_templates=len(agg.templates),
+            rare_templates=sum(1 for c in agg.templates.values() if c == 1),
+            component_churn=len(agg.components.keys() ^ self.prev_components),
+            is_unseen_template=not templates.issubset(self.seen_templates),
+            burst=self.burst,
+            latency_log_writer=self.latency_log_writer,
+            latency_hist=self.latency_hist,
+            out=self.out,
+            extra_fields={"partition_key": None, "partition": None},
+            host_counts=agg.hosts,
+            unique_components=len(agg.components),
+            error_count=agg.errors,
+            template_entropy=counts_entropy(agg.templates.values()),
+            component_entropy=counts_entropy(agg.components.values()),
+        )
+        self.prev_components = set(agg.components)
+        self.seen_templates |= templates
+
+
+class _Router:
+    """Sends routed events to the worker processes and handles what they send back."""
+
+    def __init__(self, partitions: int, cfg: Dict, max_pending_batches: int,
+                 merger: Optional[_GlobalMerger], latency_log_writer, latency_hist: Optional[LatencyHistogram],
+                 out: TextIO, late_out: Optional[TextIO]):
+        self.partitions = partitions
+        self.merger = merger
+        self.latency_log_writer = latency_log_writer
+        self.latency_hist = latency_hist
+        self.out = out
+        self.late_out = late_out
+        self.late = 0
+        self.inboxes = [mp.Queue(maxsize=max_pending_batches) for _ in range(partitions)]
+        self.outbox: "mp.Queue" = mp.Queue()
+        self.workers = [
+            mp.Process(target=_worker, args=(i, self.inboxes[i], self.outbox, cfg), name=f"features-{i}",
+                       daemon=True)
+            for i in range(partitions)
+        ]
+        for w in self.workers:
+            w.start()
+        self.buffers: List[List] = [[] for _ in range(partitions)]  # events routed, not yet sent
+        self.watermarks: Dict[int, datetime] = {}
+        self.latest_ts: Dict[int, datetime] = {}  # latest event time per worker
+        self.outstanding = [0] * partitions  # batches sent and not yet answered
+        self.done: Set[int] = set()
+
+    def route(self, events: Iterable, key_of, batch_size: int) -> None:
+        for item in events:
+            p = partition_for(key_of(item), self.partitions)
+            buf = self.buffers[p]
+            buf.append(item)
+            if len(buf) >= batch_size:
+                self.send(p, buf)
+                self.buffers[p] = []
+                self.drain()
+        for p, buf in enumerate(self.buffers):
+            if buf:
+                self.send(p, buf)
+
+    def finish(self) -> None:
+        """Close every worker's windows up to the latest event time seen anywhere and stop them."""
+        while any(self.outstanding):
+            self.drain(block=True)
+        if self.latest_ts:
+            latest = max(self.latest_ts.values())
+            for p in self.latest_ts:
+                self.send(p, ("close", latest))
+        for p in range(self.partitions):
+            self.put(p, None)
+        while len(self.done) < self.partitions:
+            self.handle(self.receive())
+
+    def stop(self, terminate: bool) -> None:
+        if terminate:
+            # a worker failed (or the router was interrupted): stop the others
+            for w in self.workers:
+                if w.is_alive():
+                    w.terminate()
+            for inbox in self.inboxes:
+                inbox.cancel_join_thread()  # batches nobody will read
+        for w in self.workers:
+            w.join()
+
+    def handle(self, msg: Tuple) -> None:
+        if msg[0] == "error":
+            raise RuntimeError(f"Partition worker {msg[1]} failed: {msg[2]}")
+        kind, index, text, rows, partials, tail, late_events = msg
+        if text:
+            self.out.write(text)
+            self.out.flush()
+        if late_events:
+            self.late += len(late_events)
+            if self.late_out is not None:
+                self.late_out.write("\n".join(late_events) + "\n")
+        if self.merger is not None:
+            self.merger.add(partials)
+        elif self.latency_log_writer is not None:
+            for row in rows:
+                self.latency_log_writer.writerow(row)
+        if kind == "done":
+            self.done.add(index)
+            if self.merger is None and self.latency_hist is not None:
+                self.latency_hist.merge(LatencyHistogram.from_dict(tail))
+        else:
+            self._advance(index, *tail)
+
+    def _advance(self, index: int, value: Optional[datetime], max_ts: Optional[datetime]) -> None:
+        self.outstanding[index] -= 1
+        if value is not None:
+            self.watermarks[index] = value
+        if max_ts is not None:
+            self.latest_ts[index] = max_ts
+        if self.merger is not None:
+            active = [i for i in range(self.partitions)
+                      if self.outstanding[i] or self.buffers[i] or i in self.watermarks]
+            self.merger.emit_ready(self.watermarks, active)
+
+    def receive(self) -> Tuple:
+        # Poll so that a worker killed without reporting (e.g. by the OOM
+        # killer) fails the job instead of hanging it. A worker that exited
+        # before an empty poll began left no message behind.
+        while True:
+            exited = [i for i, w in enumerate(self.workers) if i not in self.done and w.exitcode is not None]
+            try:
+                return self.outbox.get(timeout=_POLL_SEC)
+            except queue.Empty:
+                if exited:
+                    i = exited[0]
+                    raise RuntimeError(f"Partition worker {i} exited with code {self.workers[i].exitcode}") from None
+
+    def put(self, p: int, msg) -> None:
+        while True:
+            try:
+                self.inboxes[p].put(msg, timeout=_POLL_SEC)
+                return
+            except queue.Full:
+                self.drain()
+                if self.workers[p].exitcode is not None:
+                    self.drain()  # its error report, if it sent one
+                    raise RuntimeError(f"Partition worker {p} exited with code {self.workers[p].exitcode}") from None
+
+    def send(self, p: int, msg) -> None:
+        self.put(p, msg)
+        self.outstanding[p] += 1
+
+    def drain(self, block: bool = False) -> None:
+        while True:
+            try:
+                self.handle(self.receive() if block else self.outbox.get_nowait())
+            except queue.Empty:
+                return
+            block = False
+
+
+def run_partitioned(
+    events: Iterable,
+    partitions: int,
+    partition_key: str,
+    window_size_sec: float,
+    window_stride_sec: float,
+    schema: Dict,
+    validation_mode: str = "full",
+    validation_sample_every: int = 100,
+    validation_first_n: int = 1000,
+    merge: bool = False,
+    burst_horizons: str = DEFAULT_HORIZONS,
+    burst_z_threshold: float = 2.0,
+    latency_log_writer=None,
+    latency_hist: Optional[LatencyHistogram] = None,
+    out: Optional[TextIO] = None,
+    allowed_lateness_sec: float = 0.0,
+    host_idle_sec: Optional[float] = None,
+    late_out: Optional[TextIO] = None,
+    batch_size: int = 512,
+    max_pending_batches: int = 8,
+) -> int:
+    """Route ``events`` (JSON lines or dicts) to ``partitions`` workers and write their records.
+
+    Per-key records go to ``out``. With ``merge``, global records are
+    written too, and only those feed ``latency_log_writer`` /
+    ``latency_hist``; without it, the per-key records do. Late events
+    are written to ``late_out`` (JSON lines) if given.
+
+    Returns:
+        The number of events dropped as late.
+    """
+    if partition_key not in PARTITION_KEYS:
+        raise ValueError(f"Unknown partition key: {partition_key} (expected one of {PARTITION_KEYS})")
+    out = out or sys.stdout
+    cfg = {
+        "schema": schema,
+        "validation_mode": validation_mode,
+        "validation_sample_every": validation_sample_every,
+        "validation_first_n": validation_first_n,
+        "partition_key": partition_key,
+        "window_size_sec": window_size_sec,
+        "window_stride_sec": window_stride_sec,
+        "merge": merge,
+        "burst_horizons": burst_horizons,
+        "burst_z_threshold": burst_z_threshold,
+        "allowed_lateness_sec": allowed_lateness_sec,
+        "host_idle_sec": host_idle_sec,
+    }
+    merger = None
+    if merge:
+        merger = _GlobalMerger(BurstMonitor(window_stride_sec, burst_horizons, burst_z_threshold),
+                               latency_log_writer, latency_hist, out)
+    router = _Router(partitions, cfg, max_pending_batches, merger, latency_log_writer, latency_hist,
+                     out, late_out)
+    logging.info(f"Partitioned features: {partitions} workers keyed by {partition_key} (merge={merge}).")
+    finished = False
+    try:
+        router.route(events, _key_extractor(partition_key), batch_size)
+        router.finish()
+        finished = True
+    finally:
+        router.stop(terminate=not finished)
+    if merger is not None:
+        merger.finish()
+    return router.late
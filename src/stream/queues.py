@@ -0,0 +1,237 @@
+"""Bounded queues with backpressure metrics between stream pipeline stages.
+
+``BoundedQueue`` connects two stages (threads). ``put`` blocks while the
+queue is at capacity, so a slow consumer slows its producer down instead
+of letting memory grow. With a ``put_timeout`` it raises ``queue.Full``
+when the consumer has not made room in time. ``close`` marks the end of
+the stream; iterating a queue yields items until then.
+
+Each queue records:
+
+- depth: sampled at every put (mean and max; a queue that sits at
+  capacity points at a slow consumer);
+- put wait: time producers spent blocked on a full queue;
+- get wait: time the consumer spent waiting on an empty queue (a starved
+  consumer points at a slow producer);
+- throughput: items and units (e.g. events in a batch) per second between
+  the first put and the last get.
+
+``run_stage`` runs a stage function on a thread and records its error, and
+``abort`` makes both ends of a queue fail fast once a stage has died.
+"""
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from src.common.latency import LatencyHistogram
+
+_CLOSED = object()
+_POLL_SEC = 0.1  # blocked calls wake up this often to notice an abort
+
+
+class QueueAborted(RuntimeError):
+    """The other end of a ``BoundedQueue`` failed."""
+
+
+class BoundedQueue:
+    """Bounded FIFO between a producer and a consumer stage, with metrics."""
+
+    def __init__(self, name: str, capacity: int = 64, put_timeout: Optional[float] = None):
+        """Create an empty queue.
+
+        Args:
+            name: Label in metrics and log lines (e.g. ``replay->features``)
+            capacity: Maximum number of queued items
+            put_timeout: Seconds a put may block on a full queue before
+                raising ``queue.Full`` (None: block until there is room)
+        """
+        if capacity < 1:
+            raise ValueError("capacity must be >= 1")
+        self.name = name
+        self.capacity = capacity
+        self.put_timeout = put_timeout
+        self._items: deque = deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._aborted: Optional[BaseException] = None
+        self.put_wait = LatencyHistogram()
+        self.get_wait = LatencyHistogram()
+        self.puts = 0
+        self.gets = 0
+        self.units = 0
+        self.max_depth = 0
+        self._depth_sum = 0
+        self._first_put: Optional[float] = None
+        self._last_get: Optional[float] = None
+
+    def put(self, item: Any, units: int = 1, timeout: Optional[float] = None) -> None:
+        """Append ``item``, blocking while the queue is full.
+
+        Args:
+            item: Payload
+            units: Weight of the item in the throughput metric (e.g. batch size)
+            timeout: Overrides ``put_timeout`` for this call
+
+        Raises:
+            queue.Full: If the queue stayed full for the timeout
+            QueueAborted: If the queue was aborted
+        """
+        timeout = self.put_timeout if timeout is None else timeout
+        with self._not_full:
+            if self._first_put is None:
+                self._first_put = time.perf_counter()
+            if len(self._items) >= self.capacity:
+                t0 = time.perf_counter()
+                deadline = None if timeout is None else t0 + timeout
+                while len(self._items) >= self.capacity and self._aborted is None:
+                    remaining = _POLL_SEC if deadline is None else min(_POLL_SEC, deadline - time.perf_counter())
+                    if remaining <= 0:
+                        self._record_wait(self.put_wait, t0)
+                        raise queue.Full(f"{self.name}: full for {timeout}s")
+                    self._not_full.wait(remaining)
+                self._record_wait(self.put_wait, t0)
+            else:
+                self.put_wait.record(0.0)
+            if self._aborted is not None:
+                raise QueueAborted(f"{self.name}: consumer failed") from self._aborted
+            self._items.append((item, units))
+            if item is not _CLOSED:
+                self.puts += 1
+                depth = len(self._items)
+                self._depth_sum += depth
+                if depth > self.max_depth:
+                    self.max_depth = depth
+            self._not_empty.notify()
+
+    def close(self) -> None:
+        """Mark the end of the stream (waits for room like ``put``)."""
+        self.put(_CLOSED, units=0)
+
+    def get(self, timeout: Optional[float] = None) -> Any:
+        """Remove and return the oldest item, waiting while the queue is empty.
+
+        Args:
+            timeout: Seconds to wait for an item (None: until one arrives)
+
+        Raises:
+            StopIteration: Once the queue is closed and drained
+            queue.Empty: If no item arrived within the timeout
+            QueueAborted: If the queue was aborted
+        """
+        with self._not_empty:
+            t0 = time.perf_counter()
+            if self._items:
+                self.get_wait.record(0.0)
+            else:
+                deadline = None if timeout is None else t0 + timeout
+                while not self._items and self._aborted is None:
+                    remaining = _POLL_SEC if deadline is None else min(_POLL_SEC, deadline - time.perf_counter())
+                    if remaining <= 0:
+                        self._record_wait(self.get_wait, t0)
+                        raise queue.Empty(f"{self.name}: empty for {timeout}s")
+                    self._not_empty.wait(remaining)
+                self._record_wait(self.get_wait, t0)
+            if self._aborted is not None:
+                raise QueueAborted(f"{self.name}: producer failed") from self._aborted
+            item, units = self._items[0]
+            if item is _CLOSED:
+                raise StopIteration  # leave the marker for other consumers
+            self._items.popleft()
+            self.gets += 1
+            self.units += units
+            self._last_get = time.perf_counter()
+            self._not_full.notify()
+            return item
+
+    def _record_wait(self, hist: LatencyHistogram, t0: float) -> None:
+        hist.record((time.perf_counter() - t0) * 1000.0)
+
+    def __iter__(self) -> Iterator[Any]:
+        while True:
+            try:
+                yield self.get()
+            except StopIteration:
+                return
+
+    def abort(self, error: BaseException) -> None:
+        """Fail every blocked or later put/get (a stage at either end died)."""
+        with self._lock:
+            self._aborted = error
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def stats(self) -> Dict[str, float]:
+        """Depth, wait time and throughput summary."""
+        elapsed = 0.0
+        if self._first_put is not None and self._last_get is not None:
+            elapsed = max(self._last_get - self._first_put, 1e-9)
+        return {
+            "capacity": self.capacity,
+            "items": self.gets,
+            "units": self.units,
+            "depth_mean": self._depth_sum / self.puts if self.puts else 0.0,
+            "depth_max": self.max_depth,
+            "put_wait_ms_total": self.put_wait.total,
+            "put_wait_p99_ms": self.put_wait.percentile(99) if self.put_wait.count else 0.0,
+            "get_wait_ms_total": self.get_wait.total,
+            "get_wait_p99_ms": self.get_wait.percentile(99) if self.get_wait.count else 0.0,
+            "items_per_sec": self.gets / elapsed if elapsed else 0.0,
+            "units_per_sec": self.units / elapsed if elapsed else 0.0,
+        }
+
+    def log_stats(self) -> None:
+        s = self.stats()
+        logging.info(
+            "Queue %s: %d items (%d units) at %.0f units/s, depth mean %.1f max %d of %d, "
+            "producer blocked %.0fms (p99 %.1fms), consumer starved %.0fms (p99 %.1fms)",
+            self.name, s["items"], s["units"], s["units_per_sec"], s["depth_mean"], s["depth_max"],
+            self.capacity, s["put_wait_ms_total"], s["put_wait_p99_ms"], s["get_wait_ms_total"],
+            s["get_wait_p99_ms"],
+        )
+
+
+def run_stage(name: str, fn: Callable[[], None], downstream: Optional[BoundedQueue] = None,
+              upstream: Optional[BoundedQueue] = None) -> threading.Thread:
+    """Run ``fn`` on a daemon thread named ``name``.
+
+    If ``fn`` raises, the error is stored on the thread (``thread.error``)
+    and both queues are aborted so the neighbouring stages stop instead of
+    blocking forever. ``downstream`` is closed when ``fn`` returns.
+    """
+    def target() -> None:
+        try:
+            fn()
+            if downstream is not None:
+                downstream.close()
+        except BaseException as e:
+            thread.error = e
+            logging.error(f"Stage {name} failed: {e!r}")
+            for q in (downstream, upstream):
+                if q is not None:
+                    q.abort(e)
+
+    thread = threading.Thread(target=target, name=name, daemon=True)
+    thread.error = None
+    thread.start()
+    return thread
+
+
+class QueueWriter:
+    """File-like ``write`` into a ``BoundedQueue`` (one item per write)."""
+
+    def __init__(self, q: BoundedQueue):
+        self.queue = q
+
+    def write(self, text: str) -> int:
+        self.queue.put(text)
+        return len(text)
+
+    def flush(self) -> None:
+        pass
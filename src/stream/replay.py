@@ -10,11 +10,18 @@ Usage:
 import argparse
 import json
 import logging
+import random
 import sys
+import threading
 import time
-import random
 from datetime import datetime, timezone
-from typing import Optional
+from itertools import islice
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, List, Optional, TextIO, Union
+
+from src.common.latency import LatencyHistogram
+from src.stream.framing import WIRE_FORMATS, FrameEncoder
+from src.stream.queues import BoundedQueue
 
 # Configure logging
 logging.basicConfig(
@@ -40,7 +47,7 @@ def _stream_events(input_file: str, do_loop: bool, do_shuffle: bool):
     while True:
         if do_shuffle:
             for event in events:
-                yield event
+                yield dict(event)  # consumers may mutate (and keep) what they get
         else:
             try:
                 with open(input_file, 'r') as f:
@@ -58,7 +65,105 @@ def _stream_events(input_file: str, do_loop: bool, do_shuffle: bool):
             break
 
 
-def replay_events(
+class TokenBucketPacer:
+    """Paces events at a target rate and releases them in micro-batches.
+
+    Every event gets a due time, ``1/eps`` after the previous one (varied
+    uniformly by ``jitter`` x that interval, as the per-event sleeps did).
+    ``next_batch`` sleeps until an event is due, but never for less than
+    ``tick`` seconds, so high rates coalesce into batches. It then returns
+    the number of events due (the tokens accumulated since the last batch).
+    If the consumer stalls for more than ``max_lag`` seconds, the backlog is
+    dropped instead of being burst out.
+
+    Metrics: achieved vs target EPS, per-batch schedule lag (how late the
+    oldest due event went out) and the RFC 3550 inter-arrival jitter
+    estimate over batches.
+    """
+
+    def __init__(
+        self,
+        eps: float,
+        jitter: float = 0.0,
+        tick: float = 0.001,
+        max_batch: int = 10_000,
+        max_lag: float = 1.0,
+    ):
+        if eps <= 0:
+            raise ValueError("eps must be positive")
+        self.eps = eps
+        self.interval = 1.0 / eps
+        self.jitter_amount = self.interval * jitter
+        self.tick = tick
+        self.max_batch = max_batch
+        self.max_lag = max_lag
+        self.events = 0
+        self.batches = 0
+        self.resets = 0
+        self.lag_hist = LatencyHistogram()
+        self.jitter_ms = 0.0
+        self._due: Optional[float] = None
+        self._start: Optional[float] = None
+        self._last: Optional[float] = None
+        self._prev: Optional[tuple] = None
+
+    def next_batch(self, limit: Optional[int] = None) -> int:
+        """Wait for the next tick and return the number of events due (at most ``limit``)."""
+        now = time.perf_counter()
+        if self._due is None:
+            self._due = self._start = now
+        wait = self._due - now
+        if wait > 0:
+            time.sleep(max(wait, self.tick))
+            now = time.perf_counter()
+        elif now - self._due > self.max_lag:
+            self.resets += 1
+            self._due = now
+
+        cap = self.max_batch if limit is None else min(limit, self.max_batch)
+        scheduled = due = self._due
+        n = 0
+        if self.jitter_amount:
+            low, span, rand = self.interval - self.jitter_amount, 2 * self.jitter_amount, random.random
+            while due <= now and n < cap:
+                n += 1
+                due += low + span * rand()
+        else:
+            n = min(int((now - due) * self.eps + 1e-9) + 1, cap)
+            due += n * self.interval
+        self._due = due
+
+        self.lag_hist.record((now - scheduled) * 1000.0)
+        if self._prev is not None:
+            d = (now - self._prev[0]) - (scheduled - self._prev[1])
+            self.jitter_ms += (abs(d) * 1000.0 - self.jitter_ms) / 16.0
+        self._prev = (now, scheduled)
+        self._last = now
+        self.events += n
+        self.batches += 1
+        return n
+
+    def unused(self, n: int) -> None:
+        """Return ``n`` tokens that were granted but not sent (end of input)."""
+        self.events -= n
+
+    def summary(self) -> Dict[str, float]:
+        """Achieved vs target EPS, batch sizes, schedule lag and jitter."""
+        elapsed = (time.perf_counter() - self._start) if self._start is not None else 0.0
+        return {
+            "target_eps": self.eps,
+            "achieved_eps": self.events / elapsed if elapsed > 0 else 0.0,
+            "events": self.events,
+            "batches": self.batches,
+            "mean_batch": self.events / self.batches if self.batches else 0.0,
+            "lag_p50_ms": self.lag_hist.percentile(50),
+            "lag_p99_ms": self.lag_hist.percentile(99),
+            "jitter_ms": self.jitter_ms,
+            "resets": self.resets,
+        }
+
+
+def iter_replay_batches(
     input_file: str,
     eps: int,
     warmup_sec: int,
@@ -68,14 +173,24 @@ def replay_events(
     do_shuffle: bool = False,
     jitter: float = 0.1,
     warmup_eps_fraction: float = 0.2,
-) -> None:
-    """Replays events from a file at a target EPS.
+    tick_sec: float = 0.001,
+    max_batch: int = 10_000,
+    stats: Optional[Dict] = None,
+) -> Iterator[List[Dict]]:
+    """Yields micro-batches of events from a file paced at a target EPS.
+
+    The consumer's processing time counts towards the schedule, as a
+    blocking pipe write does, so the pacing is the same whether batches are
+    written to stdout (``replay_events``) or consumed in-process.
 
     Args:
         input_file: Path to the JSONL file with parsed logs.
         eps: Target events per second.
         warmup_sec: Duration of the warm-up period in seconds.
         run_duration_sec: Total duration of the steady-state run in seconds.
+        tick_sec: Minimum pacer sleep; events due within a tick share a batch.
+        max_batch: Upper bound on events per batch.
+        stats: If given, updated with the steady-state pacer summary at the end.
     """
     if eps <= 0:
         logging.error("EPS must be a positive number.")
@@ -90,24 +205,13 @@ def replay_events(
     warmup_deadline = time.time() + warmup_sec
     warmup_events_sent = 0
     if warmup_eps > 0:
-        warmup_sleep_interval = 1.0 / warmup_eps
-        for event in event_stream:
-            if time.time() >= warmup_deadline:
+        pacer = TokenBucketPacer(warmup_eps, tick=tick_sec, max_batch=max_batch)
+        while time.time() < warmup_deadline:
+            batch = list(islice(event_stream, pacer.next_batch()))
+            if not batch:
                 break
-            loop_start_time = time.time()
-
-            # Write event to stdout
-            try:
-                sys.stdout.write(json.dumps(event) + '\n')
-                sys.stdout.flush()
-                warmup_events_sent += 1
-            except BrokenPipeError:
-                logging.warning("Broken pipe during warm-up. Shutting down.")
-                return
-
-            # Sleep to maintain the target EPS rate
-            elapsed = time.time() - loop_start_time
-            time.sleep(max(0, warmup_sleep_interval - elapsed))
+            yield batch
+            warmup_events_sent += len(batch)
     else:
         time.sleep(warmup_sec) # If warmup EPS is 0, just wait
 
@@ -123,11 +227,9 @@ def replay_events(
     start_run_time = time.time()
     deadline = start_run_time + run_duration_sec
     total_events_sent = 0
-    base_sleep_interval = 1.0 / eps
-    # Jitter is a fraction of the base sleep interval
-    jitter_amount = base_sleep_interval * jitter
+    pacer = TokenBucketPacer(eps, jitter=jitter, tick=tick_sec, max_batch=max_batch)
 
-    for event in event_stream:
+    while True:
         if num_events is not None and total_events_sent >= num_events:
             logging.info(f"Sent specified {num_events} events. Stopping.")
             break
@@ -136,34 +238,134 @@ def replay_events(
             logging.info(f"Run duration of {run_duration_sec}s reached. Stopping.")
             break
 
-        loop_start_time = time.time()
-
-        # Preserve original timestamp and add a replay timestamp
-        event.setdefault('orig_ts', event.get('timestamp'))
-        now = datetime.now(timezone.utc)
-        event['replay_ts'] = now.isoformat()
-        event['timestamp'] = now.isoformat()  # Update timestamp for monotonic stream
-
-        # Write event to stdout
-        try:
-            sys.stdout.write(json.dumps(event) + '\n')
-            sys.stdout.flush()
-            total_events_sent += 1
-        except BrokenPipeError:
-            logging.warning("Broken pipe. Consumer has likely exited. Shutting down.")
+        n = pacer.next_batch(None if num_events is None else num_events - total_events_sent)
+        batch = list(islice(event_stream, n))
+        if len(batch) < n:
+            pacer.unused(n - len(batch))
+        if not batch:
             break
 
-        # Sleep to maintain the target EPS rate
-        loop_end_time = time.time()
-        elapsed = loop_end_time - loop_start_time
-        sleep_interval = random.uniform(
-            base_sleep_interval - jitter_amount,
-            base_sleep_interval + jitter_amount
-        )
-        time.sleep(max(0, sleep_interval - elapsed))
+        # Preserve original timestamp; stamp the batch with its emission time
+        now = datetime.now(timezone.utc).isoformat()
+        for event in batch:
+            event.setdefault('orig_ts', event.get('timestamp'))
+            event['replay_ts'] = now
+            event['timestamp'] = now  # Update timestamp for monotonic stream
+
+        yield batch
+        total_events_sent += len(batch)
 
     total_run_duration = time.time() - start_run_time
+    summary = pacer.summary()
+    if stats is not None:
+        stats.update(summary)
     logging.info(f"Replay finished. Sent {total_events_sent} events in {total_run_duration:.2f} seconds.")
+    logging.info(
+        "Pacer: target %.0f EPS, achieved %.0f EPS, %d batches (mean %.1f events), "
+        "lag p50=%.2fms p99=%.2fms, jitter=%.3fms",
+        summary["target_eps"], summary["achieved_eps"], summary["batches"], summary["mean_batch"],
+        summary["lag_p50_ms"], summary["lag_p99_ms"], summary["jitter_ms"],
+    )
+
+
+def iter_replay(input_file: str, eps: int, warmup_sec: int, run_duration_sec: int, **kwargs) -> Iterator[Dict]:
+    """Yields paced events one at a time (see ``iter_replay_batches``)."""
+    for batch in iter_replay_batches(input_file, eps, warmup_sec, run_duration_sec, **kwargs):
+        yield from batch
+
+
+class _ThreadedWriter:
+    """Writes payloads to a stream from a dedicated thread (bounded queue).
+
+    A consumer that reads the pipe slowly fills the queue and then blocks
+    ``write``; the queue metrics show how long.
+    """
+
+    def __init__(self, stream: Union[TextIO, BinaryIO], max_pending: int = 64,
+                 put_timeout: Optional[float] = None):
+        self.stream = stream
+        self.error: Optional[BaseException] = None
+        self.queue = BoundedQueue("replay->stdout", capacity=max_pending, put_timeout=put_timeout)
+        self._thread = threading.Thread(target=self._run, name="replay-writer", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        for payload in self.queue:
+            if self.error is not None:
+                continue  # drain after a failure
+            try:
+                self.stream.write(payload)
+                self.stream.flush()
+            except BaseException as e:
+                self.error = e
+
+    def write(self, payload: Union[str, bytes], units: int = 1) -> None:
+        if self.error is not None:
+            raise self.error
+        self.queue.put(payload, units=units)
+
+    def close(self) -> None:
+        self.queue.close()
+        self._thread.join()
+        self.queue.log_stats()
+        if self.error is not None:
+            raise self.error
+
+
+def replay_events(
+    input_file: str,
+    eps: int,
+    warmup_sec: int,
+    run_duration_sec: int,
+    writer_thread: bool = False,
+    wire_format: str = "jsonl",
+    queue_capacity: int = 64,
+    queue_put_timeout: Optional[float] = None,
+    **kwargs,
+) -> Dict:
+    """Replays events from a file at a target EPS on stdout.
+
+    Events are written as JSON lines, or with ``wire_format="binary"`` as
+    length-prefixed columnar frames (see ``src.stream.framing``). Each
+    micro-batch is serialized into one payload and written with a single
+    write/flush, from a dedicated writer thread if ``writer_thread``; the
+    thread is fed through a ``BoundedQueue`` of ``queue_capacity`` batches
+    (``queue_put_timeout``: see ``src.stream.queues``). Accepts the same
+    arguments as ``iter_replay_batches``.
+
+    Returns:
+        The steady-state pacer summary (target/achieved EPS, lag, jitter),
+        with the writer queue metrics under ``queue`` if ``writer_thread``
+    """
+    if wire_format not in WIRE_FORMATS:
+        raise ValueError(f"Unknown wire format: {wire_format} (expected one of {WIRE_FORMATS})")
+    if wire_format == "binary":
+        stream, encode_batch = sys.stdout.buffer, FrameEncoder().encode
+    else:
+        encode = json.JSONEncoder().encode
+        stream = sys.stdout
+
+        def encode_batch(batch: List[Dict]) -> str:
+            return "\n".join([encode(event) for event in batch]) + "\n"
+
+    stats: Dict = {}
+    writer = _ThreadedWriter(stream, queue_capacity, queue_put_timeout) if writer_thread else None
+    batches = iter_replay_batches(input_file, eps, warmup_sec, run_duration_sec, stats=stats, **kwargs)
+    try:
+        for batch in batches:
+            payload = encode_batch(batch)
+            if writer is not None:
+                writer.write(payload, units=len(batch))
+            else:
+                stream.write(payload)
+                stream.flush()
+        if writer is not None:
+            writer.close()
+            stats["queue"] = writer.queue.stats()
+    except BrokenPipeError:
+        logging.warning("Broken pipe. Consumer has likely exited. Shutting down.")
+        batches.close()
+    return stats
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Replay parsed logs to simulate a stream.")
@@ -219,9 +421,50 @@ if __name__ == "__main__":
         default=0.2,
         help="Fraction of target EPS to emit during warm-up."
     )
+    parser.add_argument(
+        "--tick-ms",
+        type=float,
+        default=1.0,
+        help="Minimum pacer sleep; events due within one tick are written as one batch."
+    )
+    parser.add_argument(
+        "--max-batch",
+        type=int,
+        default=10_000,
+        help="Maximum events per micro-batch."
+    )
+    parser.add_argument(
+        "--writer-thread",
+        action="store_true",
+        help="Serialize/pace in the main thread and write batches from a dedicated thread."
+    )
+    parser.add_argument(
+        "--queue-capacity",
+        type=int,
+        default=64,
+        help="With --writer-thread, batches queued for the writer before the pacer blocks."
+    )
+    parser.add_argument(
+        "--queue-put-timeout-sec",
+        type=float,
+        default=None,
+        help="With --writer-thread, fail if the writer queue stays full this long (default: block)."
+    )
+    parser.add_argument(
+        "--wire-format",
+        choices=WIRE_FORMATS,
+        default="jsonl",
+        help="JSON lines, or length-prefixed binary frames (dictionary-encoded fields, epoch-ns timestamps)."
+    )
+    parser.add_argument(
+        "--metrics-file",
+        type=str,
+        default=None,
+        help="Write the pacer summary (achieved vs target EPS, lag, jitter) as JSON."
+    )
     args = parser.parse_args()
 
-    replay_events(
+    stats = replay_events(
         input_file=args.input_file,
         eps=args.eps,
         warmup_sec=args.warmup_sec,
@@ -231,4 +474,12 @@ if __name__ == "__main__":
         do_shuffle=args.shuffle,
         jitter=args.jitter,
         warmup_eps_fraction=args.warmup_eps_fraction,
+        tick_sec=args.tick_ms / 1000.0,
+        max_batch=args.max_batch,
+        writer_thread=args.writer_thread,
+        wire_format=args.wire_format,
+        queue_capacity=args.queue_capacity,
+        queue_put_timeout=args.queue_put_timeout_sec,
     )
+    if args.metrics_file and stats:
+        Path(args.metrics_file).write_text(json.dumps(stats, indent=2))
@@ -0,0 +1,528 @@
+"""Incremental sliding-window state for ``src.stream.features``.
+
+``SlidingWindowState`` keeps the aggregates behind a window's feature
+record up to date as events enter (``push``) and leave (``pop``, FIFO), so
+a slide costs O(1) per event entering or leaving instead of re-scanning
+the whole window:
+
+- template counts, distinct and singleton ("rare") template tallies;
+- component reference counts and the symmetric difference against the
+  previously emitted window (component churn);
+- Shannon entropy (bits) of the template and component distributions,
+  from a running sum of c·log2(c) over the counts: when one count moves
+  from c to c±1 the sum changes by a single term, so the entropy
+  H = log2(N) - Σ c·log2(c) / N is O(1) to maintain;
+- error-level events (for the error ratio) and events per host (for
+  per-host burst detection);
+- templates not seen in any previously emitted window;
+- window bounds and the latest replay timestamp via monotonic deques.
+
+Templates are keyed by their interned int (``src.common.interning``), and
+the templates seen in emitted windows are a ``TemplateBitset``.
+
+``commit()`` marks the current window as emitted (it becomes the baseline
+for churn and novelty of the next one).
+
+``WindowedStream`` drives one ``SlidingWindowState`` over an event stream:
+it buffers arriving events in event-time order, admits them as the window
+slides and evicts those that fall out of it. ``Watermark`` tells it how
+far event time has progressed when events arrive out of order.
+"""
+from __future__ import annotations
+
+import heapq
+import math
+from array import array
+from datetime import datetime, timedelta
+from typing import Dict, Hashable, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+from src.common.interning import TemplateBitset
+from src.common.timeparse import EPOCH, from_epoch_ns, to_epoch_ns
+from src.stream.events import COMPONENTS, NO_KEY, TEMPLATES, EventBuffer, StreamEvent
+
+_COMPACT_MIN = 4096  # popped items kept before the prefix is cut off
+
+
+def _xlogx(c: int) -> float:
+    return c * math.log2(c) if c > 1 else 0.0
+
+
+# _XLOGX_STEP[c] = _xlogx(c + 1) - _xlogx(c): a count moving between c and c + 1
+_STEP_CACHE = 4096
+_XLOGX_STEP = [_xlogx(c + 1) - _xlogx(c) for c in range(_STEP_CACHE)]
+
+
+def _xlogx_step(c: int) -> float:
+    return _XLOGX_STEP[c] if c < _STEP_CACHE else _xlogx(c + 1) - _xlogx(c)
+
+
+def entropy_bits(total: int, sum_xlogx: float) -> float:
+    """Shannon entropy (bits) of counts summing to ``total`` with Σ c·log2(c) = ``sum_xlogx``."""
+    if total <= 1:
+        return 0.0
+    return max(math.log2(total) - sum_xlogx / total, 0.0)  # clamp float noise of a single-value window
+
+
+def counts_entropy(counts: Iterable[int]) -> float:
+    """Shannon entropy (bits) of a count distribution (batch version of ``entropy_bits``)."""
+    counts = list(counts)
+    return entropy_bits(sum(counts), sum(_xlogx(c) for c in counts))
+
+
+def _to_datetime(ns: Optional[int]) -> Optional[datetime]:
+    return None if ns is None else from_epoch_ns(ns)
+
+
+class _MonotonicDeque:
+    """Sliding min (or max) over a FIFO sequence of ``(seq, value)`` int items.
+
+    Items live in two typed arrays behind a head index, like
+    ``EventBuffer``: in-order timestamps keep every item in a min deque.
+    """
+
+    __slots__ = ("_seqs", "_values", "_head", "_sign")
+
+    def __init__(self, maximum: bool = False):
+        self._seqs = array("q")
+        self._values = array("q")  # sign * value, kept non-decreasing
+        self._head = 0
+        self._sign = -1 if maximum else 1
+
+    def push(self, seq: int, value: int) -> None:
+        v = self._sign * value
+        seqs, values = self._seqs, self._values
+        while len(values) > self._head and v <= values[-1]:
+            values.pop()
+            seqs.pop()
+        seqs.append(seq)
+        values.append(v)
+
+    def pop(self, seq: int) -> None:
+        head = self._head
+        if head < len(self._seqs) and self._seqs[head] == seq:
+            head += 1
+            if head == len(self._seqs) or (head >= _COMPACT_MIN and 2 * head >= len(self._seqs)):
+                del self._seqs[:head]
+                del self._values[:head]
+                head = 0
+            self._head = head
+
+    @property
+    def value(self) -> Optional[int]:
+        return self._sign * self._values[self._head] if self._head < len(self._values) else None
+
+
+class SlidingWindowState:
+    """Running aggregates of the events currently in a sliding window."""
+
+    def __init__(self, seen_templates: Optional[TemplateBitset] = None):
+        """Create an empty window.
+
+        Args:
+            seen_templates: Interned templates already seen in earlier
+                windows (updated in place by ``commit``)
+        """
+        self.count = 0
+        self.template_counts: Dict[int, int] = {}  # by interned template
+        self.rare_templates = 0
+        self.component_counts: Dict[int, int] = {}  # by interned component
+        self.component_events = 0  # events with a component (the component distribution's total)
+        self.error_count = 0
+        self.host_counts: Dict[int, int] = {}  # by interned host
+        self._template_xlogx = 0.0  # Σ c·log2(c) over template_counts
+        self._component_xlogx = 0.0
+        self.seen_templates = seen_templates if seen_templates is not None else TemplateBitset()
+        self.prev_components: Set[int] = set()
+        self._component_diff: Set[int] = set()
+        self._unseen: Set[int] = set()
+        self._min_ts = _MonotonicDeque()
+        self._max_ts = _MonotonicDeque(maximum=True)
+        self._max_replay = _MonotonicDeque(maximum=True)
+        self._head = 0  # seq of the oldest event in the window
+        self._tail = 0  # seq of the next event pushed
+
+    # --- event entry / exit ---
+    def push(self, ev: StreamEvent) -> None:
+        """Add the newest event to the window."""
+        seq = self._tail
+        self._tail += 1
+        self.count += 1
+        self._min_ts.push(seq, ev.ts_ns)
+        self._max_ts.push(seq, ev.ts_ns)
+        self._max_replay.push(seq, ev.replay_ns)
+
+        if ev.error:
+            self.error_count += 1
+        host = ev.host
+        self.host_counts[host] = self.host_counts.get(host, 0) + 1
+
+        tid = ev.template
+        c = self.template_counts.get(tid, 0)
+        self.template_counts[tid] = c + 1
+        self._template_xlogx += _xlogx_step(c)
+        if c == 0:
+            self.rare_templates += 1
+            if tid not in self.seen_templates:
+                self._unseen.add(tid)
+        elif c == 1:
+            self.rare_templates -= 1
+
+        comp = ev.component
+        if comp != NO_KEY:
+            n = self.component_counts.get(comp, 0)
+            self.component_counts[comp] = n + 1
+            self.component_events += 1
+            self._component_xlogx += _xlogx_step(n)
+            if n == 0:
+                self._toggle_component(comp)
+
+    def pop(self, ev: StreamEvent) -> None:
+        """Remove the oldest event (the one pushed ``count`` pushes ago)."""
+        seq = self._head
+        self._head += 1
+        self.count -= 1
+        self._min_ts.pop(seq)
+        self._max_ts.pop(seq)
+        self._max_replay.pop(seq)
+
+        if ev.error:
+            self.error_count -= 1
+        host = ev.host
+        h = self.host_counts[host]
+        if h == 1:
+            del self.host_counts[host]
+        else:
+            self.host_counts[host] = h - 1
+
+        tid = ev.template
+        c = self.template_counts[tid]
+        self._template_xlogx -= _xlogx_step(c - 1)
+        if c == 1:
+            del self.template_counts[tid]
+            self.rare_templates -= 1
+            self._unseen.discard(tid)
+        else:
+            self.template_counts[tid] = c - 1
+            if c == 2:
+                self.rare_templates += 1
+
+        comp = ev.component
+        if comp != NO_KEY:
+            n = self.component_counts[comp]
+            self.component_events -= 1
+            self._component_xlogx -= _xlogx_step(n - 1)
+            if n == 1:
+                del self.component_counts[comp]
+                self._toggle_component(comp)
+            else:
+                self.component_counts[comp] = n - 1
+        if not self.count:
+            # empty window: drop the rounding error the running sums accumulated
+            self._template_xlogx = self._component_xlogx = 0.0
+
+    def _toggle_component(self, comp: int) -> None:
+        # comp entered or left the window: flip its membership in cur ^ prev
+        if comp in self._component_diff:
+            self._component_diff.remove(comp)
+        else:
+            self._component_diff.add(comp)
+
+    # --- features ---
+    @property
+    def window_start(self) -> Optional[datetime]:
+        return _to_datetime(self._min_ts.value)
+
+    @property
+    def window_end(self) -> Optional[datetime]:
+        return _to_datetime(self._max_ts.value)
+
+    @property
+    def last_replay_ts(self) -> Optional[datetime]:
+        return _to_datetime(self._max_replay.value)
+
+    @property
+    def unique_templates(self) -> int:
+        return len(self.template_counts)
+
+    @property
+    def unique_components(self) -> int:
+        return len(self.component_counts)
+
+    @property
+    def template_entropy(self) -> float:
+        return entropy_bits(self.count, self._template_xlogx)
+
+    @property
+    def component_entropy(self) -> float:
+        return entropy_bits(self.component_events, self._component_xlogx)
+
+    @property
+    def component_churn(self) -> int:
+        """Components that appeared or disappeared since the last emitted window."""
+        return len(self._component_diff)
+
+    @property
+    def has_unseen_template(self) -> bool:
+        return bool(self._unseen)
+
+    def commit(self) -> None:
+        """Make the current window the baseline for churn and template novelty."""
+        for comp in self._component_diff:
+            if comp in self.prev_components:
+                self.prev_components.remove(comp)
+            else:
+                self.prev_components.add(comp)
+        self._component_diff.clear()
+        self.seen_templates.update(self._unseen)
+        self._unseen.clear()
+
+
+class WindowedStream:
+    """Event-time sliding windows over an event stream in any arrival order.
+
+    Events carry ``_internal["original_ts"]``. ``add`` reduces an event to
+    a ``StreamEvent`` (``src.stream.events``) and buffers it in a heap
+    ordered by event time (O(log n) per event, no re-sort per window).
+    Admitted events are kept column-wise in an ``EventBuffer``.
+    ``advance(ts)`` slides the window over every window that ends
+    at or before ``ts`` (the watermark) and yields the end of each
+    non-empty one with ``state`` holding its events. The caller emits the
+    window and calls ``state.commit()`` before resuming the generator.
+    Strides with no events are skipped in one jump.
+
+    An event older than ``closed_until`` belongs to a window that has
+    already been emitted or skipped; callers check ``is_late`` and divert
+    such events instead of adding them.
+    """
+
+    def __init__(
+        self,
+        window_size: timedelta,
+        stride: timedelta,
+        align: bool = False,
+        seen_templates: Optional[TemplateBitset] = None,
+    ):
+        """Create an empty stream.
+
+        Args:
+            window_size: Window length
+            stride: Slide between consecutive windows
+            align: Put windows on the epoch grid of ``stride``, starting
+                with the earliest one that contains the first event, instead
+                of starting at the first event (so independent streams share
+                windows)
+            seen_templates: Passed to ``SlidingWindowState``
+        """
+        self.window_size = window_size
+        self.stride = stride
+        self.align = align
+        self.state = SlidingWindowState(seen_templates)
+        self.in_window = EventBuffer()
+        self.pending: List[Tuple[int, int, StreamEvent]] = []  # heap of (event ts ns, arrival seq, event)
+        self.next_start: Optional[datetime] = None
+        self.closed_until: Optional[datetime] = None  # end of the last window emitted or skipped
+        self._seq = 0
+        self._size_ns = window_size // timedelta(microseconds=1) * 1_000
+        self._stride_ns = stride // timedelta(microseconds=1) * 1_000
+
+    def add(self, event: Union[Dict, StreamEvent]) -> None:
+        """Buffer a prepared event (or its ``StreamEvent``)."""
+        ev = event if isinstance(event, StreamEvent) else StreamEvent.from_event(event)
+        heapq.heappush(self.pending, (ev.ts_ns, self._seq, ev))
+        self._seq += 1
+
+    def is_late(self, ts: datetime) -> bool:
+        """True if an event at ``ts`` would miss a window already emitted or skipped."""
+        return self.closed_until is not None and (ts < self.closed_until or ts < self.next_start)
+
+    def _start_at(self, ts: datetime) -> None:
+        if self.align:
+            # earliest grid window that contains the event
+            n = (ts - EPOCH - self.window_size) // self.stride + 1
+            self.next_start = EPOCH + n * self.stride
+        else:
+            self.next_start = ts
+
+    @property
+    def next_end(self) -> Optional[datetime]:
+        """End of the next window to close (None before the first window is placed)."""
+        return None if self.next_start is None else self.next_start + self.window_size
+
+    def advance(self, ts: datetime) -> Iterator[datetime]:
+        """Close every window ending at or before ``ts`` (see class docstring)."""
+        state, in_window, pending = self.state, self.in_window, self.pending
+        if self.next_start is None:
+            if not pending:
+                return
+            self._start_at(from_epoch_ns(pending[0][0]))  # earliest buffered event, not the first to arrive
+        if ts < self.next_start + self.window_size:
+            return
+        start_ns = to_epoch_ns(self.next_start)
+        while ts >= self.next_start + self.window_size:
+            window_end = self.next_start + self.window_size
+            end_ns = start_ns + self._size_ns
+
+            # admit buffered events < window_end, oldest first
+            while pending and pending[0][0] < end_ns:
+                admitted = heapq.heappop(pending)[2]
+                in_window.append(admitted)
+                state.push(admitted)
+
+            if state.count:
+                yield window_end
+                steps = 1
+            elif not pending:
+                return  # nothing buffered: resume when the next event arrives
+            else:
+                # Empty until the window reaches the oldest buffered event:
+                # jump over those strides at once (they would emit nothing)
+                gap_ns = pending[0][0] - end_ns
+                steps = min(gap_ns // self._stride_ns + 1, (ts - window_end) // self.stride + 1)
+
+            # slide window
+            self.next_start += self.stride * steps
+            self.closed_until = window_end + self.stride * (steps - 1)
+
+            # prune buffer (events older than new window start)
+            start_ns += self._stride_ns * steps
+            while in_window and in_window.first_ts_ns < start_ns:
+                state.pop(in_window.popleft())
+            if not in_window:
+                while pending and pending[0][0] < start_ns:
+                    heapq.heappop(pending)
+
+    def flush(self) -> bool:
+        """Admit everything still buffered as a final window; True if it has events."""
+        if not (self.in_window or self.pending):
+            return False
+        while self.pending:
+            admitted = heapq.heappop(self.pending)[2]
+            self.in_window.append(admitted)
+            self.state.push(admitted)
+        return bool(self.state.count)
+
+    @property
+    def idle(self) -> bool:
+        """No events in the window or buffered."""
+        return not (self.in_window or self.pending)
+
+    def to_dict(self) -> Dict:
+        """Buffered events and window position (aggregates are rebuilt on restore).
+
+        Templates and components are stored by name: interned ids are per process.
+        """
+        return {
+            "window_size": self.window_size,
+            "stride": self.stride,
+            "align": self.align,
+            "next_start": self.next_start,
+            "closed_until": self.closed_until,
+            "seq": self._seq,
+            "in_window": [ev.to_tuple() for ev in self.in_window],
+            "pending": [(ts_ns, seq, ev.to_tuple()) for ts_ns, seq, ev in self.pending],
+            "seen_templates": [TEMPLATES.names[i] for i in self.state.seen_templates],
+            "prev_components": [COMPONENTS.names[i] for i in self.state.prev_components],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "WindowedStream":
+        ws = cls(data["window_size"], data["stride"], align=data["align"],
+                 seen_templates=TemplateBitset(TEMPLATES.intern_many(data["seen_templates"])))
+        ws.next_start = data["next_start"]
+        ws.closed_until = data["closed_until"]
+        ws._seq = data["seq"]
+        ws.pending = [(ts_ns, seq, StreamEvent.from_tuple(ev)) for ts_ns, seq, ev in data["pending"]]
+        heapq.heapify(ws.pending)
+        state = ws.state
+        state.prev_components = set(COMPONENTS.intern_many(data["prev_components"]))
+        state._component_diff = set(state.prev_components)  # empty window vs the baseline
+        for ev in map(StreamEvent.from_tuple, data["in_window"]):
+            ws.in_window.append(ev)
+            state.push(ev)
+        return ws
+
+
+class Watermark:
+    """Event-time watermark derived from per-host maximum timestamps.
+
+    Each host may deliver its events up to ``allowed_lateness`` out of
+    order, so its own watermark is its latest timestamp minus the allowed
+    lateness. The stream watermark is the minimum over hosts, which lets a
+    host whose clock or delivery trails the others hold windows open
+    instead of having its events dropped. A host more than ``idle_timeout``
+    behind the leading host (in event time) stops holding the watermark
+    back until it catches up, so a silent or badly skewed host cannot
+    stall emission. The watermark never moves backwards.
+
+    The minimum is kept in a heap with lazy deletion of stale entries, so
+    ``observe`` is O(log hosts) amortized rather than a scan of all hosts.
+    """
+
+    def __init__(self, allowed_lateness: timedelta = timedelta(0), idle_timeout: Optional[timedelta] = None):
+        """Create a watermark with no hosts observed.
+
+        Args:
+            allowed_lateness: Out-of-orderness tolerated within a host
+            idle_timeout: How far behind the leading host a host may fall
+                and still hold the watermark back (default: ``allowed_lateness``,
+                so with no lateness the watermark is the latest timestamp seen)
+        """
+        self.allowed_lateness = allowed_lateness
+        self.idle_timeout = allowed_lateness if idle_timeout is None else idle_timeout
+        self.host_max: Dict[Hashable, datetime] = {}
+        self.max_ts: Optional[datetime] = None
+        self._heap: List[Tuple[datetime, int, Hashable]] = []  # (host max, tie-break, host), may be stale
+        self._seq = 0
+        self._value: Optional[datetime] = None
+        self._stale = False
+
+    def observe(self, host: Hashable, ts: datetime) -> None:
+        """Account for an event of ``host`` at event time ``ts``."""
+        current = self.host_max.get(host)
+        if current is not None and ts <= current:
+            return
+        self.host_max[host] = ts
+        if self.max_ts is None or ts > self.max_ts:
+            self.max_ts = ts
+        heapq.heappush(self._heap, (ts, self._seq, host))
+        self._seq += 1
+        if len(self._heap) > 4 * len(self.host_max) + 64:
+            # drop superseded entries piled up behind a trailing host
+            self._heap = [(t, i, h) for i, (h, t) in enumerate(self.host_max.items())]
+            heapq.heapify(self._heap)
+        self._stale = True
+
+    @property
+    def value(self) -> Optional[datetime]:
+        """Current watermark (None before the first event)."""
+        if self._stale:
+            self._stale = False
+            heap, cutoff = self._heap, self.max_ts - self.idle_timeout
+            # pop entries superseded by a later timestamp of their host, or of idle hosts
+            while heap and (heap[0][0] != self.host_max[heap[0][2]] or heap[0][0] < cutoff):
+                heapq.heappop(heap)
+            low = (heap[0][0] if heap else self.max_ts) - self.allowed_lateness
+            if self._value is None or low > self._value:
+                self._value = low
+        return self._value
+
+    def to_dict(self) -> Dict:
+        return {
+            "allowed_lateness": self.allowed_lateness,
+            "idle_timeout": self.idle_timeout,
+            "host_max": self.host_max,
+            "value": self.value,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Watermark":
+        wm = cls(data["allowed_lateness"], data["idle_timeout"])
+        for host, ts in data["host_max"].items():
+            wm.observe(host, ts)
+        wm._value = data["value"]
+        return wm
+
+    @property
+    def lag(self) -> timedelta:
+        """How far the watermark trails the latest event time seen."""
+        return timedelta(0) if self.max_ts is None else self.max_ts - self.value
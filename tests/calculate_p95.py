@@ -1,41 +1,25 @@
 # tests/calculate_p95.py
 from __future__ import annotations
-import argparse, json, sys, csv, math
+import argparse, json, sys, math
 from pathlib import Path
 
-def percentile(values, p):
-    if not values:
-        return float("nan")
-    values = sorted(values)
-    k = (len(values)-1) * (p/100.0)
-    f = math.floor(k); c = math.ceil(k)
-    if f == c: 
-        return float(values[int(k)])
-    d0 = values[f] * (c-k)
-    d1 = values[c] * (k-f)
-    return float(d0 + d1)
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
 
-def read_csv_latencies(p: Path) -> list[float]:
-    out = []
+from src.common.latency import LatencyHistogram, iter_csv_column  # noqa: E402
+
+# Prefer features-only timers if present; fall back to totals.
+LATENCY_KEYS = ("features_ms","stage_features_ms","total_ms","wall_ms","lat_ms")
+
+def read_csv_latencies(p: Path):
     if not p.exists():
-        return out
-    with p.open(newline="") as fh:
-        r = csv.DictReader(fh)
-        for row in r:
-            # Prefer features-only timers if present; fall back to totals.
-            for key in ("features_ms","stage_features_ms","total_ms","wall_ms","lat_ms"):
-                if key in row and row[key]:
-                    try:
-                        out.append(float(row[key]))
-                        break
-                    except Exception:
-                        pass
-    return out
+        return
+    yield from iter_csv_column(p, LATENCY_KEYS)
 
-def read_jsonl_latencies(p: Path) -> list[float]:
-    out = []
+def read_jsonl_latencies(p: Path):
     if not p.exists():
-        return out
+        return
     with p.open() as fh:
         for line in fh:
             if not line.strip():
@@ -44,14 +28,33 @@ def read_jsonl_latencies(p: Path) -> list[float]:
                 obj = json.loads(line)
             except Exception:
                 continue
-            for key in ("features_ms","stage_features_ms","total_ms","wall_ms","lat_ms"):
+            for key in LATENCY_KEYS:
                 if key in obj:
                     try:
-                        out.append(float(obj[key]))
+                        yield float(obj[key])
                         break
                     except Exception:
                         pass
-    return out
+
+def trimmed_histogram(values) -> LatencyHistogram:
+    """Histogram of values[3:-1] (warmup and final flush) if >= 6 values, else all.
+
+    Streams: only the first three values and the latest one are held back.
+    """
+    hist = LatencyHistogram()
+    head, last = [], None
+    for v in values:
+        if len(head) < 3:
+            head.append(v)
+            continue
+        if last is not None:
+            hist.record(last)
+        last = v
+    n = len(head) + (last is not None) + hist.count
+    if n < 6:
+        for v in head + ([last] if last is not None else []):
+            hist.record(v)
+    return hist
 
 def main():
     ap = argparse.ArgumentParser()
@@ -68,13 +71,12 @@ def main():
         lat = read_csv_latencies(maybe_csv) if maybe_csv.exists() else read_jsonl_latencies(p)
 
     # Drop obvious warmup and final flush if enough samples
-    if len(lat) >= 6:
-        lat = lat[3:-1]
+    hist = trimmed_histogram(lat)
 
-    p95 = percentile(lat, 95) if lat else float("nan")
+    p95 = hist.percentile(95)
     ok = (p95 <= args.sla_ms) and not math.isnan(p95)
 
-    print(f"windows={len(lat)}  p95={p95:.1f} ms  pass={ok}")
+    print(f"windows={hist.count}  p95={p95:.1f} ms  pass={ok}")
 
     # Emit p95 for artifact viewing
     outdir = Path("reports/phase3")
@@ -0,0 +1,87 @@
+"""Tests for the chunked bulk event writer."""
+from datetime import datetime, timezone
+
+from sqlalchemy import create_engine, text
+
+from src.ingest.bulk_writer import BulkEventWriter, event_row
+from src.ingest.hdfs_loader import ParsedLogEvent
+
+
+def _events(n):
+    ts = datetime(2025, 8, 16, 10, 0, tzinfo=timezone.utc)
+    return [
+        ParsedLogEvent(
+            ts=ts, host=f"h_{i % 3}", component="DataNode", template_id=i % 5,
+            session_id=f"s_{i}", level="INFO", labels={"cves": []}, schema_ver="1.0.0",
+        )
+        for i in range(n)
+    ]
+
+
+def _engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'events.db'}")
+    with engine.begin() as cx:
+        cx.exec_driver_sql(
+            "CREATE TABLE hdfs_events (ts TEXT, host TEXT, component TEXT, template_id INTEGER, "
+            "session_id TEXT, level TEXT, labels TEXT, schema_ver TEXT)"
+        )
+    return engine
+
+
+def test_event_row_projects_columns():
+    row = event_row(_events(1)[0])
+    assert row[1:6] == ("h_0", "DataNode", 0, "s_0", "INFO")
+    assert row[6] == '{"cves":[]}'
+    assert event_row({"host": "x"})[1] == "x"
+
+
+def test_write_in_chunks_reports_throughput(tmp_path):
+    engine = _engine(tmp_path)
+    writer = BulkEventWriter(engine, chunk_rows=7)
+    stats = writer.write_events(_events(50))
+    assert stats["rows"] == stats["inserted"] == 50
+    assert stats["chunks"] == 8
+    assert stats["rows_per_sec"] > 0
+    with engine.connect() as cx:
+        assert cx.execute(text("SELECT COUNT(*) FROM hdfs_events")).scalar() == 50
+
+
+def test_staging_merge_is_idempotent(tmp_path):
+    engine = _engine(tmp_path)
+    writer = BulkEventWriter(engine, chunk_rows=10, staging=True)
+    events = _events(25)
+    assert writer.write_events(events)["inserted"] == 25
+    again = writer.write_events(events + events[:3])
+    assert again["rows"] == 28 and again["inserted"] == 0
+    with engine.connect() as cx:
+        assert cx.execute(text("SELECT COUNT(*) FROM hdfs_events")).scalar() == 25
+
+
+def test_hdfs_logs_gets_a_level_for_events_without_one(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'logs.db'}")
+    with engine.begin() as cx:
+        cx.exec_driver_sql(
+            "CREATE TABLE hdfs_logs (ts TEXT NOT NULL, host TEXT NOT NULL, component TEXT NOT NULL, "
+            "level TEXT NOT NULL, template_id INTEGER, session_id TEXT, labels TEXT, schema_ver TEXT)"
+        )
+    events = _events(3)
+    events[1].level = None
+    assert BulkEventWriter(engine, table="hdfs_logs").write_events(events)["inserted"] == 3
+    with engine.connect() as cx:
+        levels = [r[0] for r in cx.execute(text("SELECT level FROM hdfs_logs ORDER BY session_id"))]
+    assert levels == ["INFO", "UNKNOWN", "INFO"]
+    assert BulkEventWriter(engine).defaults == {}  # hdfs_events.level is nullable
+
+
+def test_store_events_keeps_the_json_archive_name(tmp_path, monkeypatch):
+    import json
+    from src.ingest.hdfs_loader import HDFSLoader
+
+    monkeypatch.setenv("DOVAH_HMAC_KEY", "ab" * 32)
+    monkeypatch.setenv("DOVAH_DB_URL", f"sqlite:///{tmp_path / 'events.db'}")
+    monkeypatch.chdir(tmp_path)
+    assert HDFSLoader().store_events(_events(4))["rows"] == 4
+    (archive,) = (tmp_path / "data" / "processed").glob("parsed_logs_*")
+    assert archive.suffix == ".json"
+    stored = json.loads(archive.read_text())
+    assert [e["session_id"] for e in stored] == ["s_0", "s_1", "s_2", "s_3"]
@@ -0,0 +1,37 @@
+"""Tests for the shared template-id registry."""
+from src.ingest.template_registry import TemplateRegistry
+
+
+def test_merge_reconciles_worker_templates(tmp_path):
+    """Concrete and generalized variants of a template share one id."""
+    registry = TemplateRegistry(tmp_path / "registry.json")
+    ids = registry.merge([
+        "Block 123 replicated to node",
+        "Block <*> replicated to node",
+        "Deleting block <*> file <*>",
+    ])
+
+    assert ids["Block 123 replicated to node"] == ids["Block <*> replicated to node"]
+    assert ids["Deleting block <*> file <*>"] != ids["Block <*> replicated to node"]
+    assert len(registry) == 2
+
+
+def test_merge_is_order_independent(tmp_path):
+    """Ids do not depend on the order workers report templates in."""
+    templates = ["Served block <*> to <*>", "Served block 7 to 10.0.0.1", "Receiving block <*>"]
+    a = TemplateRegistry(tmp_path / "a.json").merge(templates)
+    b = TemplateRegistry(tmp_path / "b.json").merge(list(reversed(templates)))
+    assert a == b
+
+
+def test_ids_stable_across_reruns(tmp_path):
+    """Persisted ids are reused and new templates get fresh ids."""
+    path = tmp_path / "registry.json"
+    registry = TemplateRegistry(path)
+    first = registry.merge(["Receiving block <*>", "Verification succeeded for <*>"])
+    registry.save()
+
+    reloaded = TemplateRegistry(path)
+    second = reloaded.merge(["Receiving block blk_9", "PacketResponder <*> terminating"])
+    assert second["Receiving block blk_9"] == first["Receiving block <*>"]
+    assert second["PacketResponder <*> terminating"] not in first.values()
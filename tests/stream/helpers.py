@@ -0,0 +1,49 @@
+"""Synthetic event streams and a ``stream_processor`` runner shared by the stream tests."""
+import io
+import json
+import os
+import random
+from datetime import datetime, timedelta, timezone
+
+from src.stream import features
+
+SCHEMA = os.path.join(os.path.dirname(__file__), '../../src/stream/parsed_log.schema.json')
+BASE_TS = datetime(2023, 1, 1, 12, 0, 0, tzinfo=timezone.utc)
+
+
+def make_events(n, seed, steps, hosts, templates, sessions=None, jitter=None,
+                levels=("INFO",), components=("sshd", "cron", "kernel")):
+    """JSON lines of ``n`` events whose time advances by a random choice of ``steps`` seconds.
+
+    Each event gets a timestamp shifted by a random choice of ``jitter`` (if
+    given), one of ``hosts`` hosts, ``levels``, ``components``, ``templates``
+    templates and ``sessions`` sessions (all in ``S1`` if not given).
+    """
+    rng = random.Random(seed)
+    events, t = [], 0.0
+    for _ in range(n):
+        t += rng.choice(steps)
+        offset = rng.choice(jitter) if jitter else 0
+        ts = (BASE_TS + timedelta(seconds=t + offset)).isoformat()
+        host = f"h{rng.randrange(hosts)}"
+        level = rng.choice(levels) if len(levels) > 1 else levels[0]
+        events.append(json.dumps({
+            "timestamp": ts, "replay_ts": ts, "host": host,
+            "level": level, "component": rng.choice(components),
+            "message": "msg", "template_id": f"T{rng.randrange(templates)}",
+            "session_id": f"S{rng.randrange(sessions)}" if sessions else "S1",
+        }) + "\n")
+    return events
+
+
+def run_features(events, window_size_sec, window_stride_sec, **kwargs):
+    """Feature records of ``stream_processor`` over ``events``."""
+    out = io.StringIO()
+    features.stream_processor(window_size_sec=window_size_sec, window_stride_sec=window_stride_sec,
+                              schema_path=SCHEMA, events=iter(events), out=out, **kwargs)
+    return [json.loads(line) for line in out.getvalue().splitlines()]
+
+
+def strip(records, volatile=("emit_ts", "lat_ms")):
+    """``records`` without the fields that vary between runs."""
+    return [{k: v for k, v in r.items() if k not in volatile} for r in records]
@@ -0,0 +1,81 @@
+import os
+import random
+import sys
+import time
+import unittest
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+# Add project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from src.stream.burst import BurstDetector, BurstMonitor, parse_horizons
+
+
+class TestBurstDetector(unittest.TestCase):
+
+    def test_parse_horizons(self):
+        horizons = parse_horizons("10w, 1h,24h", stride_sec=10)
+        self.assertEqual([(h.name, h.windows) for h in horizons], [("10w", 10), ("1h", 360), ("24h", 8640)])
+        self.assertAlmostEqual(horizons[0].alpha, 2 / 11)
+        for bad in ("10", "5x", "1s", ""):
+            with self.assertRaises(ValueError):
+                parse_horizons(bad, stride_sec=10)
+
+    def test_lazy_zero_windows_match_explicit_updates(self):
+        """Skipping a key's empty windows in closed form equals feeding it zeros."""
+        horizons = parse_horizons("3w,20w", stride_sec=1)
+        lazy = BurstDetector(horizons, stride_sec=1)
+        explicit = BurstDetector(horizons, stride_sec=1)
+        rng = random.Random(1)
+        for t in range(400):
+            present = {h: rng.randint(1, 30) for h in ("a", "b", "c") if t == 0 or rng.random() < 0.3}
+            if present:
+                keys, z, _ = lazy.observe(present, t)
+            _, z_all, _ = explicit.observe({h: present.get(h, 0) for h in ("a", "b", "c")}, t)
+            for i, key in enumerate(keys if present else []):
+                self.assertTrue(np.allclose(z[i], z_all["abc".index(key)]), (t, key))
+
+    def test_host_burst_flags_per_horizon(self):
+        t0 = datetime(2023, 1, 1, tzinfo=timezone.utc)
+        monitor = BurstMonitor(stride_sec=60, horizons="5w,1h", min_count=20, top_hosts=2)
+        rng = random.Random(2)
+        for i in range(120):
+            hosts = {f"h{j}": 30 + rng.randint(-3, 3) for j in range(50)}
+            fields = monitor.observe(t0 + timedelta(minutes=i), sum(hosts.values()), hosts)
+        self.assertEqual((fields["is_burst"], fields["burst_hosts"]), (False, {}))
+        self.assertEqual(set(fields["burst_z"]), {"5w", "1h"})
+
+        hosts.update(h7=300, h8=90, h9=60)
+        fields = monitor.observe(t0 + timedelta(minutes=120), sum(hosts.values()), hosts)
+        self.assertEqual(list(fields["burst_hosts"]), ["h7", "h8"])  # top 2 by z
+        self.assertEqual(set(fields["burst_hosts"]["h7"]), {"5w", "1h"})
+        self.assertTrue(fields["is_burst"])
+        self.assertEqual(fields["burst_horizons"], ["5w", "1h"])
+
+    def test_scales_to_many_hosts_and_restores(self):
+        horizons = parse_horizons("10w,1h,24h", stride_sec=10)
+        det = BurstDetector(horizons, stride_sec=10)
+        rng = np.random.default_rng(3)
+        hosts = [f"host-{i}" for i in range(20000)]
+        t0 = time.perf_counter()
+        for w in range(20):
+            active = rng.choice(len(hosts), size=5000, replace=False)
+            det.observe({hosts[i]: int(c) for i, c in zip(active, rng.poisson(5, len(active)))}, 10.0 * w)
+        self.assertLess(time.perf_counter() - t0, 5)
+        self.assertGreater(len(det), 19000)
+        self.assertEqual(det.nbytes / len(det._n), 64)
+
+        restored = BurstDetector.from_dict(det.to_dict())
+        counts = {"host-1": 40, "host-2": 3, "new": 7}
+        a, b = det.observe(counts, 200.0), restored.observe(counts, 200.0)
+        self.assertEqual(a[0], b[0])
+        self.assertTrue(np.array_equal(a[1], b[1]))
+
+        det.forget("host-1")
+        self.assertEqual(det.observe({"host-1": 40}, 210.0)[1].tolist(), [[0.0, 0.0, 0.0]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timezone
+
+# Add project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from src.stream import checkpoint
+from tests.stream.helpers import make_events, run_features, strip
+
+
+def _events(n=800, seed=5):
+    return make_events(n, seed, steps=[0.2, 0.5, 1.0, 3.0], hosts=3, templates=60, jitter=[0, 0, -1.5])
+
+
+def _run(events, **kwargs):
+    return strip(run_features(events, 30, 5, allowed_lateness_sec=2, **kwargs))
+
+
+class TestCheckpoint(unittest.TestCase):
+
+    def test_save_is_atomic_and_checked(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'state.ckpt')
+            checkpoint.save_checkpoint(path, {"offset": 1})
+            checkpoint.save_checkpoint(path, {"offset": 2, "ts": datetime(2023, 1, 1, tzinfo=timezone.utc)})
+            self.assertEqual(os.listdir(tmp), ['state.ckpt'])
+            self.assertEqual(checkpoint.load_checkpoint(path)["offset"], 2)
+            with open(path, 'wb') as fh:
+                fh.write(b'{"offset": 2}')
+            with self.assertRaises(ValueError):
+                checkpoint.load_checkpoint(path)
+
+    def test_restore_continues_like_an_uninterrupted_run(self):
+        events = _events()
+        full = _run(events)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'state.ckpt')
+            # "crash" after 500 events: the last checkpoint is within those
+            _run(events[:500], checkpoint_path=path, checkpoint_interval_sec=0)
+            offset = checkpoint.load_checkpoint(path)["offset"]
+            self.assertGreater(offset, 450)
+            resumed = _run(events, restore_from=path)
+        self.assertGreater(len(resumed), 0)
+        self.assertLess(len(resumed), len(full) // 2)
+        self.assertEqual(resumed, full[-len(resumed):])
+
+
+if __name__ == '__main__':
+    unittest.main()
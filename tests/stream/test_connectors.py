@@ -0,0 +1,192 @@
+import io
+import json
+import os
+import socket
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+from datetime import datetime, timedelta, timezone
+
+# Add project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from src.stream import connectors, features
+from src.stream.connectors import FakeBroker, FileSink, FileTailSource, KafkaSource, UnixSocketSource
+from tests.stream.helpers import strip
+
+
+def _lines(n, start=0):
+    base_ts = datetime(2023, 1, 1, 12, 0, 0, tzinfo=timezone.utc)
+    return [json.dumps({
+        "timestamp": (base_ts + timedelta(seconds=i)).isoformat(), "host": "h1", "level": "INFO",
+        "component": ["sshd", "cron"][i % 2], "message": "m", "template_id": f"T{i % 5}", "session_id": "S1",
+    }) + "\n" for i in range(start, start + n)]
+
+
+class TestConnectors(unittest.TestCase):
+
+    def test_fake_broker_group_resumes_at_committed_offset(self):
+        broker = FakeBroker(partitions=2)
+        broker.produce("t", [b"a", b"b", b"c"], key=b"k1")
+        broker.produce("t", [b"d"], key=b"k2")
+        source = KafkaSource("t", "g", broker=broker, max_batch=2, poll_timeout=0.01, idle_timeout=0.05)
+        batches = source.batches()
+        first = next(batches)
+        self.assertEqual(len(first), 2)
+        source.mark_processed(first)
+        rest = [r for batch in batches for r in batch]  # second batch is never marked processed
+        self.assertEqual(sorted(first + rest), ["a", "b", "c", "d"])
+        source.close()
+        again = KafkaSource("t", "g", broker=broker, poll_timeout=0.01, idle_timeout=0.05)
+        self.assertEqual(sorted(r for batch in again.batches() for r in batch), sorted(rest))
+
+    def test_file_tail_follows_appends_rotation_and_resumes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'feed.jsonl')
+            with open(path, 'w') as fh:
+                fh.write('{"n": 1}\n{"n": 2}\n{"n": ')  # last line still being written
+            source = FileTailSource(path, max_batch=10, poll_timeout=0.01)
+            batch = source._poll(0.01)
+            self.assertEqual([json.loads(r)["n"] for r in batch], [1, 2])
+            source.mark_processed(batch)
+            source.commit()
+            with open(path, 'a') as fh:
+                fh.write('3}\n')
+            self.assertEqual([json.loads(r)["n"] for r in source._poll(0.01)], [3])
+            source.close()
+
+            # restart: resumes after the committed line 2
+            source = FileTailSource(path, max_batch=10, poll_timeout=0.01)
+            batch = source._poll(0.01)
+            self.assertEqual([json.loads(r)["n"] for r in batch], [3])
+            source.mark_processed(batch)
+            # rotation: the file is moved away and a new one started
+            os.rename(path, path + '.1')
+            with open(path, 'w') as fh:
+                fh.write('{"n": 4}\n')
+            got = []
+            for _ in range(3):
+                got.extend(json.loads(r)["n"] for r in source._poll(0.01))
+            self.assertEqual(got, [4])
+            source.close()
+
+    def test_unix_socket_source_reassembles_lines(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'feed.sock')
+            source = UnixSocketSource(path, poll_timeout=0.05)
+            client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            client.connect(path)
+            client.sendall(b'{"n": 1}\n{"n"')
+            got = []
+            for _ in range(3):
+                got.extend(source._poll(0.05))
+            client.sendall(b': 2}\n{"n": 3}')
+            client.close()
+            for _ in range(3):
+                got.extend(source._poll(0.05))
+            source.close()
+            self.assertEqual([json.loads(r)["n"] for r in got], [1, 2, 3])
+            self.assertFalse(os.path.exists(path))
+
+    def test_sink_batches_records(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'out.jsonl')
+            sink = FileSink(path, max_batch=3, linger_sec=60)
+            for i in range(7):
+                sink.write(json.dumps({"i": i}) + "\n")
+            self.assertEqual(sink.batches, 2)
+            sink.close()
+            with open(path) as fh:
+                self.assertEqual([json.loads(line)["i"] for line in fh], list(range(7)))
+        self.assertEqual((sink.records, sink.batches), (7, 3))
+
+    def test_live_pipeline_over_fake_broker(self):
+        from src.stream.job import _run_live_pipeline
+
+        events = _lines(400)
+        connectors.LOCAL_BROKER.produce("live-in", [e.encode() for e in events])
+        with tempfile.TemporaryDirectory() as tmp, redirect_stdout(io.StringIO()):
+            rc = _run_live_pipeline(
+                source="memory://live-in?group=features", sink="memory://live-out",
+                window_size_sec=30, window_stride_sec=10,
+                latency_log_file=os.path.join(tmp, 'lat.csv'),
+                source_batch=64, idle_timeout_sec=0.3, queue_capacity=2,
+            )
+        self.assertEqual(rc, 0)
+        got = [json.loads(v) for part in connectors.LOCAL_BROKER.topics["live-out"] for v in part]
+        out = io.StringIO()
+        features.stream_processor(window_size_sec=30, window_stride_sec=10,
+                                  schema_path='parsed_log.schema.json', events=iter(events), out=out)
+        want = [json.loads(line) for line in out.getvalue().splitlines()]
+        volatile = ("emit_ts", "lat_ms", "last_replay_ts")
+        self.assertEqual(strip(got, volatile), strip(want, volatile))
+        self.assertEqual(connectors.LOCAL_BROKER.committed[("features", "live-in")], {0: 400})
+
+    def test_live_pipeline_commits_only_emitted_and_written_offsets(self):
+        from unittest.mock import patch
+        from src.stream.job import _run_live_pipeline
+
+        events = _lines(400)
+        connectors.LOCAL_BROKER.produce("crash-in", [e.encode() for e in events])
+        send_batch = connectors.FakeProducer.send_batch
+        sent = []
+
+        def crash_after_some_output(producer, values):
+            if len(sent) == 5:
+                raise OSError("sink went away")
+            sent.append(values)
+            send_batch(producer, values)
+
+        def run(sink, patched=False):
+            with tempfile.TemporaryDirectory() as tmp, redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()):
+                with patch.object(connectors.FakeProducer, "send_batch", crash_after_some_output if patched else send_batch):
+                    return _run_live_pipeline(
+                        source="memory://crash-in?group=features", sink=f"memory://{sink}",
+                        window_size_sec=60, window_stride_sec=10,
+                        latency_log_file=os.path.join(tmp, 'lat.csv'),
+                        source_batch=16, idle_timeout_sec=0.3, queue_capacity=2, align_windows=True,
+                    )
+
+        def windows(topic):
+            return {r["window_end"]: r["event_count"]
+                    for r in (json.loads(v) for part in connectors.LOCAL_BROKER.topics[topic] for v in part)}
+
+        with self.assertRaisesRegex(OSError, "sink went away"):
+            run("crash-out-1", patched=True)
+        committed = connectors.LOCAL_BROKER.committed[("features", "crash-in")][0]
+        self.assertTrue(0 < committed < 400)
+        # the committed events are all in windows that reached the sink ...
+        first = windows("crash-out-1")
+        last_written = max(first)
+        self.assertLess(json.loads(events[committed - 1])["timestamp"], last_written)
+
+        # ... and replaying from the committed offset recomputes every window that did not
+        self.assertEqual(run("crash-out-2"), 0)
+        replayed = windows("crash-out-2")
+        out = io.StringIO()
+        features.stream_processor(window_size_sec=60, window_stride_sec=10, schema_path='parsed_log.schema.json',
+                                  events=iter(events), out=out, align_windows=True)
+        full = {r["window_end"]: r["event_count"] for r in map(json.loads, out.getvalue().splitlines())}
+        missing = {end: n for end, n in full.items() if end not in first}
+        self.assertTrue(missing)
+        self.assertEqual({end: replayed.get(end) for end in missing}, missing)
+
+    def test_live_pipeline_refuses_checkpoint_restore(self):
+        # buffered events are not in the checkpoint; the source replays from its committed offsets
+        from src.stream.job import _run_live_pipeline
+
+        connectors.LOCAL_BROKER.produce("restore-in", [e.encode() for e in _lines(40)])
+        with tempfile.TemporaryDirectory() as tmp, redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()):
+            with self.assertRaisesRegex(ValueError, "checkpoints are not supported"):
+                _run_live_pipeline(
+                    source="memory://restore-in?group=features", sink="memory://restore-out",
+                    window_size_sec=60, window_stride_sec=10,
+                    latency_log_file=os.path.join(tmp, 'lat.csv'),
+                    idle_timeout_sec=0.3, restore_from=os.path.join(tmp, 'ckpt.json'),
+                )
+        self.assertNotIn(("features", "restore-in"), connectors.LOCAL_BROKER.committed)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import create_engine, text
+
+# Add project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from src.stream import features
+from src.stream.connectors import open_sink
+from src.stream.db_sink import ALL_SESSIONS, WindowFeaturesSink
+from src.stream.queues import QueueAborted
+
+SCHEMA = os.path.join(os.path.dirname(__file__), '../../src/stream/parsed_log.schema.json')
+
+# alembic/versions/001_add_window_features.py, in SQLite terms
+DDL = """
+CREATE TABLE window_features (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts TIMESTAMP NOT NULL,
+    session_id TEXT NOT NULL,
+    host TEXT NOT NULL,
+    window_size INTEGER NOT NULL,
+    window_slide INTEGER NOT NULL,
+    event_count INTEGER NOT NULL,
+    unique_components INTEGER NOT NULL,
+    error_ratio DOUBLE PRECISION NOT NULL,
+    template_entropy DOUBLE PRECISION NOT NULL,
+    component_entropy DOUBLE PRECISION NOT NULL,
+    label TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(ts, session_id)
+)
+"""
+
+
+def _events(n=300):
+    base_ts = datetime(2023, 1, 1, 12, 0, 0, tzinfo=timezone.utc)
+    return [{
+        "timestamp": (base_ts + timedelta(seconds=i)).isoformat(), "host": "h1",
+        "level": "ERROR" if i % 7 == 0 else "INFO", "component": ["sshd", "cron"][i % 2],
+        "message": "m", "template_id": f"T{i % 5}", "session_id": f"S{i % 3}",
+    } for i in range(n)]
+
+
+def _rows(engine):
+    with engine.connect() as cx:
+        return cx.execute(text(
+            "SELECT session_id, window_size, window_slide, event_count, error_ratio, template_entropy "
+            "FROM window_features ORDER BY ts, session_id"
+        )).fetchall()
+
+
+class TestWindowFeaturesSink(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.url = f"sqlite:///{os.path.join(self.tmp.name, 'features.db')}"
+        self.engine = create_engine(self.url)
+        with self.engine.begin() as cx:
+            cx.exec_driver_sql(DDL)
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.tmp.cleanup()
+
+    def _stream(self, sink, **kwargs):
+        features.stream_processor(window_size_sec=30, window_stride_sec=10, schema_path=SCHEMA,
+                                  events=iter(_events()), out=sink, **kwargs)
+
+    def test_stream_upserts_on_ts_and_session(self):
+        out = io.StringIO()
+        features.stream_processor(window_size_sec=30, window_stride_sec=10, schema_path=SCHEMA,
+                                  events=iter(_events()), out=out)
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+
+        sink = WindowFeaturesSink(self.engine, 30, 10, max_batch=7, linger_sec=60)
+        self._stream(sink)
+        sink.close()
+        rows = _rows(self.engine)
+        self.assertEqual(len(rows), len({r["window_end"] for r in records}))
+        self.assertEqual({r.session_id for r in rows}, {ALL_SESSIONS})
+        self.assertEqual((rows[3].window_size, rows[3].window_slide), (30, 10))
+        last = {r["window_end"]: r for r in records}  # later records win, like the upsert
+        self.assertEqual([r.event_count for r in rows], [r["event_count"] for r in last.values()])
+        self.assertEqual([r.template_entropy for r in rows], [r["template_entropy"] for r in last.values()])
+        stats = sink.stats()
+        self.assertEqual((stats["rows_written"], stats["backlog"]), (len(records), 0))
+        self.assertGreaterEqual(stats["batches"], len(records) // 7)
+
+        # replaying the stream updates the same rows instead of duplicating them
+        sink = WindowFeaturesSink(self.engine, 30, 10, max_batch=1000)
+        self._stream(sink)
+        sink.close()
+        self.assertEqual(_rows(self.engine), rows)
+
+    def test_partitioned_records_are_stored_per_session(self):
+        sink = open_sink(self.url, window_size_sec=30, window_stride_sec=10, partition_key="session_id")
+        self._stream(sink, partitions=2, partition_key="session_id", merge=True)
+        sink.close()
+        rows = _rows(self.engine)
+        self.assertEqual({r.session_id for r in rows}, {"S0", "S1", "S2", ALL_SESSIONS})
+        self.assertEqual(sum(r.event_count for r in rows if r.session_id == "S1") * 3,
+                         sum(r.event_count for r in rows if r.session_id == ALL_SESSIONS))
+        with self.assertRaises(ValueError):
+            WindowFeaturesSink(self.engine, 30, 10, partition_key="host")
+
+    def test_linger_flushes_without_close(self):
+        sink = WindowFeaturesSink(self.engine, 30, 10, max_batch=1000, linger_sec=0.05)
+        record = {"window_end": "2023-01-01T12:00:30+00:00", "event_count": 3, "unique_components": 1,
+                  "error_ratio": 0.0, "template_entropy": 1.0, "component_entropy": 0.0}
+        sink.write(json.dumps(record) + "\n")
+        deadline = time.monotonic() + 5
+        while sink.backlog and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(len(_rows(self.engine)), 1)
+        self.assertEqual(sink.stats()["backlog_max"], 1)
+        self.assertGreater(sink.flush_ms.count, 0)
+        sink.close()
+
+    def test_writer_failure_reaches_the_producer(self):
+        with self.engine.begin() as cx:
+            cx.exec_driver_sql("DROP TABLE window_features")
+        sink = WindowFeaturesSink(self.engine, 30, 10, max_batch=1, backlog_capacity=1)
+        with self.assertRaises(QueueAborted):
+            self._stream(sink)
+        with self.assertRaises(RuntimeError):
+            sink.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import sys
+import unittest
+from datetime import datetime, timedelta, timezone
+
+# Add project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from src.common.timeparse import to_epoch_ns
+from src.stream import events as events_module
+from src.stream.events import NO_KEY, EventBuffer, StreamEvent
+
+
+def _prepared(i, host="h1", component="dfs.DataNode", level="INFO"):
+    ts = datetime(2023, 1, 1, tzinfo=timezone.utc) + timedelta(milliseconds=i)
+    return {
+        "host": host,
+        "component": component,
+        "template_id": f"t{i % 7}",
+        "level": level,
+        "_internal": {"original_ts": ts, "replay_ts": ts + timedelta(seconds=1)},
+    }
+
+
+class TestStreamEvent(unittest.TestCase):
+
+    def test_from_event_interns_and_converts(self):
+        ev = StreamEvent.from_event(_prepared(5, level="FATAL"))
+        self.assertEqual(ev.ts_ns, to_epoch_ns(datetime(2023, 1, 1, 0, 0, 0, 5000, tzinfo=timezone.utc)))
+        self.assertEqual(ev.replay_ns - ev.ts_ns, 1_000_000_000)
+        self.assertTrue(ev.error)
+        self.assertEqual(StreamEvent.from_event(_prepared(12)).template, ev.template)  # t5 both times
+
+        bare = _prepared(1, host=None, component="")
+        del bare["_internal"]["replay_ts"]
+        ev = StreamEvent.from_event(bare)
+        self.assertEqual((ev.host, ev.component, ev.replay_ns), (NO_KEY, NO_KEY, ev.ts_ns))
+        self.assertEqual(StreamEvent.from_tuple(ev.to_tuple()), ev)
+        self.assertEqual(ev.to_tuple()[2:5], (None, None, "t1"))
+
+
+class TestEventBuffer(unittest.TestCase):
+
+    def test_fifo_with_prefix_compaction(self):
+        buf = EventBuffer()
+        records = [StreamEvent.from_event(_prepared(i, host=f"h{i % 3}")) for i in range(10000)]
+        for ev in records[:6000]:
+            buf.append(ev)
+        self.assertEqual(buf.first_ts_ns, records[0].ts_ns)
+        popped = [buf.popleft() for _ in range(5000)]
+        self.assertEqual(popped, records[:5000])
+        self.assertEqual(len(buf.ts_ns), 1904)  # prefix cut off at 4096 evictions (> half the buffer)
+        for ev in records[6000:]:
+            buf.append(ev)
+        self.assertEqual(len(buf), 5000)
+        self.assertEqual(list(buf), records[5000:])
+        while buf:
+            buf.popleft()
+        with self.assertRaises(IndexError):
+            buf.popleft()
+
+    def test_bytes_per_event(self):
+        buf = EventBuffer()
+        for i in range(1000):
+            buf.append(StreamEvent.from_event(_prepared(i)))
+        self.assertLessEqual(buf.nbytes / len(buf), 2 * 29)  # arrays over-allocate by at most ~2x
+        self.assertEqual(events_module.HOSTS.names[buf.host[0]], "h1")
+
+
+if __name__ == '__main__':
+    unittest.main()
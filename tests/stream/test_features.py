@@ -1,15 +1,59 @@
 import json
+import math
 import sys
 import os
 import unittest
 from unittest.mock import patch, MagicMock
-from collections import deque
+from collections import Counter, deque
 from datetime import datetime, timedelta, timezone
 
 # Add project root to the Python path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
 from src.stream import features
+from src.stream.events import ERROR_LEVELS
+from src.stream.windows import counts_entropy
+from tests.stream.helpers import make_events, strip
+
+
+def process_window(window_events, prev_window_components, seen_templates, burst):
+    """Oracle: emits the features of one window recomputed from its event list.
+
+    The O(n)-per-window path the incremental ``SlidingWindowState`` replaced;
+    the record must match what ``stream_processor`` emits for the same window.
+    """
+    if not window_events:
+        return {}
+    timestamps = [e["_internal"]["original_ts"] for e in window_events]
+    template_counts = Counter(e.get("template_id") for e in window_events)
+    current_window_templates = set(template_counts)
+    component_counts = Counter(e.get("component") for e in window_events if e.get("component"))
+    current_window_components = set(component_counts)
+    new_components = current_window_components - prev_window_components
+    disappeared_components = prev_window_components - current_window_components
+
+    feature_record = features._emit_features(
+        window_start=min(timestamps),
+        window_end=max(timestamps),
+        last_replay_ts=max(e["_internal"]["replay_ts"] for e in window_events),
+        event_count=len(window_events),
+        unique_templates=len(template_counts),
+        rare_templates=sum(1 for c in template_counts.values() if c == 1),
+        component_churn=len(new_components) + len(disappeared_components),
+        is_unseen_template=bool(current_window_templates - seen_templates),
+        burst=burst,
+        host_counts=Counter(e.get("host") for e in window_events),
+        unique_components=len(component_counts),
+        error_count=sum(1 for e in window_events if e.get("level") in ERROR_LEVELS),
+        template_entropy=counts_entropy(template_counts.values()),
+        component_entropy=counts_entropy(component_counts.values()),
+    )
+    feature_record["_internal"] = {
+        "components": current_window_components,
+        "templates": current_window_templates,
+    }
+    return feature_record
+
 
 class TestStreamFeatures(unittest.TestCase):
 
@@ -123,5 +167,195 @@ class TestStreamFeatures(unittest.TestCase):
         self.assertEqual(results[2]['is_unseen_template'], False) # T001 was seen before
         self.assertEqual(results[2]['is_burst'], True) # Event count (30) is a spike
 
+    def test_incremental_windows_match_batch(self):
+        """Sliding windows from the incremental state equal per-window recomputation."""
+        import io
+        import tempfile
+        from src.stream.burst import BurstMonitor
+
+        # one host, some out-of-order events
+        events = [json.loads(line) for line in make_events(
+            400, 7, steps=[0.2, 0.5, 1.0, 3.0, 45.0], hosts=1, templates=12, jitter=[0, 0, 0, -2.5],
+            levels=["INFO", "INFO", "WARN", "ERROR"], components=["sshd", "cron", "kernel", ""])]
+
+        def reference(size, stride, lateness):
+            # Event-time windows recomputed from a sorted buffer; the watermark
+            # is the latest timestamp minus the lateness, events older than the
+            # windows already passed are dropped
+            state = {"buf": [], "start": None, "closed": None}
+            prev, seen, burst = set(), set(), BurstMonitor(stride)
+
+            def ts_of(x):
+                return x["_internal"]["original_ts"]
+
+            def close(watermark):
+                while state["buf"] and watermark >= state["start"] + timedelta(seconds=size):
+                    end = state["start"] + timedelta(seconds=size)
+                    win = sorted((x for x in state["buf"] if ts_of(x) < end), key=ts_of)
+                    if win:
+                        rec = process_window(win, prev, seen, burst)
+                        prev.clear()
+                        prev.update(rec["_internal"]["components"])
+                        seen.update(rec["_internal"]["templates"])
+                    state["start"] += timedelta(seconds=stride)
+                    state["closed"] = end
+                    state["buf"] = [x for x in state["buf"] if ts_of(x) >= state["start"]]
+
+            late, max_ts = 0, None
+            with patch('sys.stdout', new_callable=MagicMock) as mock_stdout:
+                for e in events:
+                    ts = datetime.fromisoformat(e["timestamp"])
+                    if state["closed"] is not None and (ts < state["closed"] or ts < state["start"]):
+                        late += 1
+                        continue
+                    state["buf"].append(dict(e, _internal={"original_ts": ts, "replay_ts": ts}))
+                    state["start"] = state["start"] or ts
+                    max_ts = max(max_ts or ts, ts)
+                    close(max_ts - timedelta(seconds=lateness))
+                close(max_ts)  # end of input
+                if state["buf"]:
+                    process_window(sorted(state["buf"], key=ts_of), prev, seen, burst)
+                written = "".join(c.args[0] for c in mock_stdout.write.call_args_list)
+            return [json.loads(line) for line in written.strip().split('\n')], late
+
+        for size, stride, lateness in [(60, 1, 0), (60, 60, 0), (10, 2.5, 0), (10, 2.5, 3)]:
+            input_data = "\n".join(json.dumps(e) for e in events) + "\n"
+            with tempfile.TemporaryDirectory() as tmp:
+                late_path = os.path.join(tmp, "late.jsonl")
+                with patch('sys.stdin') as mock_stdin:
+                    mock_stdin.__iter__.return_value = iter(input_data.splitlines(True))
+                    with patch('sys.stdout', new_callable=MagicMock) as mock_stdout:
+                        features.stream_processor(window_size_sec=size, window_stride_sec=stride,
+                                                  schema_path='parsed_log.schema.json',
+                                                  allowed_lateness_sec=lateness, late_events_file=late_path)
+                        written = "".join(c.args[0] for c in mock_stdout.write.call_args_list)
+                with open(late_path) as fh:
+                    late = [json.loads(line) for line in fh]
+            got = [json.loads(line) for line in written.strip().split('\n')]
+            want, want_late = reference(size, stride, lateness)
+            self.assertEqual(strip(got), strip(want))
+            self.assertEqual(len(late), want_late)
+            if lateness:
+                self.assertEqual(late, [])  # jitter within the allowed lateness
+
+        # the out-of-order events do reach their windows once lateness covers the jitter
+        counts = {}
+        for lateness in (0, 3):
+            out = io.StringIO()
+            features.stream_processor(window_size_sec=10, window_stride_sec=10,
+                                      schema_path='parsed_log.schema.json', events=iter(events),
+                                      out=out, allowed_lateness_sec=lateness)
+            counts[lateness] = sum(json.loads(line)["event_count"] for line in out.getvalue().splitlines())
+        self.assertLess(counts[0], len(events))
+        self.assertEqual(counts[3], len(events))
+
+    def test_running_entropy_matches_recount(self):
+        """Entropy from the running sum of c*log2(c) stays equal to a recount after many slides."""
+        import random
+        from src.stream.events import StreamEvent
+        from src.stream.windows import SlidingWindowState
+
+        def entropy(values):
+            counts = Counter(values)
+            n = sum(counts.values())
+            return -sum(c / n * math.log2(c / n) for c in counts.values())
+
+        rng = random.Random(3)
+        ts = datetime(2023, 1, 1, tzinfo=timezone.utc)
+        state, window = SlidingWindowState(), deque()
+        for i in range(20000):
+            event = {"template_id": f"T{int(rng.paretovariate(1.2)) % 40}",
+                     "component": rng.choice(["sshd", "cron", "kernel", None]),
+                     "level": rng.choice(["INFO", "WARN", "ERROR"]),
+                     "_internal": {"original_ts": ts, "replay_ts": ts}}
+            record = StreamEvent.from_event(event)
+            state.push(record)
+            window.append((event, record))
+            while len(window) > rng.randint(1, 300):
+                state.pop(window.popleft()[1])
+            if i % 997 == 0:
+                events = [e for e, _ in window]
+                self.assertAlmostEqual(state.template_entropy, entropy(e["template_id"] for e in events), places=9)
+                self.assertAlmostEqual(state.component_entropy,
+                                       entropy(e["component"] for e in events if e["component"]), places=9)
+                self.assertEqual(state.error_count, sum(e["level"] == "ERROR" for e in events))
+                self.assertEqual(state.unique_components, len({e["component"] for e in events} - {None}))
+
+    def test_stream_records_feed_iforest(self):
+        """Feature records from the stream carry the IForestModel inputs."""
+        import io
+        from src.models.anomaly.iforest import IForestModel
+
+        base_ts = datetime(2023, 1, 1, 12, 0, 0, tzinfo=timezone.utc)
+        events = [{
+            "timestamp": (base_ts + timedelta(seconds=i)).isoformat(), "host": "host1",
+            "level": "ERROR" if i % 10 == 0 else "INFO", "component": ["sshd", "cron", "kernel"][i % 3],
+            "message": "msg", "template_id": f"T{i % 5}", "session_id": "S001",
+        } for i in range(600)]
+        out = io.StringIO()
+        features.stream_processor(window_size_sec=30, window_stride_sec=10,
+                                  schema_path='parsed_log.schema.json', events=iter(events), out=out)
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+        full = records[5]
+        self.assertEqual(full["event_count"], 30)
+        self.assertEqual(full["unique_components"], 3)
+        self.assertEqual(full["error_ratio"], 0.1)
+        self.assertEqual(full["template_entropy"], round(math.log2(5), 4))  # 5 equally frequent templates
+        self.assertEqual(full["component_entropy"], round(math.log2(3), 4))
+
+        model = IForestModel()
+        model.fit(records)
+        scores = model.score(records + [{"event_count": 1}])
+        self.assertEqual(len(scores), len(records) + 1)
+        self.assertTrue(all(0.0 <= sc <= 1.0 for sc in scores[:-1]))
+        self.assertTrue(math.isnan(scores[-1]))
+
+    def test_watermark_waits_for_trailing_host(self):
+        """The watermark is held by the slowest live host, not by an idle one."""
+        from src.stream.windows import Watermark
+
+        t0 = datetime(2023, 1, 1, tzinfo=timezone.utc)
+
+        def at(sec):
+            return t0 + timedelta(seconds=sec)
+
+        wm = Watermark(allowed_lateness=timedelta(seconds=2), idle_timeout=timedelta(seconds=30))
+        wm.observe("a", at(10))
+        wm.observe("b", at(4))
+        self.assertEqual(wm.value, at(2))  # host b trails, minus the lateness
+        wm.observe("a", at(20))
+        wm.observe("b", at(3))  # out of order within b: no effect
+        self.assertEqual(wm.value, at(2))
+        self.assertEqual(wm.lag, timedelta(seconds=18))
+        wm.observe("a", at(50))  # b now more than 30s behind: idle
+        self.assertEqual(wm.value, at(48))
+        wm.observe("b", at(40))  # b resumes, but the watermark never goes back
+        self.assertEqual(wm.value, at(48))
+        wm.observe("b", at(60))
+        self.assertEqual(wm.value, at(48))
+        wm.observe("a", at(70))
+        self.assertEqual(wm.value, at(58))
+
+    def test_in_process_events_match_stdin(self):
+        """Event dicts handed over in-process give the same records as JSON lines on stdin."""
+        import io
+        base_ts = datetime(2023, 1, 1, 12, 0, 0, tzinfo=timezone.utc)
+        events = [{
+            "timestamp": (base_ts + timedelta(seconds=7 * i)).isoformat(),
+            "replay_ts": (base_ts + timedelta(seconds=7 * i)).isoformat(),
+            "host": "host1", "level": "INFO", "component": ["sshd", "cron"][i % 2],
+            "message": "msg", "template_id": f"T{i % 3}", "session_id": "S001"
+        } for i in range(40)]
+        events.insert(5, {"message": "invalid"})
+        piped = self._run_stream_processor(events)
+
+        out = io.StringIO()
+        features.stream_processor(window_size_sec=60, window_stride_sec=60,
+                                  schema_path='parsed_log.schema.json',
+                                  events=iter([dict(e) for e in events]), out=out)
+        direct = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(len(direct), 5)
+        self.assertEqual(strip(direct), strip(piped))
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,115 @@
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+# Add project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from src.stream import features, framing, replay
+from tests.stream.helpers import strip
+
+
+def _stdin(data: bytes) -> io.TextIOWrapper:
+    return io.TextIOWrapper(io.BufferedReader(io.BytesIO(data)))
+
+
+class TestFraming(unittest.TestCase):
+
+    def test_round_trip_with_nulls_extras_and_odd_types(self):
+        events = [
+            {"timestamp": "2025-08-15T10:00:00Z", "replay_ts": "2025-08-15T12:00:00.5+02:00",
+             "host": "h1", "level": None, "component": "DataNode", "message": "héllo",
+             "template_id": 7, "session_id": "s1", "dedup_key": "d1"},
+            {"timestamp": "not a time", "host": None, "message": None},
+            {"timestamp": "2025-08-15T10:00:01Z", "message": ["x"], "mitre": ["T1"]},
+            {},
+        ]
+        decoded = list(framing.read_events(io.BytesIO(framing.encode_events(events, batch_size=3))))
+        self.assertEqual(decoded[0], {
+            "timestamp": "2025-08-15T10:00:00.000000Z", "replay_ts": "2025-08-15T10:00:00.500000Z",
+            "host": "h1", "level": None, "component": "DataNode", "message": "héllo",
+            "template_id": 7, "session_id": "s1", "dedup_key": "d1",
+        })
+        self.assertEqual(decoded[1], events[1])
+        self.assertEqual(decoded[2], dict(events[2], timestamp="2025-08-15T10:00:01.000000Z"))
+        self.assertEqual(decoded[3], {})
+
+    def test_timestamps_outside_int64_ns_kept_as_extras(self):
+        events = [
+            {"timestamp": "1500-01-01T00:00:00Z", "host": "h1"},
+            {"timestamp": "2300-01-01T00:00:00Z", "replay_ts": "2025-08-15T10:00:00Z"},
+            {"timestamp": "2300-01-01T00:00:00Z"},  # cached as out of range, still kept
+        ]
+        decoded = list(framing.read_events(io.BytesIO(framing.encode_events(events, batch_size=3))))
+        self.assertEqual(decoded[0], events[0])
+        self.assertEqual(decoded[1], dict(events[1], replay_ts="2025-08-15T10:00:00.000000Z"))
+        self.assertEqual(decoded[2], events[2])
+
+    def test_dictionary_sent_once_and_reset(self):
+        batch = [{"timestamp": "2025-08-15T10:00:00Z", "host": "namenode1.hadoop.local"}] * 50
+        encoder = framing.FrameEncoder(max_dict_size=1)
+        first, second = encoder.encode(batch), encoder.encode(batch)
+        self.assertEqual(first.count(b"namenode1"), 1)
+        self.assertNotIn(b"namenode1", second)
+        encoder.encode([{"host": "other"}])  # host dictionary now over the limit
+        stream = first + second + encoder.encode(batch)
+        decoded = list(framing.read_events(io.BytesIO(stream)))
+        self.assertEqual(len(decoded), 150)
+        self.assertTrue(all(e["host"] == "namenode1.hadoop.local" for e in decoded))
+
+    def test_sniff_and_bad_or_truncated_streams(self):
+        data = framing.encode_events([{"timestamp": "2025-08-15T10:00:00Z"}] * 3)
+        self.assertEqual(framing.sniff_wire_format(io.BufferedReader(io.BytesIO(data))), "binary")
+        self.assertEqual(framing.sniff_wire_format(io.BufferedReader(io.BytesIO(b'{"a": 1}\n'))), "jsonl")
+        self.assertEqual(list(framing.open_input(_stdin(b""), "auto")), [])
+        with self.assertRaises(ValueError):
+            framing.read_events(io.BytesIO(b'{"a": 1}\n'))
+        self.assertEqual(list(framing.read_events(io.BytesIO(data[:-3]))), [])
+
+    def test_features_same_records_from_binary_stdin(self):
+        base_ts = datetime(2023, 1, 1, 12, 0, 0, tzinfo=timezone.utc)
+        events = [{
+            "timestamp": (base_ts + timedelta(seconds=7 * i)).isoformat(),
+            "replay_ts": (base_ts + timedelta(seconds=7 * i)).isoformat(),
+            "host": "host1", "level": "INFO", "component": ["sshd", "cron"][i % 2],
+            "message": "msg", "template_id": f"T{i % 3}", "session_id": "S001"
+        } for i in range(40)]
+        events.insert(5, {"message": "invalid"})
+        payloads = {
+            "jsonl": "".join(json.dumps(e) + "\n" for e in events).encode(),
+            "binary": framing.encode_events(events, batch_size=8),
+        }
+        records = {}
+        for name, data in payloads.items():
+            out = io.StringIO()
+            with patch('sys.stdin', _stdin(data)):
+                features.stream_processor(window_size_sec=60, window_stride_sec=60,
+                                          schema_path='parsed_log.schema.json', out=out)
+            records[name] = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(len(records["binary"]), 5)
+        self.assertEqual(strip(records["binary"]), strip(records["jsonl"]))
+
+    def test_replay_writes_binary_frames(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'events.jsonl')
+            with open(path, 'w') as fh:
+                for i in range(20):
+                    fh.write(json.dumps({"timestamp": f"2025-08-01T00:00:{i:02d}Z", "host": f"h{i % 2}"}) + "\n")
+            buf = io.BytesIO()
+            stdout = io.TextIOWrapper(buf)
+            with patch('sys.stdout', stdout):
+                replay.replay_events(path, eps=100000, warmup_sec=0, run_duration_sec=10,
+                                     num_events=20, wire_format="binary")
+            decoded = list(framing.read_events(io.BytesIO(buf.getvalue())))
+        self.assertEqual([e["host"] for e in decoded], [f"h{i % 2}" for i in range(20)])
+        self.assertEqual(decoded[3]["orig_ts"], "2025-08-01T00:00:03.000000Z")
+        self.assertEqual(decoded[3]["timestamp"], decoded[3]["replay_ts"])
+
+
+if __name__ == '__main__':
+    unittest.main()
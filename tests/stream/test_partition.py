@@ -0,0 +1,135 @@
+import io
+import json
+import os
+import sys
+import unittest
+from datetime import datetime, timedelta, timezone
+
+# Add project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from src.stream import partition
+from src.stream.windows import WindowedStream
+from tests.stream.helpers import SCHEMA, make_events, run_features, strip
+
+VOLATILE = ("emit_ts", "lat_ms", "partition_key", "partition")
+
+
+def _events(n=1500, seed=3):
+    return make_events(n, seed, steps=[0.1, 0.3, 1.0, 4.0], hosts=5, templates=25, sessions=30)
+
+
+def _run(events, **kwargs):
+    return run_features(events, 10, 5, **kwargs)
+
+
+def _strip(records):
+    return strip(records, VOLATILE)
+
+
+class TestPartitionedFeatures(unittest.TestCase):
+
+    def test_partition_for_is_stable_and_key_extraction_skips_decoding(self):
+        self.assertEqual(partition.partition_for("S1", 4), partition.partition_for("S1", 4))
+        self.assertEqual({partition.partition_for(f"S{i}", 4) for i in range(100)}, {0, 1, 2, 3})
+        key_of = partition._key_extractor("session_id")
+        self.assertEqual(key_of('{"session_id": "S7", "host": "h"}\n'), "S7")
+        self.assertEqual(key_of('{"session_id": null}\n'), None)
+        self.assertEqual(key_of('{"session_id": "a\\"b"}\n'), 'a"b')  # escaped: json.loads fallback
+        self.assertEqual(key_of({"session_id": "S8"}), "S8")
+
+    def test_aligned_windows_contain_first_event(self):
+        ws = WindowedStream(timedelta(seconds=10), timedelta(seconds=5), align=True)
+        ts = datetime(2023, 1, 1, 0, 0, 12, tzinfo=timezone.utc)
+        ws.add({"_internal": {"original_ts": ts}})
+        self.assertEqual(list(ws.advance(ts)), [])  # places the first window
+        self.assertEqual(ws.next_start, datetime(2023, 1, 1, 0, 0, 5, tzinfo=timezone.utc))
+
+    def test_merged_records_match_single_process(self):
+        events = _events()
+        single = _run(events, align_windows=True)
+        records = _run(events, partitions=3, partition_key="session_id", merge=True)
+        merged = [r for r in records if r["partition_key"] is None]
+        self.assertGreater(len(merged), 100)
+        self.assertEqual(_strip(merged), _strip(single))
+
+    def test_per_key_records(self):
+        events = _events(600)
+        records = _run(events, partitions=2, partition_key="host")
+        self.assertTrue(records)
+        for r in records:
+            self.assertEqual(r["partition"], partition.partition_for(r["partition_key"], 2))
+        # same windows as running each key alone (churn / novelty / burst history
+        # restarts when an idle key is dropped, so only window contents compare).
+        # The end-of-stream flush differs: workers first close windows up to the
+        # latest event time of all keys, a lone key only up to its own.
+        fields = ("window_start", "window_end", "event_count", "unique_templates", "rare_template_rate")
+
+        def contents(recs):
+            return [tuple(r[f] for f in fields) for r in recs]
+
+        per_key = {}
+        for r in records:
+            per_key.setdefault(r["partition_key"], []).append(r)
+        self.assertEqual(set(per_key), {f"h{i}" for i in range(5)})
+        for key, recs in per_key.items():
+            own = [e for e in events if json.loads(e)["host"] == key]
+            alone = contents(_run(own, align_windows=True))[:-1]
+            self.assertEqual(contents(recs)[:len(alone)], alone)
+
+    def test_allowed_lateness_and_late_events(self):
+        import tempfile
+        events = _events(800)
+        # out of order by a few seconds (after the first events, which place the
+        # first single-process window), plus one event far behind the stream
+        events = events[:3] + [e for i in range(3, len(events), 3) for e in reversed(events[i:i + 3])]
+        straggler = json.loads(events[400])
+        ts = datetime.fromisoformat(straggler["timestamp"]) - timedelta(seconds=300)
+        straggler.update(timestamp=ts.isoformat(), replay_ts=ts.isoformat(), template_id="LATE")
+        events.insert(600, json.dumps(straggler) + "\n")
+        with tempfile.TemporaryDirectory() as tmp:
+            late_files = [os.path.join(tmp, "single.jsonl"), os.path.join(tmp, "parted.jsonl")]
+            single = _run(events, align_windows=True, allowed_lateness_sec=30, late_events_file=late_files[0])
+            records = _run(events, partitions=2, partition_key="host", merge=True,
+                           allowed_lateness_sec=30, late_events_file=late_files[1])
+            for path in late_files:
+                with open(path) as fh:
+                    self.assertEqual([json.loads(line)["template_id"] for line in fh], ["LATE"])
+        merged = [r for r in records if r["partition_key"] is None]
+        self.assertEqual(_strip(merged), _strip(single))
+
+    def test_late_event_of_a_key_without_windows(self):
+        import tempfile
+        events = _events(800)
+        # a session never seen before, far behind the stream: no stream of its
+        # own exists, and its windows were closed for every other key
+        straggler = json.loads(events[400])
+        ts = datetime.fromisoformat(straggler["timestamp"]) - timedelta(seconds=300)
+        straggler.update(timestamp=ts.isoformat(), replay_ts=ts.isoformat(), session_id="S99")
+        events.insert(600, json.dumps(straggler) + "\n")
+        with tempfile.TemporaryDirectory() as tmp:
+            late_files = [os.path.join(tmp, "single.jsonl"), os.path.join(tmp, "parted.jsonl")]
+            _run(events, align_windows=True, late_events_file=late_files[0])
+            records = _run(events, partitions=2, partition_key="session_id", late_events_file=late_files[1])
+            for path in late_files:
+                with open(path) as fh:
+                    self.assertEqual([json.loads(line)["session_id"] for line in fh], ["S99"])
+        self.assertNotIn("S99", {r["partition_key"] for r in records})
+
+    def test_failed_worker_aborts_the_job(self):
+        import time
+        events = _events(2000)
+        # host is unhashable; sampled validation lets it reach the windows
+        events[700] = json.dumps(dict(json.loads(events[700]), host={"a": 1})) + "\n"
+        with open(SCHEMA) as fh:
+            schema = json.load(fh)
+        t0 = time.monotonic()
+        with self.assertRaisesRegex(RuntimeError, "Partition worker [01] failed: TypeError"):
+            partition.run_partitioned(iter(events), 2, "session_id", 10, 5, schema,
+                                      validation_mode="sampled", validation_sample_every=10 ** 6,
+                                      out=io.StringIO(), batch_size=64, max_pending_batches=2)
+        self.assertLess(time.monotonic() - t0, 30)
+
+
+if __name__ == '__main__':
+    unittest.main()
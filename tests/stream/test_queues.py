@@ -0,0 +1,104 @@
+import json
+import os
+import queue
+import sys
+import tempfile
+import time
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+
+# Add project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from src.stream.queues import BoundedQueue, QueueAborted, run_stage
+
+
+class TestBoundedQueue(unittest.TestCase):
+
+    def test_slow_consumer_blocks_producer(self):
+        q = BoundedQueue("a->b", capacity=2)
+        got = []
+
+        def consume():
+            for item in q:
+                time.sleep(0.01)
+                got.append(item)
+
+        consumer = run_stage("b", consume, upstream=q)
+        for i in range(10):
+            q.put([i] * 5, units=5)
+        q.close()
+        consumer.join()
+        self.assertEqual(got, [[i] * 5 for i in range(10)])
+        stats = q.stats()
+        self.assertEqual((stats["items"], stats["units"], stats["depth_max"]), (10, 50, 2))
+        self.assertGreater(stats["put_wait_ms_total"], 30)  # producer waited for the consumer
+        self.assertGreater(stats["units_per_sec"], 0)
+
+    def test_put_timeout(self):
+        q = BoundedQueue("a->b", capacity=1, put_timeout=0.05)
+        q.put(1)
+        t0 = time.perf_counter()
+        with self.assertRaises(queue.Full):
+            q.put(2)
+        self.assertGreaterEqual(time.perf_counter() - t0, 0.05)
+        self.assertEqual(q.get(), 1)
+
+    def test_get_timeout(self):
+        q = BoundedQueue("a->b", capacity=1)
+        with self.assertRaises(queue.Empty):
+            q.get(timeout=0.05)
+        q.put(1)
+        self.assertEqual(q.get(timeout=0.05), 1)
+        q.close()
+        with self.assertRaises(StopIteration):
+            q.get(timeout=0.05)
+
+    def test_failed_stage_aborts_its_neighbours(self):
+        q = BoundedQueue("a->b", capacity=1)
+
+        def consume():
+            q.get()
+            raise RuntimeError("sink down")
+
+        consumer = run_stage("b", consume, upstream=q)
+        with self.assertRaises(QueueAborted):
+            for i in range(100):
+                q.put(i)
+        consumer.join()
+        self.assertIsInstance(consumer.error, RuntimeError)
+
+    def test_inproc_pipeline_reports_queue_metrics(self):
+        from src.stream.job import _run_inproc_pipeline
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'events.jsonl')
+            with open(path, 'w') as fh:
+                for i in range(300):
+                    fh.write(json.dumps({
+                        "timestamp": f"2025-08-01T00:{i // 60:02d}:{i % 60:02d}Z", "host": "h1",
+                        "level": "INFO", "component": "c", "message": "m",
+                        "template_id": f"T{i % 7}", "session_id": "S1",
+                    }) + "\n")
+            metrics = os.path.join(tmp, 'queues.json')
+            with redirect_stdout(StringIO()):
+                rc = _run_inproc_pipeline(
+                    input_path=path, window_size_sec=1, window_stride_sec=1,
+                    latency_log_file=os.path.join(tmp, 'lat.csv'), out_path=os.path.join(tmp, 'f.jsonl'),
+                    eps=100000, warmup_sec=0, run_duration_sec=5, queue_capacity=4,
+                    queue_metrics_file=metrics,
+                )
+            self.assertEqual(rc, 0)
+            with open(metrics) as fh:
+                stats = json.load(fh)
+            with open(os.path.join(tmp, 'f.jsonl')) as fh:
+                records = fh.readlines()
+        self.assertEqual(set(stats), {"replay->features", "features->sink"})
+        self.assertEqual(stats["replay->features"]["units"], 300)
+        self.assertLessEqual(stats["replay->features"]["depth_max"], 4)
+        self.assertEqual(stats["features->sink"]["items"], len(records))
+
+
+if __name__ == '__main__':
+    unittest.main()
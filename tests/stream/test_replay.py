@@ -0,0 +1,105 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+# Add project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from src.stream import replay
+
+
+class FakeClock:
+    """Deterministic stand-in for the ``time`` module used by the pacer."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def perf_counter(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+    def sleep(self, secs):
+        self.sleeps.append(secs)
+        self.now += secs
+
+
+class TestTokenBucketPacer(unittest.TestCase):
+
+    def test_micro_batches_per_tick(self):
+        clock = FakeClock()
+        with patch.object(replay, 'time', clock):
+            pacer = replay.TokenBucketPacer(eps=1000, tick=0.01)
+            self.assertEqual(pacer.next_batch(), 1)  # first event due immediately
+            self.assertEqual(pacer.next_batch(), 10)  # slept one tick: 10 events due
+            self.assertEqual(clock.sleeps, [0.01])
+            summary = pacer.summary()
+        self.assertEqual(summary['events'], 11)
+        self.assertEqual(summary['batches'], 2)
+        self.assertAlmostEqual(summary['achieved_eps'], 1100.0)
+
+    def test_low_rate_sleeps_full_interval(self):
+        clock = FakeClock()
+        with patch.object(replay, 'time', clock):
+            pacer = replay.TokenBucketPacer(eps=10, tick=0.001)
+            counts = [pacer.next_batch() for _ in range(5)]
+        self.assertEqual(counts, [1, 1, 1, 1, 1])
+        self.assertTrue(all(abs(s - 0.1) < 1e-9 for s in clock.sleeps))
+
+    def test_jitter_keeps_mean_rate(self):
+        clock = FakeClock()
+        with patch.object(replay, 'time', clock):
+            pacer = replay.TokenBucketPacer(eps=1000, jitter=0.5, tick=0.1)
+            total = sum(pacer.next_batch() for _ in range(50))
+        # ~5 seconds of schedule at 1000 EPS with +-50% per-event jitter
+        self.assertGreater(total, 4700)
+        self.assertLess(total, 5300)
+
+    def test_stall_drops_backlog(self):
+        clock = FakeClock()
+        with patch.object(replay, 'time', clock):
+            pacer = replay.TokenBucketPacer(eps=1000, max_lag=0.5)
+            pacer.next_batch()
+            clock.now += 5.0  # consumer stalled
+            self.assertEqual(pacer.next_batch(), 1)
+        self.assertEqual(pacer.resets, 1)
+
+
+class TestReplayEvents(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.jsonl')
+        with os.fdopen(fd, 'w') as fh:
+            for i in range(50):
+                fh.write(json.dumps({"timestamp": f"2025-08-01T00:00:{i:02d}Z", "host": "h1"}) + "\n")
+
+    def tearDown(self):
+        os.unlink(self.path)
+
+    def test_one_write_per_batch(self):
+        out = MagicMock()
+        with patch('sys.stdout', out):
+            stats = replay.replay_events(self.path, eps=100000, warmup_sec=0, run_duration_sec=10,
+                                         num_events=30, tick_sec=0.005, writer_thread=True)
+        payloads = [c.args[0] for c in out.write.call_args_list]
+        lines = "".join(payloads).splitlines()
+        self.assertEqual(len(lines), 30)
+        self.assertLess(len(payloads), 30)
+        self.assertEqual(stats['events'], 30)
+        first = json.loads(lines[0])
+        self.assertEqual(first['orig_ts'], "2025-08-01T00:00:00Z")
+        self.assertEqual(first['timestamp'], first['replay_ts'])
+
+    def test_iter_replay_yields_events(self):
+        events = list(replay.iter_replay(self.path, eps=100000, warmup_sec=0, run_duration_sec=10, num_events=7))
+        self.assertEqual(len(events), 7)
+        self.assertTrue(all('replay_ts' in e for e in events))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,7 @@
 """Test event deduplication."""
 import pytest
 from datetime import datetime, timezone, timedelta
-from src.ingest.dedup import generate_event_hash, dedup_events
+from src.ingest.dedup import DedupStore, dedup_events, event_fingerprint, generate_event_hash
 
 def test_generate_event_hash():
     event = {
@@ -79,3 +79,43 @@ def test_dedup_empty():
     assert deduped == []
     assert stats['total'] == 0
     assert stats['duplicates'] == 0
+
+def test_dedup_store_ttl_expiry():
+    store = DedupStore(ttl=300, buckets=4)
+    key = store.key(1, 'host1', 'msg')
+    assert len(key) == 16
+    assert store.check_and_add(key, 1000.0)
+    assert not store.check_and_add(key, 1100.0)
+    assert store.check_and_add(key, 1301.0)  # past the TTL
+    # Generations older than the TTL are dropped as event time advances
+    for i in range(10):
+        store.check_and_add(store.key(i), 1400.0 + i)
+    store.check_and_add(store.key('late'), 5000.0)
+    assert len(store) == 1
+    assert store.stats['expired'] == 11
+
+def test_dedup_store_hard_cap():
+    store = DedupStore(ttl=3600, buckets=60, max_keys=100)
+    for i in range(1000):
+        store.check_and_add(store.key(i), float(i))
+    assert len(store) <= 100
+    assert store.stats['evicted'] > 0
+    # The most recent keys are still deduplicated
+    assert not store.check_and_add(store.key(999), 999.0)
+
+def test_dedup_events_shared_store():
+    base_ts = datetime(2025, 8, 16, 10, 0, tzinfo=timezone.utc)
+    event = {'timestamp': base_ts, 'host': 'host1', 'message': 'test'}
+    store = DedupStore(ttl=300)
+    first, _ = dedup_events([event], store=store)
+    again, stats = dedup_events([dict(event, timestamp=base_ts + timedelta(seconds=5))], store=store)
+    assert len(first) == 1 and again == []
+    assert stats['duplicates'] == 1
+
+def test_fingerprint_ignores_nested_key_order():
+    base_ts = datetime(2025, 8, 16, 10, 0, tzinfo=timezone.utc)
+    a = {'timestamp': base_ts, 'host': 'host1', 'labels': {'cves': ['CVE-1'], 'user': 'u1'}}
+    b = {'timestamp': base_ts, 'host': 'host1', 'labels': {'user': 'u1', 'cves': ['CVE-1']}}
+    deduped, stats = dedup_events([a, b])
+    assert len(deduped) == 1 and stats['duplicates'] == 1
+    assert event_fingerprint(a) != event_fingerprint(dict(a, labels={'user': 'u2', 'cves': ['CVE-1']}))
@@ -0,0 +1,67 @@
+"""Test template interning and template bitsets."""
+import random
+
+import pytest
+
+from src.common.interning import INTERN_FILE, Interner, TemplateBitset, get_template_interner
+from src.ingest.template_cache import TemplateCache
+from src.models.log_lm.score import PerplexityScorer
+
+def test_intern_is_dense_and_string_keyed():
+    interner = Interner()
+    assert interner.intern_many(["t1", 17, "a1b2c3d4", "17", "t1", None, ""]) == [0, 1, 2, 1, 0, 3, 3]
+    assert interner.names == ["t1", "17", "a1b2c3d4", ""]
+    assert interner.lookup(17) == interner.lookup("17") == 1
+    assert interner.lookup("t2") is None and len(interner) == 4
+
+def test_table_round_trips_and_keeps_ids(tmp_path):
+    path = tmp_path / INTERN_FILE
+    Interner(["x", "y", "z"]).save(path)
+    fresh = Interner()
+    assert fresh.load(path) == 3
+    assert fresh.intern("y") == 1 and fresh.intern("w") == 3
+    # a process that already handed out ids keeps them (and learns the rest)
+    busy = Interner(["z"])
+    busy.load(path)
+    assert busy.names == ["z", "x", "y"]
+    assert Interner().load(tmp_path / "missing.json") == 0
+
+def test_template_cache_persists_the_table(tmp_path):
+    cache = TemplateCache(tmp_path, fsync=False)
+    tid, _ = cache.extract_template("Received block blk_123 of size 67108864 from /10.0.0.1")
+    cache.close()
+    stored = Interner()
+    stored.load(tmp_path / INTERN_FILE)
+    assert stored.lookup(tid) == get_template_interner().lookup(tid) is not None
+
+def test_bitset_matches_set_semantics():
+    rng = random.Random(4)
+    a_ids = {rng.randrange(5000) for _ in range(300)}
+    b_ids = {rng.randrange(2000) for _ in range(300)}
+    a, b = TemplateBitset(a_ids), TemplateBitset(b_ids)
+    assert set(a) == a_ids and len(a) == len(a_ids)
+    assert all(i in a for i in a_ids) and 5001 not in a and 10 ** 6 not in a
+    assert set(a | b) == a_ids | b_ids
+    assert set(a & b) == a_ids & b_ids
+    assert set(a - b) == a_ids - b_ids
+    assert set(a ^ b) == a_ids ^ b_ids
+    assert (a & b).issubset(a) and not a.issubset(b)
+    assert (a - b).isdisjoint(b)
+    assert TemplateBitset.from_bytes(a.to_bytes()) == a
+    a.discard(max(a_ids))
+    assert max(a) == sorted(a_ids)[-2]
+    a |= b
+    assert set(a) == (a_ids - {max(a_ids)}) | b_ids
+    assert not TemplateBitset() and len(a.to_bytes()) <= 5000 // 8 + 1
+
+@pytest.mark.parametrize("as_int", [False, True])
+def test_perplexity_is_independent_of_id_form(as_int):
+    form = (lambda t: int(t[1:]) + 900000) if as_int else (lambda t: t)
+    train = [["t1", "t2", "t3", "t1", "t2", "t3"], ["t1", "t2", "t4"]]
+    lm = PerplexityScorer(n=3)
+    lm.fit([[form(t) for t in seq] for seq in train])
+    assert len(lm.vocab) == 4
+    normal = lm.score([form(t) for t in ["t1", "t2", "t3"]])
+    odd = lm.score([form(t) for t in ["t3", "t3", "t9"]])
+    assert 1.0 < normal < odd
+    assert lm.score([form("t1"), "never-seen"]) == lm.score([form("t1"), "other-unseen"])
@@ -0,0 +1,92 @@
+"""Tests for the streaming latency histograms."""
+import numpy as np
+import pytest
+
+from src.common.latency import (
+    LatencyHistogram,
+    RollingLatencyHistogram,
+    load_latency_histogram,
+)
+
+
+@pytest.fixture
+def samples():
+    return np.random.default_rng(0).lognormal(mean=4.0, sigma=1.0, size=20000)
+
+
+def test_quantiles_within_relative_accuracy(samples):
+    hist = LatencyHistogram()
+    for v in samples:
+        hist.record(v)
+    for p in (50, 90, 95, 99):
+        assert hist.percentile(p) == pytest.approx(np.percentile(samples, p), rel=0.02)
+    assert hist.count == len(samples)
+    assert hist.min == samples.min() and hist.max == samples.max()
+
+
+def test_record_many_matches_record(samples):
+    a, b = LatencyHistogram(), LatencyHistogram()
+    for v in samples:
+        a.record(v)
+    b.record_many(samples)
+    assert np.array_equal(a.counts, b.counts)
+    assert a.percentile(95) == b.percentile(95)
+
+
+def test_merge_equals_single_histogram(samples):
+    whole = LatencyHistogram()
+    whole.record_many(samples)
+    left, right = LatencyHistogram(), LatencyHistogram()
+    left.record_many(samples[:5000])
+    right.record_many(samples[5000:])
+    merged = left.merge(right)
+    assert merged.count == whole.count
+    assert merged.percentile(95) == whole.percentile(95)
+    with pytest.raises(ValueError):
+        merged.merge(LatencyHistogram(relative_accuracy=0.05))
+
+
+def test_round_trip_and_csv_fallback(tmp_path, samples):
+    csv_path = tmp_path / "latency.csv"
+    csv_path.write_text("lat_ms\n" + "\n".join(f"{v:.3f}" for v in samples[:500]) + "\n")
+    from_csv = load_latency_histogram(csv_path)
+    assert from_csv.count == 500
+
+    hist = LatencyHistogram()
+    hist.record_many(samples)
+    hist.save(tmp_path / "latency.hist.json")
+    loaded = load_latency_histogram(csv_path)  # sibling histogram wins
+    assert loaded.count == hist.count
+    assert loaded.percentile(99) == hist.percentile(99)
+    assert load_latency_histogram(tmp_path / "missing.csv") is None
+
+
+def test_empty_and_out_of_range():
+    hist = LatencyHistogram()
+    assert np.isnan(hist.percentile(95))
+    hist.record(-5.0)  # skewed clocks can produce negative latencies
+    hist.record(1e15)
+    assert hist.percentile(0) == -5.0
+    assert hist.percentile(100) == 1e15
+
+
+def test_rolling_window_forgets_old_values():
+    rolling = RollingLatencyHistogram(window=100)
+    for _ in range(300):
+        rolling.record(1000.0)
+    for _ in range(200):
+        rolling.record(10.0)
+    assert rolling.percentile(95) == pytest.approx(10.0, rel=0.01)
+    assert rolling.lifetime.count == 500
+
+
+def test_histogram_older_than_csv_is_ignored(tmp_path, samples):
+    import os
+    csv_path = tmp_path / "latency.csv"
+    hist = LatencyHistogram()
+    hist.record_many(samples)
+    hist.save(tmp_path / "latency.hist.json")  # left over from an earlier run
+    csv_path.write_text("lat_ms\n" + "\n".join(f"{v:.3f}" for v in samples[:500]) + "\n")
+    stat = csv_path.stat()
+    os.utime(tmp_path / "latency.hist.json", ns=(stat.st_atime_ns, stat.st_mtime_ns - 10**9))
+    assert load_latency_histogram(csv_path).count == 500
@@ -0,0 +1,28 @@
+"""Test pseudonymization helpers."""
+from src.common.pseudo import (
+    Pseudonymizer, get_salt, hmac_sha256_hex, pseudo_host, pseudo_user,
+    pseudonymize, pseudonymize_many,
+)
+
+def test_matches_plain_hmac():
+    p = Pseudonymizer(b"tenant-key")
+    assert p.hexdigest("dn1.cluster") == hmac_sha256_hex("dn1.cluster", b"tenant-key")
+    assert p.pseudonymize("dn1.cluster", "h_", 16) == "h_" + hmac_sha256_hex("dn1.cluster", b"tenant-key")[:16]
+    assert p.pseudonymize("") == "" and p.pseudonymize(None) is None
+
+def test_module_helpers_unchanged():
+    salt = get_salt()
+    assert pseudo_host("dn1") == "h_" + hmac_sha256_hex("dn1", salt)[:16]
+    assert pseudo_user("alice") == "u_" + hmac_sha256_hex("alice", salt)[:16]
+    assert pseudonymize("x", "p_") == "p_" + hmac_sha256_hex("x", salt)[:16]
+    assert pseudonymize_many(["dn1", None, "dn1"], "h_") == [pseudo_host("dn1"), None, pseudo_host("dn1")]
+
+def test_lru_memo_is_bounded():
+    p = Pseudonymizer(b"k", max_cache=4)
+    hosts = [f"dn{i % 3}" for i in range(300)]
+    out = p.pseudonymize_many(hosts)
+    assert out[0] == out[3] and out[0] != out[1]
+    for h in hosts:
+        p.hexdigest(h)
+    info = p.cache_info()
+    assert info.misses == 3 and info.currsize <= 4
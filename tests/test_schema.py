@@ -90,3 +90,46 @@ def test_sample_jsonl():
         for line in f:
             entry = json.loads(line)
             validator.validate(entry)
+
+def test_compiled_validator_matches_jsonschema():
+    """Compiled check agrees with jsonschema on valid and invalid entries."""
+    from src.common.schema import SchemaValidator, compile_schema
+    schema = load_schema()
+    reference = jsonschema.validators.validator_for(schema)(schema)
+    check = compile_schema(schema)
+    sample_path = Path(__file__).parent / 'data' / 'hdfs' / 'sample.jsonl'
+    entries = [json.loads(line) for line in open(sample_path)]
+    entries += [
+        {"timestamp": "2025-08-01", "host": "h", "level": "INFO"},
+        {"timestamp": "2025-08-01T12:00:00Z", "host": "h", "level": "DEBUG"},
+        {"timestamp": "2025-08-01T12:00:00Z", "template_id": True},
+        {"timestamp": 5},
+        {"host": "h"},
+    ]
+    for entry in entries:
+        assert check(entry) == reference.is_valid(entry)
+    
+    with pytest.raises(jsonschema.exceptions.ValidationError):
+        SchemaValidator(schema).validate({"timestamp": "2025-08-01T12:00:00Z", "level": "DEBUG"})
+
+def test_validation_modes():
+    """Sampled and first-N-per-source modes validate only a subset."""
+    from src.common.schema import SchemaValidator
+    schema = load_schema()
+    bad = {"host": "h1"}  # missing timestamp
+    
+    sampled = SchemaValidator(schema, mode="sampled", sample_every=3)
+    results = []
+    for _ in range(6):
+        try:
+            results.append(sampled(bad))
+        except jsonschema.exceptions.ValidationError:
+            results.append("fail")
+    assert results == ["fail", False, False, "fail", False, False]
+    
+    first = SchemaValidator(schema, mode="first-n", first_n=2)
+    for host in ("h1", "h1", "h2"):
+        with pytest.raises(jsonschema.exceptions.ValidationError):
+            first({"host": host})
+    assert first({"host": "h1"}) is False
+    assert first.stats == {"seen": 4, "validated": 3, "skipped": 1, "failed": 3}
@@ -3,7 +3,7 @@ import pytest
 from datetime import datetime, timezone, timedelta
 from src.ingest.session import (
     parse_rfc3339, detect_clock_skew, fix_clock_skew,
-    generate_session_id, sessionize
+    generate_session_id, sessionize, StreamingSessionizer
 )
 
 def test_parse_rfc3339():
@@ -17,6 +17,10 @@ def test_parse_rfc3339():
         parse_rfc3339("2025-08-16")  # Missing time
     with pytest.raises(ValueError):
         parse_rfc3339("2025-08-16T10:20:30")  # Missing timezone
+    with pytest.raises(ValueError):
+        parse_rfc3339("12")  # Epoch seconds
+    with pytest.raises(ValueError):
+        parse_rfc3339(1755339630)
 
 def test_detect_clock_skew():
     ts = [
@@ -94,3 +98,77 @@ def test_sessionize():
     assert stats['total_events'] == 4
     assert stats['total_sessions'] == 3  # 2 session boundaries crossed
     assert 'mean_duration' in stats
+
+def _ev(minute, second=0, user='user1', host='host1'):
+    return {'timestamp': datetime(2025, 8, 16, 10, minute, second, tzinfo=timezone.utc),
+            'host': host, 'user': user}
+
+def test_streaming_sessionizer_closes_on_watermark():
+    s = StreamingSessionizer(window=300)
+    assert s.process(_ev(0)) == []
+    assert s.process(_ev(4, 30)) == []
+    assert s.process(_ev(2, user='user2')) == []
+    assert s.active_sessions == 2
+    
+    # Watermark reaches 10:05 -> both 10:00 sessions close and are evicted
+    closed = s.process(_ev(5))
+    assert {c['session_id'] for c in closed} == {
+        generate_session_id('host1', 'user1', _ev(0)['timestamp']),
+        generate_session_id('host1', 'user2', _ev(0)['timestamp']),
+    }
+    first = next(c for c in closed if c['event_count'] == 2)
+    assert first['duration'] == 270
+    assert s.active_sessions == 1
+    
+    # Late event for a closed bucket is tagged but does not reopen state
+    late = _ev(1)
+    assert s.process(late) == []
+    assert late['session_id'] == first['session_id']
+    assert s.get_stats()['late_events'] == 1 and s.active_sessions == 1
+    
+    rest = s.flush()
+    assert len(rest) == 1 and s.active_sessions == 0
+    stats = s.get_stats()
+    assert stats['total_sessions'] == stats['closed_sessions'] == 3
+    assert stats['total_events'] == 5
+
+def test_streaming_sessionizer_allowed_lateness():
+    s = StreamingSessionizer(window=300, allowed_lateness=120)
+    s.process(_ev(0))
+    assert s.process(_ev(6)) == []  # watermark 10:04 < 10:05
+    assert s.process(_ev(4, 59)) == []
+    closed = s.process(_ev(7))
+    assert len(closed) == 1 and closed[0]['event_count'] == 2
+    assert s.get_stats()['late_events'] == 0
+
+def test_streaming_sessionizer_naive_datetime_is_utc():
+    s = StreamingSessionizer(window=300)
+    s.process(_ev(0))
+    naive = dict(_ev(4), timestamp=datetime(2025, 8, 16, 10, 4))
+    assert s.process(naive) == []
+    assert naive['timestamp'] == _ev(4)['timestamp']
+    assert naive['session_id'] == generate_session_id('host1', 'user1', _ev(0)['timestamp'])
+    assert s.flush()[0]['duration'] == 240
+
+def test_streaming_matches_batch_ids():
+    events = [_ev(m, user=u) for m, u in [(0, 'a'), (1, 'a'), (6, 'a'), (7, 'b')]]
+    batch, stats = sessionize([dict(e) for e in events])
+    summaries = list(StreamingSessionizer().run(events))
+    assert [e['session_id'] for e in events] == [e['session_id'] for e in batch]
+    assert len(summaries) == stats['total_sessions']
+
+def test_session_ids_follow_key_rotation(monkeypatch):
+    from src.common.pseudo import reset_pseudonymizers
+    ts = datetime(2025, 8, 16, 10, 2, tzinfo=timezone.utc)
+    monkeypatch.setenv("DOVAH_TENANT_SALT", "salt-a")
+    reset_pseudonymizers()
+    before = generate_session_id("host1", "alice", ts)
+    monkeypatch.setenv("DOVAH_TENANT_SALT", "salt-b")
+    reset_pseudonymizers()
+    after = generate_session_id("host1", "alice", ts)
+    assert after != before
+    monkeypatch.setenv("DOVAH_TENANT_SALT", "salt-a")
+    reset_pseudonymizers()
+    assert generate_session_id("host1", "alice", ts) == before
+    monkeypatch.delenv("DOVAH_TENANT_SALT")
+    reset_pseudonymizers()
@@ -60,17 +60,73 @@ def test_cache_persistence(tmp_path):
     msg = "User alice logged in from 10.0.0.1"
     tid1, pattern1 = cache.extract_template(msg)
     
-    # Verify cache file exists
+    # Verify snapshot file exists after compaction
+    cache.compact()
     cache_file = tmp_path / "template_cache.json"
     assert cache_file.exists()
     
     # Check cache contents
     with open(cache_file) as f:
         data = json.load(f)
-        assert len(data) == 1
+        assert len(data['entries']) == 1
         
     # New cache instance should load existing templates
     cache2 = TemplateCache(tmp_path)
     tid2, pattern2 = cache2.extract_template(msg)
     assert tid2 == tid1
     assert pattern2 == pattern1
+
+def test_normalized_key_shares_entries(tmp_path):
+    cache = TemplateCache(tmp_path)
+    tid1, _ = cache.extract_template("Receiving block blk_123 src: /10.0.0.1:50010")
+    tid2, _ = cache.extract_template("Receiving block blk_456 src: /10.0.0.9:50010")
+    assert tid1 == tid2
+    assert cache.get_stats()['cache_size'] == 1
+
+def test_journal_replay_and_lru_bound(tmp_path):
+    cache = TemplateCache(tmp_path, max_entries=3, commit_every=2, compact_every=1000)
+    messages = [f"Worker {name} started" for name in ("alpha", "beta", "gamma", "delta")]
+    ids = [cache.extract_template(m)[0] for m in messages]
+    assert len(cache.cache) == 3
+    cache.close()
+    assert not (tmp_path / "template_cache.json").exists()  # journal only, no compaction yet
+
+    # Startup replays the journal (bounded by the LRU) and never reuses ids
+    cache2 = TemplateCache(tmp_path, max_entries=3)
+    assert cache2.extract_template(messages[-1])[0] == ids[-1]
+    new_id, _ = cache2.extract_template("Disk quota exceeded on volume")
+    assert new_id > max(ids)
+    cache2.close()
+
+def test_background_compaction(tmp_path):
+    cache = TemplateCache(tmp_path, commit_every=1, compact_every=5)
+    for i in range(12):
+        cache.extract_template(f"Event kind{chr(97 + i)} observed")
+    cache.close()
+    with open(tmp_path / "template_cache.json") as f:
+        assert len(json.load(f)['entries']) >= 5
+    cache2 = TemplateCache(tmp_path)
+    assert len(cache2.cache) == 12
+    assert not (tmp_path / "template_cache.journal.old").exists()
+
+def test_unclosed_cache_is_collected_and_commits(tmp_path):
+    import gc, weakref
+    cache = TemplateCache(tmp_path, commit_every=100, commit_interval=3600, fsync=False)
+    tid, _ = cache.extract_template("Worker omega started")
+    ref = weakref.ref(cache)
+    del cache; gc.collect()
+    assert ref() is None  # nothing process-wide keeps the cache (and its LRU) alive
+    with TemplateCache(tmp_path) as reopened:
+        assert reopened.extract_template("Worker omega started")[0] == tid
+        assert reopened.get_stats()['cache_size'] == 1
+
+def test_compat_miner_without_drain3(tmp_path, monkeypatch):
+    from src.ingest import template_cache
+    monkeypatch.setattr(template_cache, "TemplateMiner", template_cache._CompatTemplateMiner)
+    with TemplateCache(tmp_path) as cache:
+        tid1, _ = cache.extract_template("Worker alpha started")
+        tid2, _ = cache.extract_template("Disk quota exceeded on volume")
+        assert isinstance(tid1, int) and tid2 == tid1 + 1
+        assert {c['id'] for c in cache.get_stats()['clusters']} == {tid1, tid2}
+    with TemplateCache(tmp_path) as reopened:
+        assert reopened.extract_template("Worker beta started")[0] > tid2
@@ -0,0 +1,67 @@
+"""Test unified timestamp parsing."""
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from src.common.timeparse import (
+    NAT_NS, TimestampParser, from_epoch_ns, parse_many_ns, parse_ts, parse_ts_ns,
+    to_epoch_ns, tz_from_offset,
+)
+
+UTC = timezone.utc
+REF = datetime(2025, 8, 16, 12, 0, 0, 123456, tzinfo=UTC)
+
+@pytest.mark.parametrize("raw", [
+    "2025-08-16T12:00:00.123456Z",
+    "2025-08-16T12:00:00.123456+00:00",
+    "2025-08-16 12:00:00.123456",
+    "2025-08-16T14:00:00.123456+02:00",
+    "2025-08-16T07:30:00.123456-0430",
+    "2025-08-16 12:00:00,123456",
+    "2025-08-16T12:00:00.123456789Z",
+])
+def test_iso_variants_normalize_to_utc(raw):
+    dt = parse_ts(raw)
+    assert dt == REF and dt.tzinfo is UTC
+
+def test_epoch_magnitudes():
+    s = 1755345600
+    for v in (s, float(s), str(s), s * 1000, s * 1_000_000, s * 1_000_000_000):
+        assert parse_ts(v) == datetime(2025, 8, 16, 12, tzinfo=UTC)
+
+def test_hdfs_and_generic_fallback():
+    assert parse_ts("081109 203615") == datetime(2008, 11, 9, 20, 36, 15, tzinfo=UTC)
+    assert parse_ts("2025-08-16T12:00:00.5Z trailing") == datetime(2025, 8, 16, 12, 0, 0, 500000, tzinfo=UTC)
+
+def test_parser_locks_format_and_resniffs():
+    p = TimestampParser()
+    p.parse("081109 203615")
+    assert p.format == "hdfs"
+    p.parse("2025-08-16T12:00:00Z")
+    assert p.format == "iso"
+
+def test_strict_parser_rejects_naive_and_garbage():
+    strict = TimestampParser(default_tz=None)
+    with pytest.raises(ValueError):
+        strict.parse("2025-08-16T12:00:00")
+    for bad in ("2025-08-16", "not a time", "", None):
+        with pytest.raises(ValueError):
+            parse_ts(bad)
+
+def test_epoch_ns_exact_and_round_trip():
+    ns = to_epoch_ns(REF)
+    assert ns == 1755345600_123456000
+    assert parse_ts_ns("2025-08-16T12:00:00.123456Z") == ns
+    assert from_epoch_ns(ns) == REF
+    assert tz_from_offset("+05:30") == tz_from_offset("+0530") == timezone(timedelta(hours=5, minutes=30))
+
+def test_parse_many_matches_scalar():
+    values = ["2025-08-16T12:00:00.123456Z", "2025-08-16T14:00:00.123456+02:00",
+              "2025-08-16 12:00:00.123456", 1755345600, "081109 203615", "bogus", "2025-08-16"]
+    out = parse_many_ns(values)
+    assert out.dtype == np.int64
+    for v, got in zip(values[:5], out[:5]):
+        assert got == parse_ts_ns(v)
+    assert out[5] == NAT_NS and out[6] == NAT_NS
+    assert len(parse_many_ns([])) == 0